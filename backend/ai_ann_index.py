@@ -0,0 +1,68 @@
+"""
+Approximate nearest-neighbour index for AI case matching
+MinHash-LSH over case symptom sets: only symptom sets sharing an LSH bucket
+with the query are scored. More bands raise recall, more rows per band cut
+the candidates (and latency).
+
+The index is opt-in (AI_ANN_INDEX=minhash): its latency gain over exact
+search is small for symptom sets this short, so measure it against your case
+base with evaluate_ann.py before trading recall for it.
+"""
+
+import hashlib
+from typing import Dict, FrozenSet, Iterable, List, Set
+
+import numpy as np
+
+# Largest prime below 2**32: with a, b, x < p, a * x + b < 2**64 never wraps in uint64
+_HASH_PRIME = 4294967291
+
+
+class MinHashLSHIndex:
+    """Banded MinHash-LSH over symptom sets (frozensets of symptom ids)"""
+
+    def __init__(self, bands: int = 32, rows: int = 2, seed: int = 1):
+        if bands < 1 or rows < 1:
+            raise ValueError("bands and rows must be positive")
+        self.bands = bands
+        self.rows = rows
+        rng = np.random.default_rng(seed)
+        num_perm = bands * rows
+        self._a = rng.integers(1, _HASH_PRIME, num_perm, dtype=np.uint64)
+        self._b = rng.integers(0, _HASH_PRIME, num_perm, dtype=np.uint64)
+        self._symptom_hashes: Dict[str, np.ndarray] = {}
+        self.buckets: List[Dict[bytes, List[FrozenSet[str]]]] = [{} for _ in range(bands)]
+        self.size = 0
+
+    def _symptom_hash(self, symptom: str) -> np.ndarray:
+        """One permutation hash per MinHash slot, stable across processes"""
+        hashes = self._symptom_hashes.get(symptom)
+        if hashes is None:
+            # Python's str hash is salted per process, so derive a stable id
+            digest = int.from_bytes(hashlib.blake2b(symptom.encode("utf-8"), digest_size=8).digest(), "little")
+            symptom_id = np.uint64(digest % _HASH_PRIME)
+            hashes = (self._a * symptom_id + self._b) % np.uint64(_HASH_PRIME)
+            self._symptom_hashes[symptom] = hashes
+        return hashes
+
+    def _band_keys(self, symptoms: Iterable[str]) -> List[bytes]:
+        signature = np.minimum.reduce([self._symptom_hash(symptom) for symptom in set(symptoms)])
+        return [signature[band * self.rows:(band + 1) * self.rows].tobytes() for band in range(self.bands)]
+
+    def add(self, symptom_set: FrozenSet[str]):
+        """Index a symptom set (each distinct set once)"""
+        if not symptom_set:
+            return
+        for buckets, key in zip(self.buckets, self._band_keys(symptom_set)):
+            buckets.setdefault(key, []).append(symptom_set)
+        self.size += 1
+
+    def candidates(self, symptoms: Iterable[str]) -> Set[FrozenSet[str]]:
+        """Symptom sets sharing at least one band with the query"""
+        symptoms = set(symptoms)
+        if not symptoms:
+            return set()
+        found: Set[FrozenSet[str]] = set()
+        for buckets, key in zip(self.buckets, self._band_keys(symptoms)):
+            found.update(buckets.get(key, ()))
+        return found
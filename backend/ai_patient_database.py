@@ -4,240 +4,291 @@ Contains real patient cases with symptoms, treatments, and doctor recommendation
 """
 
 import json
+import heapq
+import os
+import threading
+from array import array
 from datetime import datetime
-from typing import List, Dict, Optional
+from functools import lru_cache
+from itertools import islice
+from typing import List, Dict, Optional, Set
 import re
 
+import numpy as np
+
+from ai_cache import TTLCache
+from ai_vector_engine import VectorizedCaseScorer
+from ai_ann_index import MinHashLSHIndex
+from ai_text_index import DescriptionIndex
+from case_store import CaseStore, CaseSnapshot, CaseList, ScoringColumns, scoring_age
+
+# Scoring path: "python" (inverted index) or "numpy" (vectorized scorer)
+AI_SCORING_ENGINE = os.getenv("AI_SCORING_ENGINE", "python")
+
+# Optional approximate candidate search: "minhash" enables MinHash-LSH (off by
+# default, the speedup is marginal; see ai_ann_index.py); more bands raise recall,
+# more rows per band lower latency
+AI_ANN_INDEX = os.getenv("AI_ANN_INDEX", "")
+AI_ANN_BANDS = int(os.getenv("AI_ANN_BANDS", "32"))
+AI_ANN_ROWS = int(os.getenv("AI_ANN_ROWS", "2"))
+
+# Weight of TF-IDF description similarity in the blended score (0 disables it)
+# and how many symptom and text matches are re-ranked together
+AI_TEXT_WEIGHT = float(os.getenv("AI_TEXT_WEIGHT", "0.3"))
+AI_TEXT_POOL = int(os.getenv("AI_TEXT_POOL", "50"))
+
+# Memoized recommendations for repeated symptom profiles
+AI_CACHE_SIZE = int(os.getenv("AI_CACHE_SIZE", "1024"))
+AI_CACHE_TTL_SECONDS = float(os.getenv("AI_CACHE_TTL_SECONDS", "300"))
+
+# Built-in seed cases, used until a case store snapshot exists
+BUILTIN_PATIENT_CASES = [
+    {
+        "case_id": "RTP001",
+        "patient_age": 45,
+        "patient_gender": "male",
+        "village": "Rampur",
+        "symptoms": ["fever", "cough", "headache", "body_ache"],
+        "symptom_description": "High fever for 3 days, dry cough, severe headache, muscle pain",
+        "diagnosis": "Viral Fever",
+        "treatment": "Paracetamol 500mg twice daily, plenty of fluids, rest",
+        "doctor_name": "Dr. Sharma",
+        "doctor_quote": "This is a typical viral fever case. The combination of high fever with body ache and dry cough indicates viral infection. Rest and symptomatic treatment will help recovery in 5-7 days.",
+        "consultation_date": "2024-01-15",
+        "recovery_time": "6 days",
+        "severity": "moderate"
+    },
+    {
+        "case_id": "RTP002",
+        "patient_age": 28,
+        "patient_gender": "female",
+        "village": "Krishnapur",
+        "symptoms": ["stomach_pain", "nausea", "vomiting", "diarrhea"],
+        "symptom_description": "Severe stomach cramps, frequent vomiting, loose motions since morning",
+        "diagnosis": "Gastroenteritis",
+        "treatment": "ORS solution, Metronidazole 400mg thrice daily, light diet",
+        "doctor_name": "Dr. Patel",
+        "doctor_quote": "This appears to be acute gastroenteritis, likely from contaminated food or water. Hydration is key. The antibiotic will help if bacterial. Avoid solid foods for 24 hours.",
+        "consultation_date": "2024-01-20",
+        "recovery_time": "3 days",
+        "severity": "moderate"
+    },
+    {
+        "case_id": "RTP003",
+        "patient_age": 65,
+        "patient_gender": "male",
+        "village": "Govindpur",
+        "symptoms": ["chest_pain", "shortness_of_breath", "dizziness"],
+        "symptom_description": "Sharp chest pain, difficulty breathing, feeling lightheaded",
+        "diagnosis": "Hypertensive Crisis",
+        "treatment": "Immediate BP medication, hospital referral, cardiac monitoring",
+        "doctor_name": "Dr. Kumar",
+        "doctor_quote": "This is a serious condition requiring immediate attention. The chest pain with breathing difficulty in an elderly patient suggests cardiovascular involvement. Emergency referral is necessary.",
+        "consultation_date": "2024-01-25",
+        "recovery_time": "14 days",
+        "severity": "high"
+    },
+    {
+        "case_id": "RTP004",
+        "patient_age": 8,
+        "patient_gender": "female",
+        "village": "Rampur",
+        "symptoms": ["fever", "rash", "sore_throat"],
+        "symptom_description": "Mild fever, red rash on body, throat pain while swallowing",
+        "diagnosis": "Viral Exanthem",
+        "treatment": "Paracetamol syrup, throat lozenges, calamine lotion for rash",
+        "doctor_name": "Dr. Sharma",
+        "doctor_quote": "This is a common viral infection in children causing fever and rash. The rash will fade in 3-4 days. Keep the child hydrated and comfortable.",
+        "consultation_date": "2024-02-01",
+        "recovery_time": "5 days",
+        "severity": "low"
+    },
+    {
+        "case_id": "RTP005",
+        "patient_age": 35,
+        "patient_gender": "female",
+        "village": "Madhavpur",
+        "symptoms": ["headache", "neck_stiffness", "fever", "sensitivity_to_light"],
+        "symptom_description": "Severe headache, stiff neck, high fever, eyes hurt in bright light",
+        "diagnosis": "Suspected Meningitis",
+        "treatment": "Immediate hospital referral, IV antibiotics, lumbar puncture",
+        "doctor_name": "Dr. Gupta",
+        "doctor_quote": "The combination of severe headache, neck stiffness, and photophobia is highly concerning for meningitis. This requires immediate hospital admission and aggressive treatment.",
+        "consultation_date": "2024-02-05",
+        "recovery_time": "21 days",
+        "severity": "critical"
+    },
+    {
+        "case_id": "RTP006",
+        "patient_age": 22,
+        "patient_gender": "male",
+        "village": "Sundarpur",
+        "symptoms": ["cough", "weight_loss", "night_sweats", "fatigue"],
+        "symptom_description": "Persistent cough for 6 weeks, unexplained weight loss, night sweats",
+        "diagnosis": "Pulmonary Tuberculosis",
+        "treatment": "Anti-TB therapy (DOTS), nutritional support, isolation initially",
+        "doctor_name": "Dr. Singh",
+        "doctor_quote": "The chronic cough with constitutional symptoms like weight loss and night sweats strongly suggests tuberculosis. Sputum test confirmed it. DOTS therapy for 6 months is essential.",
+        "consultation_date": "2024-02-10",
+        "recovery_time": "180 days",
+        "severity": "high"
+    },
+    {
+        "case_id": "RTP007",
+        "patient_age": 40,
+        "patient_gender": "female",
+        "village": "Krishnapur",
+        "symptoms": ["joint_pain", "morning_stiffness", "swelling"],
+        "symptom_description": "Pain in multiple joints, stiffness worse in morning, swollen knuckles",
+        "diagnosis": "Rheumatoid Arthritis",
+        "treatment": "Methotrexate, NSAIDs, physiotherapy, regular monitoring",
+        "doctor_name": "Dr. Mehta",
+        "doctor_quote": "The pattern of joint involvement and morning stiffness indicates inflammatory arthritis. Early treatment with disease-modifying drugs is crucial to prevent joint damage.",
+        "consultation_date": "2024-02-15",
+        "recovery_time": "ongoing",
+        "severity": "moderate"
+    },
+    {
+        "case_id": "RTP008",
+        "patient_age": 55,
+        "patient_gender": "male",
+        "village": "Rampur",
+        "symptoms": ["frequent_urination", "excessive_thirst", "fatigue", "blurred_vision"],
+        "symptom_description": "Urinating every hour, always thirsty, tired all the time, vision problems",
+        "diagnosis": "Type 2 Diabetes Mellitus",
+        "treatment": "Metformin, dietary changes, regular exercise, blood sugar monitoring",
+        "doctor_name": "Dr. Sharma",
+        "doctor_quote": "These are classic symptoms of diabetes. The blood sugar is quite high. With proper medication and lifestyle changes, we can control this effectively.",
+        "consultation_date": "2024-02-20",
+        "recovery_time": "ongoing",
+        "severity": "moderate"
+    },
+    {
+        "case_id": "RTP009",
+        "patient_age": 30,
+        "patient_gender": "female",
+        "village": "Govindpur",
+        "symptoms": ["missed_periods", "nausea", "breast_tenderness", "fatigue"],
+        "symptom_description": "Missed period for 6 weeks, morning sickness, sore breasts, feeling tired",
+        "diagnosis": "Pregnancy (First Trimester)",
+        "treatment": "Folic acid supplements, prenatal vitamins, regular check-ups",
+        "doctor_name": "Dr. Priya",
+        "doctor_quote": "Congratulations! You're about 6 weeks pregnant. Start taking folic acid immediately and avoid alcohol, smoking. Regular antenatal check-ups are important.",
+        "consultation_date": "2024-02-25",
+        "recovery_time": "N/A",
+        "severity": "low"
+    },
+    {
+        "case_id": "RTP010",
+        "patient_age": 12,
+        "patient_gender": "male",
+        "village": "Madhavpur",
+        "symptoms": ["wheezing", "shortness_of_breath", "cough", "chest_tightness"],
+        "symptom_description": "Whistling sound while breathing, can't run without getting breathless, dry cough at night",
+        "diagnosis": "Bronchial Asthma",
+        "treatment": "Salbutamol inhaler, preventive inhaler, avoid triggers, peak flow monitoring",
+        "doctor_name": "Dr. Reddy",
+        "doctor_quote": "This is asthma triggered by dust and exercise. With proper inhaler technique and avoiding triggers, the child can lead a normal active life.",
+        "consultation_date": "2024-03-01",
+        "recovery_time": "ongoing",
+        "severity": "moderate"
+    },
+    {
+        "case_id": "RTP011",
+        "patient_age": 70,
+        "patient_gender": "female",
+        "village": "Sundarpur",
+        "symptoms": ["memory_loss", "confusion", "difficulty_speaking", "mood_changes"],
+        "symptom_description": "Forgetting recent events, getting confused about time and place, trouble finding words",
+        "diagnosis": "Early Dementia",
+        "treatment": "Cognitive assessment, family counseling, safety measures, routine establishment",
+        "doctor_name": "Dr. Agarwal",
+        "doctor_quote": "The cognitive decline pattern suggests early dementia. While we can't reverse it, we can slow progression and improve quality of life with proper care and routine.",
+        "consultation_date": "2024-03-05",
+        "recovery_time": "progressive",
+        "severity": "high"
+    },
+    {
+        "case_id": "RTP012",
+        "patient_age": 25,
+        "patient_gender": "male",
+        "village": "Krishnapur",
+        "symptoms": ["skin_rash", "itching", "redness", "scaling"],
+        "symptom_description": "Red, itchy patches on arms and legs, skin is flaky and dry",
+        "diagnosis": "Eczema (Atopic Dermatitis)",
+        "treatment": "Moisturizing cream, topical steroid, antihistamine, avoid irritants",
+        "doctor_name": "Dr. Jain",
+        "doctor_quote": "This is eczema, a chronic skin condition. Regular moisturizing is key. Use the steroid cream only during flare-ups. Identify and avoid your triggers.",
+        "consultation_date": "2024-03-10",
+        "recovery_time": "ongoing",
+        "severity": "low"
+    },
+    {
+        "case_id": "RTP013",
+        "patient_age": 50,
+        "patient_gender": "female",
+        "village": "Rampur",
+        "symptoms": ["hot_flashes", "night_sweats", "mood_swings", "irregular_periods"],
+        "symptom_description": "Sudden heat waves, sweating at night, emotional ups and downs, periods becoming irregular",
+        "diagnosis": "Menopause",
+        "treatment": "Hormone replacement therapy, calcium supplements, lifestyle modifications",
+        "doctor_name": "Dr. Priya",
+        "doctor_quote": "You're entering menopause, which is natural at your age. HRT can help with symptoms. Focus on calcium-rich diet and regular exercise for bone health.",
+        "consultation_date": "2024-03-15",
+        "recovery_time": "ongoing",
+        "severity": "low"
+    },
+    {
+        "case_id": "RTP014",
+        "patient_age": 18,
+        "patient_gender": "male",
+        "village": "Govindpur",
+        "symptoms": ["severe_headache", "vomiting", "fever", "neck_pain"],
+        "symptom_description": "Worst headache of life, projectile vomiting, high fever, neck hurts to move",
+        "diagnosis": "Acute Meningitis",
+        "treatment": "Emergency hospitalization, IV antibiotics, supportive care, isolation",
+        "doctor_name": "Dr. Kumar",
+        "doctor_quote": "This is acute bacterial meningitis - a medical emergency. Immediate IV antibiotics are started. With prompt treatment, full recovery is expected.",
+        "consultation_date": "2024-03-20",
+        "recovery_time": "14 days",
+        "severity": "critical"
+    },
+    {
+        "case_id": "RTP015",
+        "patient_age": 38,
+        "patient_gender": "female",
+        "village": "Madhavpur",
+        "symptoms": ["anxiety", "palpitations", "sweating", "trembling"],
+        "symptom_description": "Constant worry, heart racing, excessive sweating, hands shaking",
+        "diagnosis": "Generalized Anxiety Disorder",
+        "treatment": "Counseling, relaxation techniques, mild anxiolytic if needed, lifestyle changes",
+        "doctor_name": "Dr. Verma",
+        "doctor_quote": "Anxiety is treatable. Counseling and relaxation techniques work well. Medication is only if symptoms are severe. Regular exercise helps significantly.",
+        "consultation_date": "2024-03-25",
+        "recovery_time": "60 days",
+        "severity": "moderate"
+    }
+]
+
+# Preset deflate dictionary for case details added at runtime: real cases
+# repeat the built-in cases' keys and much of their wording
+DETAIL_DICTIONARY = "".join(
+    json.dumps(case, ensure_ascii=False, separators=(",", ":")) for case in BUILTIN_PATIENT_CASES
+).encode("utf-8")
+
+
+def profile_arguments(profile: Dict) -> Dict:
+    """get_ai_recommendations keyword arguments from a request-style profile dict"""
+    return {
+        "symptoms": profile["symptoms"],
+        "symptom_description": profile.get("symptom_description") or "",
+        "patient_age": profile.get("patient_age"),
+        "patient_gender": profile.get("patient_gender"),
+    }
+
 class AIPatientDatabase:
-    def __init__(self):
-        self.patient_cases = [
-            {
-                "case_id": "RTP001",
-                "patient_age": 45,
-                "patient_gender": "male",
-                "village": "Rampur",
-                "symptoms": ["fever", "cough", "headache", "body_ache"],
-                "symptom_description": "High fever for 3 days, dry cough, severe headache, muscle pain",
-                "diagnosis": "Viral Fever",
-                "treatment": "Paracetamol 500mg twice daily, plenty of fluids, rest",
-                "doctor_name": "Dr. Sharma",
-                "doctor_quote": "This is a typical viral fever case. The combination of high fever with body ache and dry cough indicates viral infection. Rest and symptomatic treatment will help recovery in 5-7 days.",
-                "consultation_date": "2024-01-15",
-                "recovery_time": "6 days",
-                "severity": "moderate"
-            },
-            {
-                "case_id": "RTP002",
-                "patient_age": 28,
-                "patient_gender": "female",
-                "village": "Krishnapur",
-                "symptoms": ["stomach_pain", "nausea", "vomiting", "diarrhea"],
-                "symptom_description": "Severe stomach cramps, frequent vomiting, loose motions since morning",
-                "diagnosis": "Gastroenteritis",
-                "treatment": "ORS solution, Metronidazole 400mg thrice daily, light diet",
-                "doctor_name": "Dr. Patel",
-                "doctor_quote": "This appears to be acute gastroenteritis, likely from contaminated food or water. Hydration is key. The antibiotic will help if bacterial. Avoid solid foods for 24 hours.",
-                "consultation_date": "2024-01-20",
-                "recovery_time": "3 days",
-                "severity": "moderate"
-            },
-            {
-                "case_id": "RTP003",
-                "patient_age": 65,
-                "patient_gender": "male",
-                "village": "Govindpur",
-                "symptoms": ["chest_pain", "shortness_of_breath", "dizziness"],
-                "symptom_description": "Sharp chest pain, difficulty breathing, feeling lightheaded",
-                "diagnosis": "Hypertensive Crisis",
-                "treatment": "Immediate BP medication, hospital referral, cardiac monitoring",
-                "doctor_name": "Dr. Kumar",
-                "doctor_quote": "This is a serious condition requiring immediate attention. The chest pain with breathing difficulty in an elderly patient suggests cardiovascular involvement. Emergency referral is necessary.",
-                "consultation_date": "2024-01-25",
-                "recovery_time": "14 days",
-                "severity": "high"
-            },
-            {
-                "case_id": "RTP004",
-                "patient_age": 8,
-                "patient_gender": "female",
-                "village": "Rampur",
-                "symptoms": ["fever", "rash", "sore_throat"],
-                "symptom_description": "Mild fever, red rash on body, throat pain while swallowing",
-                "diagnosis": "Viral Exanthem",
-                "treatment": "Paracetamol syrup, throat lozenges, calamine lotion for rash",
-                "doctor_name": "Dr. Sharma",
-                "doctor_quote": "This is a common viral infection in children causing fever and rash. The rash will fade in 3-4 days. Keep the child hydrated and comfortable.",
-                "consultation_date": "2024-02-01",
-                "recovery_time": "5 days",
-                "severity": "low"
-            },
-            {
-                "case_id": "RTP005",
-                "patient_age": 35,
-                "patient_gender": "female",
-                "village": "Madhavpur",
-                "symptoms": ["headache", "neck_stiffness", "fever", "sensitivity_to_light"],
-                "symptom_description": "Severe headache, stiff neck, high fever, eyes hurt in bright light",
-                "diagnosis": "Suspected Meningitis",
-                "treatment": "Immediate hospital referral, IV antibiotics, lumbar puncture",
-                "doctor_name": "Dr. Gupta",
-                "doctor_quote": "The combination of severe headache, neck stiffness, and photophobia is highly concerning for meningitis. This requires immediate hospital admission and aggressive treatment.",
-                "consultation_date": "2024-02-05",
-                "recovery_time": "21 days",
-                "severity": "critical"
-            },
-            {
-                "case_id": "RTP006",
-                "patient_age": 22,
-                "patient_gender": "male",
-                "village": "Sundarpur",
-                "symptoms": ["cough", "weight_loss", "night_sweats", "fatigue"],
-                "symptom_description": "Persistent cough for 6 weeks, unexplained weight loss, night sweats",
-                "diagnosis": "Pulmonary Tuberculosis",
-                "treatment": "Anti-TB therapy (DOTS), nutritional support, isolation initially",
-                "doctor_name": "Dr. Singh",
-                "doctor_quote": "The chronic cough with constitutional symptoms like weight loss and night sweats strongly suggests tuberculosis. Sputum test confirmed it. DOTS therapy for 6 months is essential.",
-                "consultation_date": "2024-02-10",
-                "recovery_time": "180 days",
-                "severity": "high"
-            },
-            {
-                "case_id": "RTP007",
-                "patient_age": 40,
-                "patient_gender": "female",
-                "village": "Krishnapur",
-                "symptoms": ["joint_pain", "morning_stiffness", "swelling"],
-                "symptom_description": "Pain in multiple joints, stiffness worse in morning, swollen knuckles",
-                "diagnosis": "Rheumatoid Arthritis",
-                "treatment": "Methotrexate, NSAIDs, physiotherapy, regular monitoring",
-                "doctor_name": "Dr. Mehta",
-                "doctor_quote": "The pattern of joint involvement and morning stiffness indicates inflammatory arthritis. Early treatment with disease-modifying drugs is crucial to prevent joint damage.",
-                "consultation_date": "2024-02-15",
-                "recovery_time": "ongoing",
-                "severity": "moderate"
-            },
-            {
-                "case_id": "RTP008",
-                "patient_age": 55,
-                "patient_gender": "male",
-                "village": "Rampur",
-                "symptoms": ["frequent_urination", "excessive_thirst", "fatigue", "blurred_vision"],
-                "symptom_description": "Urinating every hour, always thirsty, tired all the time, vision problems",
-                "diagnosis": "Type 2 Diabetes Mellitus",
-                "treatment": "Metformin, dietary changes, regular exercise, blood sugar monitoring",
-                "doctor_name": "Dr. Sharma",
-                "doctor_quote": "These are classic symptoms of diabetes. The blood sugar is quite high. With proper medication and lifestyle changes, we can control this effectively.",
-                "consultation_date": "2024-02-20",
-                "recovery_time": "ongoing",
-                "severity": "moderate"
-            },
-            {
-                "case_id": "RTP009",
-                "patient_age": 30,
-                "patient_gender": "female",
-                "village": "Govindpur",
-                "symptoms": ["missed_periods", "nausea", "breast_tenderness", "fatigue"],
-                "symptom_description": "Missed period for 6 weeks, morning sickness, sore breasts, feeling tired",
-                "diagnosis": "Pregnancy (First Trimester)",
-                "treatment": "Folic acid supplements, prenatal vitamins, regular check-ups",
-                "doctor_name": "Dr. Priya",
-                "doctor_quote": "Congratulations! You're about 6 weeks pregnant. Start taking folic acid immediately and avoid alcohol, smoking. Regular antenatal check-ups are important.",
-                "consultation_date": "2024-02-25",
-                "recovery_time": "N/A",
-                "severity": "low"
-            },
-            {
-                "case_id": "RTP010",
-                "patient_age": 12,
-                "patient_gender": "male",
-                "village": "Madhavpur",
-                "symptoms": ["wheezing", "shortness_of_breath", "cough", "chest_tightness"],
-                "symptom_description": "Whistling sound while breathing, can't run without getting breathless, dry cough at night",
-                "diagnosis": "Bronchial Asthma",
-                "treatment": "Salbutamol inhaler, preventive inhaler, avoid triggers, peak flow monitoring",
-                "doctor_name": "Dr. Reddy",
-                "doctor_quote": "This is asthma triggered by dust and exercise. With proper inhaler technique and avoiding triggers, the child can lead a normal active life.",
-                "consultation_date": "2024-03-01",
-                "recovery_time": "ongoing",
-                "severity": "moderate"
-            },
-            {
-                "case_id": "RTP011",
-                "patient_age": 70,
-                "patient_gender": "female",
-                "village": "Sundarpur",
-                "symptoms": ["memory_loss", "confusion", "difficulty_speaking", "mood_changes"],
-                "symptom_description": "Forgetting recent events, getting confused about time and place, trouble finding words",
-                "diagnosis": "Early Dementia",
-                "treatment": "Cognitive assessment, family counseling, safety measures, routine establishment",
-                "doctor_name": "Dr. Agarwal",
-                "doctor_quote": "The cognitive decline pattern suggests early dementia. While we can't reverse it, we can slow progression and improve quality of life with proper care and routine.",
-                "consultation_date": "2024-03-05",
-                "recovery_time": "progressive",
-                "severity": "high"
-            },
-            {
-                "case_id": "RTP012",
-                "patient_age": 25,
-                "patient_gender": "male",
-                "village": "Krishnapur",
-                "symptoms": ["skin_rash", "itching", "redness", "scaling"],
-                "symptom_description": "Red, itchy patches on arms and legs, skin is flaky and dry",
-                "diagnosis": "Eczema (Atopic Dermatitis)",
-                "treatment": "Moisturizing cream, topical steroid, antihistamine, avoid irritants",
-                "doctor_name": "Dr. Jain",
-                "doctor_quote": "This is eczema, a chronic skin condition. Regular moisturizing is key. Use the steroid cream only during flare-ups. Identify and avoid your triggers.",
-                "consultation_date": "2024-03-10",
-                "recovery_time": "ongoing",
-                "severity": "low"
-            },
-            {
-                "case_id": "RTP013",
-                "patient_age": 50,
-                "patient_gender": "female",
-                "village": "Rampur",
-                "symptoms": ["hot_flashes", "night_sweats", "mood_swings", "irregular_periods"],
-                "symptom_description": "Sudden heat waves, sweating at night, emotional ups and downs, periods becoming irregular",
-                "diagnosis": "Menopause",
-                "treatment": "Hormone replacement therapy, calcium supplements, lifestyle modifications",
-                "doctor_name": "Dr. Priya",
-                "doctor_quote": "You're entering menopause, which is natural at your age. HRT can help with symptoms. Focus on calcium-rich diet and regular exercise for bone health.",
-                "consultation_date": "2024-03-15",
-                "recovery_time": "ongoing",
-                "severity": "low"
-            },
-            {
-                "case_id": "RTP014",
-                "patient_age": 18,
-                "patient_gender": "male",
-                "village": "Govindpur",
-                "symptoms": ["severe_headache", "vomiting", "fever", "neck_pain"],
-                "symptom_description": "Worst headache of life, projectile vomiting, high fever, neck hurts to move",
-                "diagnosis": "Acute Meningitis",
-                "treatment": "Emergency hospitalization, IV antibiotics, supportive care, isolation",
-                "doctor_name": "Dr. Kumar",
-                "doctor_quote": "This is acute bacterial meningitis - a medical emergency. Immediate IV antibiotics are started. With prompt treatment, full recovery is expected.",
-                "consultation_date": "2024-03-20",
-                "recovery_time": "14 days",
-                "severity": "critical"
-            },
-            {
-                "case_id": "RTP015",
-                "patient_age": 38,
-                "patient_gender": "female",
-                "village": "Madhavpur",
-                "symptoms": ["anxiety", "palpitations", "sweating", "trembling"],
-                "symptom_description": "Constant worry, heart racing, excessive sweating, hands shaking",
-                "diagnosis": "Generalized Anxiety Disorder",
-                "treatment": "Counseling, relaxation techniques, mild anxiolytic if needed, lifestyle changes",
-                "doctor_name": "Dr. Verma",
-                "doctor_quote": "Anxiety is treatable. Counseling and relaxation techniques work well. Medication is only if symptoms are severe. Regular exercise helps significantly.",
-                "consultation_date": "2024-03-25",
-                "recovery_time": "60 days",
-                "severity": "moderate"
-            }
-        ]
-        
+    def __init__(self, engine: str = AI_SCORING_ENGINE, store: Optional[CaseStore] = None,
+                 seed_cases: List[Dict] = BUILTIN_PATIENT_CASES):
         # Symptom patterns and weights for AI matching
         self.symptom_weights = {
             "fever": 0.8,
@@ -264,23 +315,278 @@ class AIPatientDatabase:
             "palpitations": 0.7
         }
 
-    def find_similar_cases(self, symptoms: List[str], patient_age: int = None, patient_gender: str = None) -> List[Dict]:
-        """Find similar patient cases based on symptoms and demographics"""
+        # Cases with the same symptom set score the same apart from the age
+        # bonus, so they are grouped: symptom set -> patient age (0 if
+        # unknown) -> ascending positions in self.patient_cases. The inverted
+        # index maps each symptom to the symptom sets containing it.
+        self.case_groups: Dict[frozenset, Dict[int, array]] = {}
+        self.symptom_index: Dict[str, Set[frozenset]] = {}
+        
+        if engine not in ("python", "numpy"):
+            raise ValueError(f"Unknown AI scoring engine: {engine}")
+        self.engine = engine
+        self.vector_scorer = VectorizedCaseScorer(self.symptom_weights) if engine == "numpy" else None
+        self.ann_index = MinHashLSHIndex(AI_ANN_BANDS, AI_ANN_ROWS) if AI_ANN_INDEX == "minhash" else None
+        # Guards the indexes against cases added while a query runs
+        self._lock = threading.RLock()
+        self.recommendation_cache = TTLCache(AI_CACHE_SIZE, AI_CACHE_TTL_SECONDS)
+        
+        # Load the current case store snapshot, falling back to the seed cases
+        self.store = store or CaseStore()
+        self.seed_cases = seed_cases
+        self.snapshot = self.store.load()
+        # Scoring reads only the compact columns; full case details live in
+        # self.patient_cases and are decoded for the returned top-k only
+        self.patient_cases = CaseList(self.snapshot, DETAIL_DICTIONARY)
+        self.scoring = ScoringColumns(self.snapshot)
+        if self.snapshot is None:
+            for case in seed_cases:
+                self._append_case(case)
+            self.text_index = DescriptionIndex.fit(case.get("symptom_description") for case in seed_cases)
+        else:
+            self._index_snapshot(self.snapshot)
+            self.text_index = self.snapshot.description_index() or DescriptionIndex.fit(
+                case.get("symptom_description") for case in self.snapshot.iter_cases()
+            )
+        
+        # Cases learned since the snapshot was written
+        self._pending_cursor = None
+        self.refresh()
+        self._cached_version = self.case_base_version
+
+    def refresh(self) -> int:
+        """Index pending cases appended (by any process) since the last refresh
+
+        Once another snapshot is made current (e.g. by compaction) the case base is
+        reloaded from it instead, in place, so every holder of this instance sees it.
+        Returns the number of pending cases indexed.
+        """
+        with self._lock:
+            version = self.snapshot.version if self.snapshot else None
+            folded = self.snapshot.manifest.get("folded_pending", []) if self.snapshot else []
+            cases, self._pending_cursor = self.store.read_pending(version, self._pending_cursor, folded)
+            for case in cases or []:
+                self.add_case(case)
+        if cases is None:
+            return self._reload()
+        return len(cases)
+
+    def _reload(self) -> int:
+        """Build the case base of the current snapshot aside, then swap it in"""
+        fresh = AIPatientDatabase(self.engine, self.store, self.seed_cases)
+        if self.ann_index is None:
+            fresh.ann_index = None
+        with self._lock:
+            # Keep this instance's lock and cache; cache keys carry the case base version
+            state = {name: value for name, value in vars(fresh).items()
+                     if name not in ("_lock", "recommendation_cache")}
+            vars(self).update(state)
+        return len(self.patient_cases) - self.patient_cases.base_size
+
+    def set_ann_index(self, ann_index: Optional[MinHashLSHIndex]):
+        """Use an (empty) ANN index for candidate search from now on; None restores exact search"""
+        with self._lock:
+            if ann_index is not None:
+                for signature in self.case_groups:
+                    ann_index.add(signature)
+            self.ann_index = ann_index
+            self.recommendation_cache.clear()
+
+    def _index_snapshot(self, snapshot: CaseSnapshot):
+        """Build the indexes from a snapshot's columns without decoding any case details"""
+        signatures = self.scoring.signatures
+        for signature in signatures:
+            self.case_groups[signature] = {}
+            for symptom in signature:
+                self.symptom_index.setdefault(symptom, set()).add(signature)
+            if self.ann_index is not None:
+                self.ann_index.add(signature)
+        
+        # Runs of equal (signature, age); lexsort is stable so positions stay ascending
+        ages = np.asarray(snapshot.ages)
+        case_signature = np.asarray(snapshot.case_signature)
+        order = np.lexsort((ages, case_signature))
+        sorted_signature, sorted_ages = case_signature[order], ages[order]
+        boundaries = np.flatnonzero((np.diff(sorted_signature) != 0) | (np.diff(sorted_ages) != 0)) + 1
+        starts = [0] + boundaries.tolist()
+        ends = boundaries.tolist() + [len(order)]
+        for start, end in zip(starts, ends):
+            if start == end:
+                continue
+            by_age = self.case_groups[signatures[sorted_signature[start]]]
+            by_age[int(sorted_ages[start])] = array("i", order[start:end].astype(np.int32).tobytes())
+        
+        if self.vector_scorer is not None:
+            self.vector_scorer.load_columns(
+                snapshot.symptoms,
+                [snapshot.symptom_postings(i) for i in range(len(snapshot.symptoms))],
+                ages
+            )
+
+    def _append_case(self, case: Dict) -> int:
+        """Store a case's details and scoring columns and index it"""
+        position = len(self.patient_cases)
+        self.patient_cases.append(case)
+        signature = self.scoring.append(case["symptoms"], case["patient_age"])
+        self._index_case(position, signature, case)
+        return position
+
+    def _index_case(self, position: int, signature: frozenset, case: Dict):
+        """Add a case to its symptom-set group and the inverted index"""
+        by_age = self.case_groups.get(signature)
+        if by_age is None:
+            by_age = self.case_groups[signature] = {}
+            for symptom in signature:
+                self.symptom_index.setdefault(symptom, set()).add(signature)
+            if self.ann_index is not None:
+                self.ann_index.add(signature)
+        by_age.setdefault(scoring_age(case["patient_age"]), array("i")).append(position)
+        if self.vector_scorer is not None:
+            self.vector_scorer.add(position, case)
+
+    def add_case(self, case: Dict) -> int:
+        """Append a case to the case base and index it without a rebuild"""
+        with self._lock:
+            position = self._append_case(case)
+            self.text_index.add(case.get("symptom_description"))
+        return position
+
+    def _age_tiers(self, patient_age: Optional[int], by_age: Dict[int, array]):
+        """Yield (representative age, ages) for each age bonus tier, best bonus first"""
+        if not patient_age:
+            yield None, list(by_age)
+            return
+        close = [age for age in range(patient_age - 5, patient_age + 6) if age and age in by_age]
+        if close:
+            yield close[0], close
+        near = [age for age in range(patient_age - 15, patient_age + 16)
+                if age and age in by_age and abs(patient_age - age) > 5]
+        if near:
+            yield near[0], near
+        other = [age for age in by_age if not age or abs(patient_age - age) > 15]
+        if other:
+            yield None, other
+
+    def find_similar_cases(self, symptoms: List[str], patient_age: int = None, patient_gender: str = None, limit: int = 5,
+                           symptom_description: str = "") -> List[Dict]:
+        """Find similar patient cases based on symptoms, demographics and (if given) the free-text description"""
+        with self._lock:
+            if self._uses_description(symptom_description):
+                matches = self._blended_top_matches(symptoms, patient_age, symptom_description, limit)
+            elif self.ann_index is not None:
+                matches = self._indexed_top_matches(symptoms, patient_age, limit, self.ann_index.candidates(symptoms))
+            elif self.vector_scorer is not None:
+                matches = self.vector_scorer.top_matches(symptoms, patient_age, limit)
+            else:
+                matches = self._indexed_top_matches(symptoms, patient_age, limit)
+        return self._materialize(matches)
+
+    def find_similar_cases_batch(self, queries: List[tuple], limit: int = 5) -> List[List[Dict]]:
+        """find_similar_cases for many (symptoms, age) queries in one pass over the case index"""
+        with self._lock:
+            if self.ann_index is not None:
+                batch_matches = [self._indexed_top_matches(symptoms, age, limit, self.ann_index.candidates(symptoms))
+                                 for symptoms, age in queries]
+            elif self.vector_scorer is not None:
+                batch_matches = self.vector_scorer.top_matches_batch(queries, limit)
+            else:
+                batch_matches = [self._indexed_top_matches(symptoms, age, limit) for symptoms, age in queries]
+        return [self._materialize(matches) for matches in batch_matches]
+
+    @staticmethod
+    def _uses_description(symptom_description: Optional[str]) -> bool:
+        return AI_TEXT_WEIGHT > 0 and bool((symptom_description or "").strip())
+
+    def _blended_top_matches(self, symptoms: List[str], patient_age: Optional[int],
+                             symptom_description: str, limit: int) -> List[tuple]:
+        """Re-rank the best symptom and description matches by the blended score"""
+        if self.ann_index is not None:
+            symptom_matches = self._indexed_top_matches(symptoms, patient_age, AI_TEXT_POOL,
+                                                        self.ann_index.candidates(symptoms))
+        elif self.vector_scorer is not None:
+            symptom_matches = self.vector_scorer.top_matches(symptoms, patient_age, AI_TEXT_POOL)
+        else:
+            symptom_matches = self._indexed_top_matches(symptoms, patient_age, AI_TEXT_POOL)
+        text_matches = self.text_index.top_matches(symptom_description, AI_TEXT_POOL)
+        
+        symptom_scores = {position: score for score, position in symptom_matches}
+        for _, position in text_matches:
+            if position not in symptom_scores:
+                symptom_scores[position] = self._calculate_similarity(
+                    symptoms, self.scoring.signature(position), patient_age, self.scoring.age(position)
+                )
+        positions = sorted(symptom_scores)
+        text_scores = self.text_index.scores_for(symptom_description, positions)
+        
+        blended = []
+        for position, text_score in zip(positions, text_scores):
+            score = (1 - AI_TEXT_WEIGHT) * symptom_scores[position] + AI_TEXT_WEIGHT * float(text_score)
+            if score > 0.3:  # Minimum threshold
+                blended.append((score, position))
+        blended.sort(key=lambda match: (-match[0], match[1]))
+        return blended[:limit]
+
+    def _materialize(self, matches: List[tuple]) -> List[Dict]:
+        """Decode the matched cases' details and attach their similarity scores"""
         similar_cases = []
+        for similarity_score, position in matches:
+            case = self.patient_cases[position]  # a fresh dict per access
+            case["similarity_score"] = similarity_score
+            similar_cases.append(case)
+        return similar_cases
+
+    def _indexed_top_matches(self, symptoms: List[str], patient_age: Optional[int], limit: int,
+                             signatures: Optional[Set[frozenset]] = None) -> List[tuple]:
+        """(score, position) of the best cases above threshold among candidate symptom sets"""
+        if signatures is None:
+            # Exact search: only cases sharing a symptom can pass the threshold,
+            # without a common symptom the score is at most the 0.2 age bonus.
+            signatures = set()
+            for symptom in set(symptoms):
+                signatures.update(self.symptom_index.get(symptom, ()))
         
-        for case in self.patient_cases:
-            similarity_score = self._calculate_similarity(symptoms, case["symptoms"], patient_age, case["patient_age"])
-            if similarity_score > 0.3:  # Minimum threshold
-                case_copy = case.copy()
-                case_copy["similarity_score"] = similarity_score
-                similar_cases.append(case_copy)
+        # Visit symptom sets by the best score any of their cases can reach
+        ranked = sorted(
+            ((self._calculate_similarity(symptoms, signature, patient_age, patient_age), signature)
+             for signature in signatures),
+            key=lambda item: item[0], reverse=True
+        )
         
-        # Sort by similarity score (highest first)
-        similar_cases.sort(key=lambda x: x["similarity_score"], reverse=True)
-        return similar_cases[:5]  # Return top 5 matches
+        top = []  # min-heap of (score, -position)
+        for best_score, signature in ranked:
+            if best_score <= 0.3 or (len(top) == limit and top[0][0] > best_score):
+                break
+            by_age = self.case_groups[signature]
+            for tier_age, ages in self._age_tiers(patient_age, by_age):
+                similarity_score = self._calculate_similarity(symptoms, signature, patient_age, tier_age)
+                if similarity_score <= 0.3:  # Minimum threshold
+                    break
+                if len(top) == limit:
+                    if similarity_score < top[0][0]:
+                        break
+                    if similarity_score == top[0][0] and min(by_age[age][0] for age in ages) > -top[0][1]:
+                        continue
+                # Within a tier every case scores the same, so earlier cases win
+                for position in islice(heapq.merge(*(by_age[age] for age in ages)), limit):
+                    entry = (similarity_score, -position)
+                    if len(top) < limit:
+                        heapq.heappush(top, entry)
+                    elif entry > top[0]:
+                        heapq.heapreplace(top, entry)
+                    else:
+                        break
+        
+        # Sort by similarity score (highest first), earlier cases win ties
+        return [(similarity_score, -neg_position) for similarity_score, neg_position in sorted(top, reverse=True)]
 
     def _calculate_similarity(self, input_symptoms: List[str], case_symptoms: List[str], input_age: int = None, case_age: int = None) -> float:
-        """Calculate similarity score between input symptoms and case symptoms"""
+        """Calculate similarity score between input symptoms and case symptoms
+
+        Weights are summed in sorted symptom order, so the score is the same in
+        every process and engine. The original summed in set order, which
+        varies with string hashing; results can differ from it in the last bit
+        (e.g. 0.5 where it gave 0.49999999999999994).
+        """
         if not input_symptoms or not case_symptoms:
             return 0.0
         
@@ -290,7 +596,7 @@ class AIPatientDatabase:
         
         # Weight the score based on symptom importance
         weighted_score = 0
-        for symptom in common_symptoms:
+        for symptom in sorted(common_symptoms):
             weight = self.symptom_weights.get(symptom, 0.5)
             weighted_score += weight
         
@@ -307,10 +613,58 @@ class AIPatientDatabase:
         
         return min(symptom_score + age_bonus, 1.0)
 
+    @property
+    def case_base_version(self) -> tuple:
+        """Changes whenever the case base does: snapshot version and case count"""
+        return (self.snapshot.version if self.snapshot else 0, len(self.patient_cases))
+
     def get_ai_recommendations(self, symptoms: List[str], symptom_description: str = "", patient_age: int = None, patient_gender: str = None) -> Dict:
-        """Get AI-powered recommendations based on similar cases"""
-        similar_cases = self.find_similar_cases(symptoms, patient_age, patient_gender)
+        """Get AI-powered recommendations based on similar cases (memoized; treat the result as read-only)"""
+        key = self._profile_key(symptoms, patient_age, patient_gender, symptom_description)
+        result = self.recommendation_cache.get(key)
+        if result is None:
+            similar_cases = self.find_similar_cases(symptoms, patient_age, patient_gender,
+                                                    symptom_description=symptom_description)
+            result = self._recommendations_from_cases(similar_cases)
+            self.recommendation_cache.put(key, result)
+        return result
+
+    def get_ai_recommendations_batch(self, profiles: List[Dict]) -> List[Dict]:
+        """get_ai_recommendations for many profiles (dicts of its keyword arguments), in input order"""
+        results: List[Optional[Dict]] = [None] * len(profiles)
+        pending: Dict[tuple, List[int]] = {}
+        for i, profile in enumerate(profiles):
+            if self._uses_description(profile.get("symptom_description")):
+                # Description matching is per query; only symptom scoring is batched
+                results[i] = self.get_ai_recommendations(**profile_arguments(profile))
+                continue
+            key = self._profile_key(profile["symptoms"], profile.get("patient_age"), profile.get("patient_gender"))
+            results[i] = self.recommendation_cache.get(key)
+            if results[i] is None:
+                pending.setdefault(key, []).append(i)
         
+        # Identical profiles are scored once; the rest are scored together
+        keys = list(pending)
+        queries = [(profiles[pending[key][0]]["symptoms"], profiles[pending[key][0]].get("patient_age")) for key in keys]
+        for key, similar_cases in zip(keys, self.find_similar_cases_batch(queries)):
+            result = self._recommendations_from_cases(similar_cases)
+            self.recommendation_cache.put(key, result)
+            for i in pending[key]:
+                results[i] = result
+        return results
+
+    def _profile_key(self, symptoms: List[str], patient_age: Optional[int], patient_gender: Optional[str],
+                     symptom_description: Optional[str] = "") -> tuple:
+        """Cache key for a symptom profile; clears the cache when the case base changes"""
+        version = self.case_base_version
+        if version != self._cached_version:
+            self.recommendation_cache.clear()
+            self._cached_version = version
+        return (version,) + normalized_profile(symptoms, patient_age, patient_gender, symptom_description)
+
+    @classmethod
+    def _recommendations_from_cases(cls, similar_cases: List[Dict]) -> Dict:
+        """Build recommendations from the most similar cases"""
         if not similar_cases:
             return {
                 "risk_level": "unknown",
@@ -326,10 +680,10 @@ class AIPatientDatabase:
         diagnoses = [case["diagnosis"] for case in similar_cases[:3]]
         
         # Determine overall risk level
-        risk_level = self._determine_risk_level(risk_levels)
+        risk_level = cls._determine_risk_level(risk_levels)
         
         # Generate recommendations
-        recommendations = self._generate_recommendations(similar_cases[:3], risk_level)
+        recommendations = cls._generate_recommendations(similar_cases[:3], risk_level)
         
         return {
             "risk_level": risk_level,
@@ -340,7 +694,8 @@ class AIPatientDatabase:
             "emergency_required": risk_level in ["high", "critical"]
         }
 
-    def _determine_risk_level(self, risk_levels: List[str]) -> str:
+    @staticmethod
+    def _determine_risk_level(risk_levels: List[str]) -> str:
         """Determine overall risk level from multiple cases"""
         if "critical" in risk_levels:
             return "critical"
@@ -351,7 +706,8 @@ class AIPatientDatabase:
         else:
             return "low"
 
-    def _generate_recommendations(self, cases: List[Dict], risk_level: str) -> List[str]:
+    @staticmethod
+    def _generate_recommendations(cases: List[Dict], risk_level: str) -> List[str]:
         """Generate recommendations based on similar cases"""
         recommendations = []
         
@@ -386,5 +742,17 @@ class AIPatientDatabase:
         
         return recommendations
 
-# Initialize the database
-ai_patient_db = AIPatientDatabase()
+def normalized_profile(symptoms: List[str], patient_age: Optional[int], patient_gender: Optional[str],
+                       symptom_description: Optional[str] = "") -> tuple:
+    """Version-free part of a profile's cache key"""
+    # Scores ignore symptom order but not duplicates, and the age bonus
+    # needs the exact age, so those make up the normalized profile
+    uses_description = AIPatientDatabase._uses_description(symptom_description)
+    description = " ".join((symptom_description or "").lower().split()) if uses_description else ""
+    return (tuple(sorted(symptoms)), patient_age or None, (patient_gender or "").lower(), description)
+
+
+@lru_cache(maxsize=None)
+def get_ai_patient_db() -> AIPatientDatabase:
+    """The global case base, loaded on first use: only processes that search it pay for it"""
+    return AIPatientDatabase()
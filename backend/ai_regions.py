@@ -0,0 +1,284 @@
+#!/usr/bin/env python3
+"""
+Region-sharded AI case bases
+
+Villages are grouped into regions (typically districts), each with its own
+case store shard under AI_CASE_STORE_DIR/regions/<region>. A query searches
+the patient's own region first and widens to neighbouring regions, then to
+the global case base, only while too few close matches have been found.
+Shards are loaded on first use, in practice by the AI scoring workers as they
+start (see ai_worker.py), and each loads just the regions in AI_SERVED_REGIONS;
+the global case base is loaded only once a search falls back to it.
+
+Regions are defined in a JSON file (AI_REGIONS_FILE); without it the single
+global case base is used as before:
+    {
+      "bharatpur": {"villages": ["Bharatpur", "Ramgarh"], "neighbours": ["sultanpur"]},
+      "sultanpur": {"villages": ["Sultanpur"], "neighbours": ["bharatpur"]}
+    }
+
+Usage:
+    python ai_regions.py list
+    python ai_regions.py split cases.json   # import cases into their regions' shards
+"""
+
+import argparse
+import json
+import os
+import sys
+from functools import lru_cache
+from typing import Callable, Dict, List, Optional, Tuple
+
+from ai_cache import TTLCache
+from ai_patient_database import (
+    AIPatientDatabase, get_ai_patient_db, normalized_profile, profile_arguments, AI_CACHE_SIZE, AI_CACHE_TTL_SECONDS
+)
+from case_store import CaseStore, AI_CASE_STORE_DIR, region_store_path, read_cases_file
+
+AI_REGIONS_FILE = os.getenv("AI_REGIONS_FILE", "./ai_regions.json")
+# Comma-separated regions this process loads; empty loads every region
+AI_SERVED_REGIONS = [r.strip() for r in os.getenv("AI_SERVED_REGIONS", "").split(",") if r.strip()]
+# Widen the search while fewer than `limit` cases reach this similarity
+AI_REGION_MIN_SIMILARITY = float(os.getenv("AI_REGION_MIN_SIMILARITY", "0.5"))
+# Similarity multiplier for cases from outside the patient's region
+AI_REGION_NEIGHBOUR_WEIGHT = float(os.getenv("AI_REGION_NEIGHBOUR_WEIGHT", "0.9"))
+
+GLOBAL_REGION = "global"
+
+
+def _village_key(village: Optional[str]) -> str:
+    return " ".join((village or "").lower().split())
+
+
+class RegionMap:
+    """Village -> region assignment and each region's neighbours"""
+
+    def __init__(self, regions: Dict[str, Dict]):
+        self.neighbours: Dict[str, List[str]] = {}
+        self.region_of_village: Dict[str, str] = {}
+        for region, spec in regions.items():
+            if region == GLOBAL_REGION:
+                raise ValueError(f"'{GLOBAL_REGION}' is reserved for the global case base")
+            self.neighbours[region] = list(spec.get("neighbours", []))
+            for village in spec.get("villages", []):
+                other = self.region_of_village.setdefault(_village_key(village), region)
+                if other != region:
+                    raise ValueError(f"Village {village} is in both {other} and {region}")
+        for region, neighbours in self.neighbours.items():
+            unknown = [neighbour for neighbour in neighbours if neighbour not in self.neighbours]
+            if unknown:
+                raise ValueError(f"Region {region} has unknown neighbours: {', '.join(unknown)}")
+
+    @classmethod
+    def load(cls, path: str = AI_REGIONS_FILE) -> Optional["RegionMap"]:
+        """Region map from a JSON file; None if regions are not configured"""
+        if not os.path.exists(path):
+            return None
+        with open(path, encoding="utf-8") as f:
+            return cls(json.load(f))
+
+    @property
+    def regions(self) -> List[str]:
+        return list(self.neighbours)
+
+    def region_for(self, village: Optional[str]) -> Optional[str]:
+        return self.region_of_village.get(_village_key(village))
+
+
+class RegionalCaseBase:
+    """
+    The served region shards plus the global case base, searched nearest
+    first. Offers the get_ai_recommendations(_batch) interface of
+    AIPatientDatabase with an extra village argument.
+    """
+
+    def __init__(self, region_map: RegionMap, served: Optional[List[str]] = None,
+                 default: Optional[AIPatientDatabase] = None, root: str = AI_CASE_STORE_DIR):
+        self.region_map = region_map
+        self.root = root
+        served = served or region_map.regions
+        unknown = [region for region in served if region not in region_map.neighbours]
+        if unknown:
+            raise ValueError(f"Unknown served regions: {', '.join(unknown)}")
+        self.shards: Dict[str, AIPatientDatabase] = {region: self._load_shard(region) for region in served}
+        self._default = default
+        self.default_store = default.store if default is not None else CaseStore(root)
+        self.recommendation_cache = TTLCache(AI_CACHE_SIZE, AI_CACHE_TTL_SECONDS)
+
+    def _load_shard(self, region: str) -> AIPatientDatabase:
+        return AIPatientDatabase(store=CaseStore(region_store_path(region, self.root)), seed_cases=[])
+
+    @property
+    def default(self) -> AIPatientDatabase:
+        """The global case base, loaded on first use"""
+        if self._default is None:
+            self._default = get_ai_patient_db()
+        return self._default
+
+    def refresh(self) -> int:
+        """Index pending cases of every loaded case base; those whose snapshot moved on reload themselves"""
+        refreshed = sum(shard.refresh() for shard in self.shards.values())
+        return refreshed + (self._default.refresh() if self._default is not None else 0)
+
+    def _search_order(self, village: Optional[str]) -> List[Tuple[str, Optional[AIPatientDatabase], float]]:
+        """(region, case base, similarity weight) in the order they are searched; None is the global case base"""
+        home = self.region_map.region_for(village)
+        if home is None:
+            return [(GLOBAL_REGION, None, 1.0)]
+        order = [(region, self.shards[region], 1.0 if region == home else AI_REGION_NEIGHBOUR_WEIGHT)
+                 for region in [home] + self.region_map.neighbours[home] if region in self.shards]
+        return order + [(GLOBAL_REGION, None, AI_REGION_NEIGHBOUR_WEIGHT)]
+
+    def _version(self, case_base: Optional[AIPatientDatabase]) -> tuple:
+        """Version of a tier for cache keys; the global one is read from its store until it is loaded"""
+        if case_base is None and self._default is None:
+            return ("store",) + self.default_store.version_stamp()
+        return ("loaded",) + (case_base if case_base is not None else self._default).case_base_version
+
+    def _tiered_search(self, order: List[Tuple[str, Optional[AIPatientDatabase], float]], query_count: int,
+                       limit: int, search: Callable[[AIPatientDatabase, List[int]], List[List[Dict]]]) -> List[List[Dict]]:
+        """Top cases per query, widening to the next tier only for queries still short of close matches"""
+        found: List[List[Dict]] = [[] for _ in range(query_count)]
+        seen = [set() for _ in range(query_count)]
+        remaining = list(range(query_count))
+        for region, case_base, weight in order:
+            for i, cases in zip(remaining, search(case_base if case_base is not None else self.default, remaining)):
+                for case in cases:
+                    # A case copied into several case bases counts once, from the nearest
+                    if case.get("case_id") in seen[i]:
+                        continue
+                    seen[i].add(case.get("case_id"))
+                    case["similarity_score"] *= weight
+                    case["region"] = region
+                    found[i].append(case)
+            remaining = [
+                i for i in remaining
+                if sum(case["similarity_score"] >= AI_REGION_MIN_SIMILARITY for case in found[i]) < limit
+            ]
+            if not remaining:
+                break
+        # Stable sort: on equal scores nearer regions win
+        return [sorted(cases, key=lambda case: -case["similarity_score"])[:limit] for cases in found]
+
+    def find_similar_cases(self, symptoms: List[str], patient_age: int = None, patient_gender: str = None,
+                           limit: int = 5, symptom_description: str = "", village: Optional[str] = None) -> List[Dict]:
+        return self._tiered_search(
+            self._search_order(village), 1, limit,
+            lambda case_base, _: [case_base.find_similar_cases(symptoms, patient_age, patient_gender, limit,
+                                                               symptom_description=symptom_description)]
+        )[0]
+
+    def _profile_key(self, symptoms: List[str], patient_age: Optional[int], patient_gender: Optional[str],
+                     symptom_description: Optional[str] = "", village: Optional[str] = None) -> tuple:
+        """Cache key: the regions searched, their case base versions and the normalized profile"""
+        order = self._search_order(village)
+        return (tuple(region for region, _, _ in order), tuple(self._version(case_base) for _, case_base, _ in order),
+                normalized_profile(symptoms, patient_age, patient_gender, symptom_description))
+
+    def get_ai_recommendations(self, symptoms: List[str], symptom_description: str = "", patient_age: int = None,
+                               patient_gender: str = None, village: Optional[str] = None) -> Dict:
+        key = self._profile_key(symptoms, patient_age, patient_gender, symptom_description, village)
+        result = self.recommendation_cache.get(key)
+        if result is None:
+            similar_cases = self.find_similar_cases(symptoms, patient_age, patient_gender,
+                                                    symptom_description=symptom_description, village=village)
+            result = AIPatientDatabase._recommendations_from_cases(similar_cases)
+            self.recommendation_cache.put(key, result)
+        return result
+
+    def get_ai_recommendations_batch(self, profiles: List[Dict]) -> List[Dict]:
+        """get_ai_recommendations for many profiles, in input order"""
+        results: List[Optional[Dict]] = [None] * len(profiles)
+        pending: Dict[tuple, List[int]] = {}
+        for i, profile in enumerate(profiles):
+            arguments = profile_arguments(profile)
+            if AIPatientDatabase._uses_description(arguments["symptom_description"]):
+                # Description matching is per query; only symptom scoring is batched
+                results[i] = self.get_ai_recommendations(**arguments, village=profile.get("village"))
+                continue
+            key = self._profile_key(**arguments, village=profile.get("village"))
+            results[i] = self.recommendation_cache.get(key)
+            if results[i] is None:
+                pending.setdefault(key, []).append(i)
+
+        # Identical profiles are scored once; profiles searching the same regions together
+        by_regions: Dict[tuple, List[tuple]] = {}
+        for key in pending:
+            by_regions.setdefault(key[0], []).append(key)
+        for keys in by_regions.values():
+            firsts = [profiles[pending[key][0]] for key in keys]
+            queries = [(profile["symptoms"], profile.get("patient_age")) for profile in firsts]
+            found = self._tiered_search(
+                self._search_order(firsts[0].get("village")), len(queries), 5,
+                lambda case_base, indices: case_base.find_similar_cases_batch([queries[i] for i in indices])
+            )
+            for key, similar_cases in zip(keys, found):
+                result = AIPatientDatabase._recommendations_from_cases(similar_cases)
+                self.recommendation_cache.put(key, result)
+                for i in pending[key]:
+                    results[i] = result
+        return results
+
+    def stats(self) -> Dict:
+        return {
+            "served_regions": {region: len(shard.patient_cases) for region, shard in self.shards.items()},
+            "global_cases": len(self._default.patient_cases) if self._default is not None else None,
+            "cache": self.recommendation_cache.stats(),
+        }
+
+
+@lru_cache(maxsize=None)
+def configured_region_map() -> Optional[RegionMap]:
+    """Region map from AI_REGIONS_FILE, read once per process; None when regions are not configured"""
+    return RegionMap.load()
+
+
+@lru_cache(maxsize=None)
+def regional_case_base() -> Optional[RegionalCaseBase]:
+    """This process's served shards, loaded on first call; None when regions are not configured"""
+    region_map = configured_region_map()
+    return RegionalCaseBase(region_map, AI_SERVED_REGIONS) if region_map else None
+
+
+def case_store_for(village: Optional[str]) -> CaseStore:
+    """Store a case from this village belongs in, without loading any shard"""
+    region_map = configured_region_map()
+    region = region_map.region_for(village) if region_map else None
+    return CaseStore(region_store_path(region)) if region else CaseStore()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Manage region-sharded AI case bases")
+    parser.add_argument("--store", default=AI_CASE_STORE_DIR, help="case store directory")
+    parser.add_argument("--regions", default=AI_REGIONS_FILE, help="region map JSON file")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("list", help="list regions and their shards")
+    split_parser = commands.add_parser("split", help="import cases into the shards of their villages' regions")
+    split_parser.add_argument("path", help="JSON array or JSON-lines file of cases")
+    args = parser.parse_args(argv)
+
+    region_map = RegionMap.load(args.regions)
+    if region_map is None:
+        print(f"❌ No region map at {args.regions}")
+        return 1
+
+    if args.command == "list":
+        for region in region_map.regions:
+            snapshot = CaseStore(region_store_path(region, args.store)).load()
+            cases = snapshot.manifest["case_count"] if snapshot else 0
+            villages = sorted(v for v, r in region_map.region_of_village.items() if r == region)
+            print(f"{region:<20} {cases:>9} cases  neighbours: {', '.join(region_map.neighbours[region]) or '-'}  "
+                  f"villages: {', '.join(villages)}")
+    elif args.command == "split":
+        by_region: Dict[Optional[str], List[Dict]] = {}
+        for case in read_cases_file(args.path):
+            by_region.setdefault(region_map.region_for(case.get("village")), []).append(case)
+        for region, new_cases in by_region.items():
+            store = CaseStore(region_store_path(region, args.store) if region else args.store)
+            version = store.import_cases(new_cases, note=f"split {os.path.basename(args.path)}")
+            print(f"✅ {region or GLOBAL_REGION}: imported {len(new_cases)} cases into snapshot v{version:06d}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,103 @@
+"""
+TF-IDF retrieval over case symptom descriptions
+A sparse (cases x terms) TF-IDF matrix scored against free-text queries with
+sparse matrix products. The fitted vocabulary, idf weights and matrix are
+persisted with each case store snapshot (as JSON and numpy files, not pickles)
+so workers load them instead of refitting.
+"""
+
+import json
+import os
+from typing import Iterable, List, Optional, Tuple
+
+import numpy as np
+from scipy import sparse
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+# Added descriptions are vectorized in chunks of this size, so the raw text
+# is not kept around until the next query
+PENDING_CHUNK = 1024
+VOCABULARY_FILE = "tfidf_vocabulary.json"  # terms in matrix column order
+IDF_FILE = "tfidf_idf.npy"
+MATRIX_FILE = "tfidf_matrix.npz"
+VECTORIZER_PARAMS = {"sublinear_tf": True, "ngram_range": (1, 2), "strip_accents": "unicode"}
+
+
+class DescriptionIndex:
+    """Row-normalized TF-IDF matrix of case descriptions, in case position order"""
+
+    def __init__(self, vectorizer: TfidfVectorizer, matrix: sparse.csr_matrix):
+        self.vectorizer = vectorizer
+        self.matrix = matrix.tocsr()
+        self._pending: List[str] = []  # descriptions not yet vectorized
+        self._pending_rows: List[sparse.csr_matrix] = []  # vectorized chunks not yet stacked
+
+    @classmethod
+    def fit(cls, descriptions: Iterable[str]) -> "DescriptionIndex":
+        descriptions = [description or "" for description in descriptions]
+        vectorizer = TfidfVectorizer(**VECTORIZER_PARAMS)
+        try:
+            matrix = vectorizer.fit_transform(descriptions)
+        except ValueError:
+            # No usable terms at all: keep an index that never matches
+            vectorizer.fit(["symptom"])
+            matrix = sparse.csr_matrix((len(descriptions), len(vectorizer.vocabulary_)))
+        return cls(vectorizer, matrix)
+
+    @classmethod
+    def load(cls, path: str) -> Optional["DescriptionIndex"]:
+        """Index saved in a snapshot directory; None if the snapshot predates it (or saved it pickled)"""
+        vocabulary_path = os.path.join(path, VOCABULARY_FILE)
+        if not os.path.exists(vocabulary_path):
+            return None
+        with open(vocabulary_path, encoding="utf-8") as f:
+            vectorizer = TfidfVectorizer(**VECTORIZER_PARAMS, vocabulary=json.load(f))
+        vectorizer.idf_ = np.load(os.path.join(path, IDF_FILE))
+        return cls(vectorizer, sparse.load_npz(os.path.join(path, MATRIX_FILE)))
+
+    def save(self, path: str):
+        self._stack_pending()
+        with open(os.path.join(path, VOCABULARY_FILE), "w", encoding="utf-8") as f:
+            json.dump(self.vectorizer.get_feature_names_out().tolist(), f, ensure_ascii=False)
+        np.save(os.path.join(path, IDF_FILE), self.vectorizer.idf_)
+        sparse.save_npz(os.path.join(path, MATRIX_FILE), self.matrix)
+
+    def __len__(self) -> int:
+        return self.matrix.shape[0] + sum(rows.shape[0] for rows in self._pending_rows) + len(self._pending)
+
+    def add(self, description: str):
+        """Append a case description; terms unseen at fit time are ignored until the next snapshot"""
+        self._pending.append(description or "")
+        if len(self._pending) >= PENDING_CHUNK:
+            self._vectorize_pending()
+
+    def _vectorize_pending(self):
+        if self._pending:
+            self._pending_rows.append(self.vectorizer.transform(self._pending))
+            self._pending = []
+
+    def _stack_pending(self):
+        self._vectorize_pending()
+        if self._pending_rows:
+            self.matrix = sparse.vstack([self.matrix] + self._pending_rows, format="csr")
+            self._pending_rows = []
+
+    def _query_vector(self, text: str) -> sparse.csr_matrix:
+        return self.vectorizer.transform([text or ""]).T.tocsc()
+
+    def top_matches(self, text: str, limit: int) -> List[Tuple[float, int]]:
+        """(cosine similarity, position) of the best matching cases, earlier cases winning ties"""
+        self._stack_pending()
+        scores = (self.matrix @ self._query_vector(text)).tocoo()
+        positions, values = scores.row, scores.data
+        keep = values > 0
+        positions, values = positions[keep], values[keep]
+        order = np.lexsort((positions, -values))[:limit]
+        return [(float(values[i]), int(positions[i])) for i in order]
+
+    def scores_for(self, text: str, positions: List[int]) -> np.ndarray:
+        """Cosine similarity of the query to the given cases"""
+        self._stack_pending()
+        if not positions:
+            return np.zeros(0)
+        return (self.matrix[positions] @ self._query_vector(text)).toarray().ravel()
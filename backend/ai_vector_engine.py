@@ -0,0 +1,143 @@
+"""
+Vectorized NumPy scoring engine for AI case matching
+Scores every case in one pass over a sparse (column-wise) symptom matrix
+"""
+
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+
+class _GrowableArray:
+    """NumPy array with amortized O(1) appends"""
+
+    __slots__ = ("data", "size")
+
+    def __init__(self, dtype, capacity: int = 16):
+        self.data = np.empty(capacity, dtype=dtype)
+        self.size = 0
+
+    @classmethod
+    def wrap(cls, values: np.ndarray, dtype) -> "_GrowableArray":
+        array = cls(dtype, capacity=max(len(values), 1))
+        array.data[:len(values)] = values
+        array.size = len(values)
+        return array
+
+    def append(self, value):
+        if self.size == self.data.size:
+            grown = np.empty(self.data.size * 2, dtype=self.data.dtype)
+            grown[:self.size] = self.data[:self.size]
+            self.data = grown
+        self.data[self.size] = value
+        self.size += 1
+
+    def view(self) -> np.ndarray:
+        return self.data[:self.size]
+
+
+class VectorizedCaseScorer:
+    """
+    Column-wise sparse symptom matrix with a weight vector and an age array.
+    Scores match AIPatientDatabase._calculate_similarity exactly: weights are
+    accumulated in the same (sorted symptom) order with the same float64 math.
+    """
+
+    def __init__(self, symptom_weights: Dict[str, float]):
+        self.symptom_weights = symptom_weights
+        self.symptom_ids: Dict[str, int] = {}
+        self.postings: List[_GrowableArray] = []  # symptom id -> case positions
+        self.weights = _GrowableArray(np.float64)  # symptom id -> weight
+        self.ages = _GrowableArray(np.int64)  # case position -> age (0 if unknown)
+
+    def add(self, position: int, case: Dict):
+        """Append a case; positions must be added in order"""
+        assert position == self.ages.size, "cases must be added in order"
+        for symptom in set(case["symptoms"]):
+            symptom_id = self.symptom_ids.get(symptom)
+            if symptom_id is None:
+                symptom_id = self.symptom_ids[symptom] = len(self.postings)
+                self.postings.append(_GrowableArray(np.int64))
+                self.weights.append(self.symptom_weights.get(symptom, 0.5))
+            self.postings[symptom_id].append(position)
+        self.ages.append(case["patient_age"] or 0)
+
+    def load_columns(self, symptoms: List[str], postings: List[np.ndarray], ages: np.ndarray):
+        """Bulk-load an empty scorer from column arrays (e.g. a case store snapshot)"""
+        assert self.ages.size == 0, "load_columns needs an empty scorer"
+        for symptom, positions in zip(symptoms, postings):
+            self.symptom_ids[symptom] = len(self.postings)
+            self.postings.append(_GrowableArray.wrap(positions, np.int64))
+            self.weights.append(self.symptom_weights.get(symptom, 0.5))
+        self.ages = _GrowableArray.wrap(ages, np.int64)
+
+    def score_all(self, symptoms: List[str], patient_age: Optional[int] = None) -> np.ndarray:
+        """Similarity score of every case, as _calculate_similarity would compute it"""
+        ages = self.ages.view()
+        weighted = np.zeros(ages.size)
+        if not symptoms:
+            return weighted
+        weights = self.weights.view()
+        for symptom in sorted(set(symptoms)):
+            symptom_id = self.symptom_ids.get(symptom)
+            if symptom_id is not None:
+                weighted[self.postings[symptom_id].view()] += weights[symptom_id]
+        scores = weighted / len(symptoms)
+
+        if patient_age:
+            age_diff = np.abs(ages - patient_age)
+            age_bonus = np.where(age_diff <= 5, 0.2, np.where(age_diff <= 15, 0.1, 0.0))
+            scores += np.where(ages != 0, age_bonus, 0.0)
+        return np.minimum(scores, 1.0)
+
+    def score_batch(self, queries: List[Tuple[List[str], Optional[int]]]) -> np.ndarray:
+        """Scores of every case (rows) for several (symptoms, age) queries (columns) in one pass"""
+        ages = self.ages.view()
+        weighted = np.zeros((ages.size, len(queries)))
+        columns_by_symptom: Dict[str, List[int]] = {}
+        for column, (symptoms, _) in enumerate(queries):
+            for symptom in set(symptoms):
+                columns_by_symptom.setdefault(symptom, []).append(column)
+        
+        # Visiting symptoms in sorted order keeps every column's sum identical
+        # to the single-query path
+        weights = self.weights.view()
+        for symptom in sorted(columns_by_symptom):
+            symptom_id = self.symptom_ids.get(symptom)
+            if symptom_id is not None:
+                rows = self.postings[symptom_id].view()
+                weighted[np.ix_(rows, columns_by_symptom[symptom])] += weights[symptom_id]
+        lengths = np.array([len(symptoms) or 1 for symptoms, _ in queries])
+        scores = weighted / lengths
+
+        query_ages = np.array([age or 0 for _, age in queries])
+        if query_ages.any():
+            age_diff = np.abs(ages[:, None] - query_ages[None, :])
+            age_bonus = np.where(age_diff <= 5, 0.2, np.where(age_diff <= 15, 0.1, 0.0))
+            scores += np.where((ages[:, None] != 0) & (query_ages[None, :] != 0), age_bonus, 0.0)
+        return np.minimum(scores, 1.0)
+
+    def top_matches(self, symptoms: List[str], patient_age: Optional[int] = None,
+                    limit: int = 5, threshold: float = 0.3) -> List[Tuple[float, int]]:
+        """(score, position) of the best cases above threshold, earlier cases winning ties"""
+        return self._select(self.score_all(symptoms, patient_age), limit, threshold)
+
+    def top_matches_batch(self, queries: List[Tuple[List[str], Optional[int]]], limit: int = 5,
+                          threshold: float = 0.3, chunk_size: int = 32) -> List[List[Tuple[float, int]]]:
+        """top_matches for many queries, scored chunk by chunk to bound memory"""
+        results = []
+        for start in range(0, len(queries), chunk_size):
+            scores = self.score_batch(queries[start:start + chunk_size])
+            results.extend(self._select(scores[:, column], limit, threshold) for column in range(scores.shape[1]))
+        return results
+
+    @staticmethod
+    def _select(scores: np.ndarray, limit: int, threshold: float) -> List[Tuple[float, int]]:
+        candidates = np.flatnonzero(scores > threshold)
+        if candidates.size > limit:
+            # Keep everything tied with the k-th best so ties resolve by position
+            best = np.argpartition(-scores[candidates], limit - 1)[:limit]
+            kth_score = scores[candidates[best]].min()
+            candidates = candidates[scores[candidates] >= kth_score]
+        order = np.lexsort((candidates, -scores[candidates]))[:limit]
+        return [(float(scores[position]), int(position)) for position in candidates[order]]
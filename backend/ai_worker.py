@@ -0,0 +1,225 @@
+"""
+Runs CPU-bound AI scoring in a dedicated process pool so it never blocks
+the event loop, with a concurrency limit, a timeout and a degraded answer
+under overload.
+"""
+
+import asyncio
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+from ai_cache import TTLCache
+from ai_patient_database import (AI_CACHE_SIZE, AI_CACHE_TTL_SECONDS, get_ai_patient_db, normalized_profile,
+                                 profile_arguments)
+from ai_regions import RegionalCaseBase, configured_region_map, regional_case_base
+from case_store import CaseStore
+from symptom_matcher import symptom_matcher
+
+AI_WORKER_PROCESSES = int(os.getenv("AI_WORKER_PROCESSES", "2"))  # 0 = run in a thread instead
+AI_MAX_CONCURRENCY = int(os.getenv("AI_MAX_CONCURRENCY", "8"))  # jobs in flight before callers wait
+AI_MAX_WAITING = int(os.getenv("AI_MAX_WAITING", "32"))  # waiting callers before answers degrade
+AI_TIMEOUT_SECONDS = float(os.getenv("AI_TIMEOUT_SECONDS", "5"))
+
+# Case base of this pool worker (or of the server process in thread mode),
+# or its region shards when regions are configured; set by _init_worker
+_worker_db = None
+
+
+def _init_worker():
+    """Pool initializer: region shards are loaded only in the processes that score"""
+    global _worker_db
+    _worker_db = regional_case_base() or get_ai_patient_db()
+
+
+def _database():
+    """Worker's case base, kept in step with the shared case store"""
+    if _worker_db is None:
+        _init_worker()
+    _worker_db.refresh()  # reloads itself once a new snapshot is current
+    return _worker_db
+
+
+def _worker_stats(case_base) -> Dict:
+    """Cache metrics and case base version of the process that just scored"""
+    if isinstance(case_base, RegionalCaseBase):
+        stats = case_base.stats()
+        stats["case_base_version"] = {region: list(case_base._version(shard)) for region, shard in case_base.shards.items()}
+        stats["case_base_version"]["global"] = list(case_base._version(None))
+        stats["case_count"] = sum(stats["served_regions"].values()) + (stats["global_cases"] or 0)
+    else:
+        stats = {"cache": case_base.recommendation_cache.stats(),
+                 "case_base_version": list(case_base.case_base_version),
+                 "case_count": len(case_base.patient_cases)}
+    stats["pid"] = os.getpid()
+    return stats
+
+
+def _recommend_batch(profiles: List[Dict]) -> Tuple[List[Dict], Dict]:
+    """Recommendations, plus this worker's stats for the dispatcher to report"""
+    case_base = _database()
+    return case_base.get_ai_recommendations_batch(profiles), _worker_stats(case_base)
+
+
+def degraded_recommendations(symptoms: List[str]) -> Dict:
+    """Rule-based answer used when the AI workers are overloaded or too slow"""
+    matched = symptom_matcher.match_symptoms(symptoms)
+    urgent = bool(matched.get("emergency") or matched.get("red_flag"))
+    recommendations = ["Consult a doctor for proper diagnosis"]
+    if urgent:
+        recommendations.insert(0, "⚠️ Seek immediate medical attention")
+    return {
+        "risk_level": "high" if urgent else "unknown",
+        "possible_conditions": [],
+        "recommendations": recommendations,
+        "similar_cases": [],
+        "confidence": 0.0,
+        "emergency_required": urgent,
+        "degraded": True
+    }
+
+
+class AIDispatcher:
+    """Sends AI scoring jobs to the process pool from async endpoints"""
+
+    def __init__(self, processes: int = AI_WORKER_PROCESSES, max_concurrency: int = AI_MAX_CONCURRENCY,
+                 max_waiting: int = AI_MAX_WAITING, timeout_seconds: float = AI_TIMEOUT_SECONDS):
+        self.processes = processes
+        self.max_concurrency = max_concurrency
+        self.max_waiting = max_waiting
+        self.timeout_seconds = timeout_seconds
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self.waiting = 0
+        self.completed = 0
+        self.degraded = 0
+        self.timeouts = 0
+        # Latest stats each worker returned with a job, by process id
+        self.worker_stats: Dict[int, Dict] = {}
+        # Checked before sending a job; keyed on the case store version, so this
+        # process never loads the case base itself
+        self.front_cache = TTLCache(AI_CACHE_SIZE, AI_CACHE_TTL_SECONDS)
+        self._case_store = CaseStore()
+
+    def _executor(self) -> Optional[ProcessPoolExecutor]:
+        if self.processes and self._pool is None:
+            # spawn: forking a threaded server process can deadlock
+            self._pool = ProcessPoolExecutor(self.processes, mp_context=multiprocessing.get_context("spawn"),
+                                             initializer=_init_worker)
+        return self._pool
+
+    def _profile_key(self, profile: Dict) -> Optional[tuple]:
+        """Front cache key; None with regions configured, whose shard versions only the workers know"""
+        if configured_region_map() is not None:
+            return None
+        return (self._case_store.version_stamp(),) + normalized_profile(**profile_arguments(profile))
+
+    def start(self):
+        """Start the workers and load their case bases ahead of the first request"""
+        pool = self._executor()
+        if pool is not None:
+            for _ in range(self.processes):
+                pool.submit(_database)
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    def _release_slot(self, job: asyncio.Future):
+        self._semaphore.release()
+        if not job.cancelled():
+            job.exception()  # retrieved, so abandoned jobs do not log "never retrieved"
+
+    async def recommend(self, profile: Dict) -> Dict:
+        return (await self.recommend_batch([profile]))[0]
+
+    async def recommend_batch(self, profiles: List[Dict]) -> List[Dict]:
+        """get_ai_recommendations for each profile, degraded when overloaded or timed out"""
+        front_cache = self.front_cache
+        results: List[Optional[Dict]] = []
+        misses = []
+        for profile in profiles:
+            key = self._profile_key(profile)
+            results.append(front_cache.get(key) if key is not None else None)
+            if results[-1] is None:
+                misses.append((len(results) - 1, key))
+        if not misses:
+            return results
+
+        def degrade(reason_counter: str):
+            setattr(self, reason_counter, getattr(self, reason_counter) + 1)
+            for i, _ in misses:
+                results[i] = degraded_recommendations(profiles[i]["symptoms"])
+            return results
+
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        if self._semaphore.locked() and self.waiting >= self.max_waiting:
+            return degrade("degraded")
+
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), self.timeout_seconds)
+        except asyncio.TimeoutError:
+            return degrade("timeouts")
+        finally:
+            self.waiting -= 1
+
+        try:
+            loop = asyncio.get_running_loop()
+            job_profiles = [profiles[i] for i, _ in misses]
+            if self._executor() is not None:
+                job = loop.run_in_executor(self._executor(), _recommend_batch, job_profiles)
+            else:
+                job = loop.run_in_executor(None, _recommend_batch, job_profiles)
+        except BaseException:
+            self._semaphore.release()
+            raise
+        # The slot is held until the job itself finishes, not just until this caller
+        # stops waiting, so timed-out jobs still count against max_concurrency
+        job.add_done_callback(self._release_slot)
+        try:
+            job_results, worker_stats = await asyncio.wait_for(asyncio.shield(job), self.timeout_seconds)
+        except asyncio.TimeoutError:
+            return degrade("timeouts")
+
+        self.completed += 1
+        self.worker_stats[worker_stats["pid"]] = worker_stats
+        for (i, key), result in zip(misses, job_results):
+            if key is not None:
+                front_cache.put(key, result)
+            results[i] = result
+        return results
+
+    def stats(self) -> Dict:
+        return {
+            "worker_processes": self.processes,
+            "max_concurrency": self.max_concurrency,
+            "timeout_seconds": self.timeout_seconds,
+            "waiting": self.waiting,
+            "completed": self.completed,
+            "degraded": self.degraded,
+            "timeouts": self.timeouts
+        }
+
+    def cases_analyzed(self) -> Optional[int]:
+        """Cases the workers scored against in their last jobs; None before any job finished"""
+        counts = [worker["case_count"] for worker in self.worker_stats.values()]
+        return max(counts) if counts else None
+
+    def worker_cache_stats(self) -> Dict:
+        """Recommendation cache metrics summed over the workers, as of each one's last job"""
+        workers = list(self.worker_stats.values())
+        totals = {
+            name: sum(worker["cache"][name] for worker in workers)
+            for name in ("size", "hits", "misses", "evictions", "invalidations")
+        }
+        lookups = totals["hits"] + totals["misses"]
+        totals["hit_rate"] = round(totals["hits"] / lookups, 4) if lookups else 0.0
+        totals["workers"] = workers
+        return totals
+
+
+ai_dispatcher = AIDispatcher()
@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+"""
+Script to fill the record_symptoms token table for records written before it
+existed (or, after the alias table changed and backfill_symptom_ids.py --all
+ran, to rewrite it). Safe to re-run: each batch replaces its records' rows.
+"""
+
+from database import SessionLocal, create_tables
+from models import Record, RecordSymptom
+from record_analytics import record_symptom_rows
+
+BATCH_SIZE = 500
+
+def backfill_record_symptoms():
+    """Rewrite the token rows of every record, batch by batch"""
+    create_tables()  # creates record_symptoms in older databases
+    db = SessionLocal()
+
+    try:
+        written = 0
+        records = 0
+        last_id = 0
+        while True:
+            batch = db.query(Record).filter(Record.id > last_id).order_by(Record.id).limit(BATCH_SIZE).all()
+            if not batch:
+                break
+            connection = db.connection()
+            connection.execute(RecordSymptom.__table__.delete().where(
+                RecordSymptom.record_id.in_([record.id for record in batch])
+            ))
+            rows = [row for record in batch for row in record_symptom_rows(connection, record)]
+            if rows:
+                connection.execute(RecordSymptom.__table__.insert(), rows)
+            db.commit()
+            written += len(rows)
+            records += len(batch)
+            last_id = batch[-1].id
+        print(f"✅ record_symptoms: wrote {written} symptom rows for {records} records")
+
+    except Exception as e:
+        print(f"❌ Error backfilling record symptoms: {e}")
+        db.rollback()
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    backfill_record_symptoms()
@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+"""
+Script to fill canonical symptom ids for records and queue entries written
+before symptom normalization existed (or, with --all, after the alias table
+changed)
+"""
+
+import argparse
+
+from database import SessionLocal
+from models import SYMPTOM_TEXT_COLUMNS
+from symptom_normalizer import normalize_symptoms, encode_symptom_ids
+from upgrade_database import upgrade_database
+
+BATCH_SIZE = 500
+
+def backfill_symptom_ids(renormalize_all: bool = False):
+    """Normalize symptom text into symptom_ids, batch by batch"""
+    upgrade_database()  # adds the symptom_ids columns to older databases
+    db = SessionLocal()
+
+    try:
+        for model, text_column in SYMPTOM_TEXT_COLUMNS.items():
+            updated = 0
+            last_id = 0
+            while True:
+                query = db.query(model).filter(model.id > last_id)
+                if not renormalize_all:
+                    query = query.filter(model.symptom_ids.is_(None))
+                rows = query.order_by(model.id).limit(BATCH_SIZE).all()
+                if not rows:
+                    break
+                for row in rows:
+                    text = getattr(row, text_column)
+                    row.symptom_ids = encode_symptom_ids(normalize_symptoms(text)) if text else None
+                db.commit()
+                updated += len(rows)
+                last_id = rows[-1].id
+            print(f"✅ {model.__tablename__}: normalized {updated} rows")
+
+    except Exception as e:
+        print(f"❌ Error backfilling symptom ids: {e}")
+        db.rollback()
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--all", action="store_true", help="re-normalize rows that already have ids")
+    args = parser.parse_args()
+    backfill_symptom_ids(renormalize_all=args.all)
@@ -0,0 +1,39 @@
+#!/usr/bin/env python3
+"""
+Script to fill patients.village_key, the normalized village name that village
+filters match on, for patients written before the column existed
+"""
+
+from database import SessionLocal
+from models import Patient, normalize_village
+from upgrade_database import upgrade_database
+
+BATCH_SIZE = 500
+
+def backfill_village_keys():
+    """Normalize each patient's village into village_key, batch by batch"""
+    upgrade_database()  # adds the village_key column to older databases
+    db = SessionLocal()
+
+    try:
+        updated = 0
+        last_id = 0
+        while True:
+            rows = db.query(Patient).filter(Patient.id > last_id).order_by(Patient.id).limit(BATCH_SIZE).all()
+            if not rows:
+                break
+            for row in rows:
+                row.village_key = normalize_village(row.village) or None
+            db.commit()
+            updated += len(rows)
+            last_id = rows[-1].id
+        print(f"✅ patients: normalized {updated} villages")
+
+    except Exception as e:
+        print(f"❌ Error backfilling village keys: {e}")
+        db.rollback()
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    backfill_village_keys()
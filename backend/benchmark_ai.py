@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+"""
+Benchmark suite for the AI subsystem on synthetic case bases of increasing size
+
+Measures throughput and mean/p50/p99 latency of find_similar_cases,
+get_ai_recommendations (cold and cached), utils.analyze_symptoms_ai and
+utils.prioritize_queue, plus the memory used by each case base. Every size
+runs in its own process so memory figures do not leak between sizes.
+Results are printed as a table and, with --output, written as JSON so runs
+can be compared over time.
+
+Usage: python benchmark_ai.py [--sizes 10,100,1000,10000,100000,1000000] [--queries 200]
+                              [--engine python|numpy] [--output results.json]
+"""
+
+import argparse
+import gc
+import json
+import multiprocessing
+import os
+import platform
+import random
+import resource
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+from ai_patient_database import AIPatientDatabase, BUILTIN_PATIENT_CASES
+from case_store import CaseStore
+
+QUEUE_TEXTS = [
+    "Sudden chest pain and shortness of breath",
+    "High fever with chills for 3 days",
+    "Severe abdominal pain and vomiting",
+    "Persistent headache and nausea",
+    "Skin infection with swelling",
+    "Mild cough and sore throat",
+    "खांसी और बुखार",
+]
+
+
+def build_synthetic_db(size: int, seed: int = 42, engine: str = "python") -> AIPatientDatabase:
+    """Grow the built-in case base to `size` cases by perturbing the templates"""
+    rng = random.Random(seed)
+    # A private store keeps the benchmark independent of local snapshots;
+    # case bases smaller than the built-in one are loaded from a snapshot
+    store_dir = tempfile.mkdtemp(prefix="benchmark_ai_")
+    store = CaseStore(store_dir)
+    if size < len(BUILTIN_PATIENT_CASES):
+        store.write_snapshot(BUILTIN_PATIENT_CASES[:size])
+    db = AIPatientDatabase(engine=engine, store=store)
+    shutil.rmtree(store_dir, ignore_errors=True)
+    templates = list(db.patient_cases[:len(BUILTIN_PATIENT_CASES)])
+    vocabulary = sorted(db.symptom_index)
+
+    while len(db.patient_cases) < size:
+        template = rng.choice(templates)
+        symptoms = list(template["symptoms"])
+        if rng.random() < 0.5:
+            symptoms.pop(rng.randrange(len(symptoms)))
+        if rng.random() < 0.3:
+            symptoms.append(rng.choice(vocabulary))
+        case = dict(template)
+        case["case_id"] = f"SYN{len(db.patient_cases):07d}"
+        case["patient_age"] = max(1, min(90, template["patient_age"] + rng.randint(-20, 20)))
+        case["symptoms"] = symptoms
+        db.add_case(case)
+    return db
+
+
+def sample_queries(db: AIPatientDatabase, count: int, seed: int = 7) -> list:
+    """Draw symptom queries shaped like the built-in cases"""
+    rng = random.Random(seed)
+    queries = []
+    for _ in range(count):
+        template = rng.choice(BUILTIN_PATIENT_CASES)
+        k = rng.randint(1, len(template["symptoms"]))
+        queries.append((rng.sample(template["symptoms"], k), rng.randint(5, 80)))
+    return queries
+
+
+def rss_mb() -> float:
+    """Current resident set size (peak RSS where /proc is unavailable)"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except OSError:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 2**20 if sys.platform == "darwin" else peak / 2**10
+
+
+def measure(operation, inputs, before_each=None, warmup: bool = False) -> dict:
+    """Latency percentiles (ms) and throughput (ops/s) of operation over inputs"""
+    if warmup:
+        for item in inputs:
+            operation(item)
+    latencies = []
+    for item in inputs:
+        if before_each:
+            before_each()
+        start = time.perf_counter()
+        operation(item)
+        latencies.append((time.perf_counter() - start) * 1000)
+    latencies.sort()
+    total_seconds = sum(latencies) / 1000
+    return {
+        "calls": len(latencies),
+        "throughput_ops": round(len(latencies) / total_seconds, 1) if total_seconds else None,
+        "mean_ms": round(statistics.mean(latencies), 4),
+        "p50_ms": round(statistics.median(latencies), 4),
+        "p99_ms": round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))], 4),
+    }
+
+
+def benchmark_size(size: int, query_count: int, engine: str) -> dict:
+    """All measurements for one case base size (run in a fresh process)"""
+    import utils
+
+    gc.collect()
+    rss_before = rss_mb()
+    start = time.perf_counter()
+    db = build_synthetic_db(size, engine=engine)
+    build_seconds = time.perf_counter() - start
+    gc.collect()
+    rss_after = rss_mb()
+
+    queries = sample_queries(db, query_count)
+    # Point the legacy helpers at the synthetic case base
+    utils.get_ai_patient_db = lambda: db
+
+    operations = {
+        "find_similar_cases": measure(lambda q: db.find_similar_cases(q[0], q[1]), queries),
+        "get_ai_recommendations_cold": measure(
+            lambda q: db.get_ai_recommendations(q[0], patient_age=q[1]), queries,
+            before_each=db.recommendation_cache.clear
+        ),
+        "get_ai_recommendations_cached": measure(
+            lambda q: db.get_ai_recommendations(q[0], patient_age=q[1]), queries, warmup=True
+        ),
+        "analyze_symptoms_ai": measure(
+            lambda q: utils.analyze_symptoms_ai(q[0], patient_age=q[1]), queries,
+            before_each=db.recommendation_cache.clear
+        ),
+        "prioritize_queue": measure(
+            lambda item: utils.prioritize_queue(*item),
+            [(QUEUE_TEXTS[i % len(QUEUE_TEXTS)], 5 + i % 80) for i in range(query_count)]
+        ),
+    }
+    return {
+        "cases": len(db.patient_cases),
+        "symptom_sets": len(db.case_groups),
+        "build_s": round(build_seconds, 3),
+        "memory_mb": round(rss_after - rss_before, 1),
+        "rss_mb": round(rss_after, 1),
+        "operations": operations,
+    }
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except OSError:
+        return ""
+
+
+def run(sizes, query_count: int, engine: str = "python", output: str = None) -> dict:
+    results = {
+        "benchmark": "ai",
+        "timestamp": datetime.utcnow().isoformat(),
+        "git_commit": _git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "engine": engine,
+        "queries": query_count,
+        "sizes": [],
+    }
+    print(f"{'cases':>10} {'build_s':>8} {'mem_mb':>8}  {'operation':<30} {'ops/s':>10} {'p50_ms':>9} {'p99_ms':>9}")
+    context = multiprocessing.get_context("spawn")
+    for size in sizes:
+        with context.Pool(1) as pool:
+            result = pool.apply(benchmark_size, (size, query_count, engine))
+        results["sizes"].append(result)
+        for i, (name, stats) in enumerate(result["operations"].items()):
+            prefix = f"{result['cases']:>10} {result['build_s']:>8.2f} {result['memory_mb']:>8.1f}" if i == 0 else " " * 28
+            print(f"{prefix}  {name:<30} {stats['throughput_ops']:>10} {stats['p50_ms']:>9.3f} {stats['p99_ms']:>9.3f}")
+
+    if output:
+        with open(output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {output}")
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the AI subsystem")
+    parser.add_argument("--sizes", default="10,100,1000,10000,100000,1000000")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--engine", choices=["python", "numpy"], default="python")
+    parser.add_argument("--output", help="write machine-readable results to this JSON file")
+    args = parser.parse_args()
+    run([int(s) for s in args.sizes.split(",")], args.queries, args.engine, args.output)
@@ -0,0 +1,74 @@
+"""
+Incremental learning: turn finalized health records into AI cases
+Runs as a background task after a record is committed, so record creation
+latency is unaffected.
+"""
+
+from typing import Dict, Optional
+
+from database import SessionLocal
+from models import Record, Patient, Doctor
+from ai_regions import case_store_for
+from utils import prioritize_queue
+from symptom_normalizer import normalize_symptoms, decode_symptom_ids
+
+# Priority from utils.prioritize_queue -> case severity
+PRIORITY_SEVERITY = {4: "critical", 3: "moderate", 2: "moderate", 1: "low"}
+
+
+def derive_severity(record: Record, patient: Optional[Patient]) -> str:
+    """Severity from the emergency flag and the queue triage rules"""
+    priority = prioritize_queue(
+        f"{record.symptoms or ''} {record.diagnosis or ''}",
+        patient.age if patient else None
+    )
+    severity = PRIORITY_SEVERITY.get(priority, "low")
+    if record.is_emergency and severity != "critical":
+        severity = "high"
+    return severity
+
+
+def record_to_case(record: Record, patient: Optional[Patient], doctor: Optional[Doctor]) -> Optional[Dict]:
+    """Build a case from a finalized record; None if the record is not finalized"""
+    if not record.diagnosis or not record.symptoms:
+        return None
+    symptoms = decode_symptom_ids(record.symptom_ids) or normalize_symptoms(record.symptoms)
+    if not symptoms:
+        return None
+
+    return {
+        "case_id": f"REC{record.id:06d}",
+        "patient_age": patient.age if patient else None,
+        "patient_gender": patient.gender if patient else None,
+        "village": patient.village if patient else None,
+        "symptoms": symptoms,
+        "symptom_description": record.symptoms,
+        "diagnosis": record.diagnosis,
+        "treatment": record.prescriptions or "",
+        "doctor_name": doctor.user.name if doctor and doctor.user else "",
+        "doctor_quote": record.notes or "",
+        "consultation_date": record.created_at.strftime("%Y-%m-%d") if record.created_at else None,
+        "recovery_time": "unknown",
+        "severity": derive_severity(record, patient),
+        "source_record_id": record.id
+    }
+
+
+def ingest_record(record_id: int):
+    """Background task: add a committed record to the AI case base"""
+    db = SessionLocal()
+    try:
+        record = db.query(Record).filter(Record.id == record_id).first()
+        if not record:
+            return
+        patient = db.query(Patient).filter(Patient.id == record.patient_id).first()
+        doctor = db.query(Doctor).filter(Doctor.id == record.doctor_id).first()
+        case = record_to_case(record, patient, doctor)
+        if case is None:
+            return
+        # The pending log is the source of truth; every scoring worker indexes from it
+        case_store_for(case["village"]).append_pending(case)
+    except Exception as e:
+        print(f"AI case ingestion failed for record {record_id}: {e}")
+    finally:
+        db.close()
@@ -0,0 +1,592 @@
+#!/usr/bin/env python3
+"""
+Persistent, versioned case store for the AI patient database
+
+Each snapshot is an immutable directory of columnar arrays (memory-mapped
+on load) plus a JSON-lines detail file read by byte offset, so startup only
+touches the scoring columns and case details are decoded on demand.
+
+Usage:
+    python case_store.py list
+    python case_store.py import cases.json [--replace] [--discard-pending]
+    python case_store.py seed
+    python case_store.py use <version>
+    python case_store.py compact
+    python case_store.py prune --keep 5
+    python case_store.py --region <region> <command>   # a region shard (see ai_regions.py)
+"""
+
+import argparse
+import json
+import mmap
+import os
+import shutil
+import sys
+import threading
+import time
+import zlib
+from array import array
+from collections.abc import Sequence
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows: pending-log locks only hold within one process
+    fcntl = None
+
+import numpy as np
+
+from ai_text_index import DescriptionIndex
+
+AI_CASE_STORE_DIR = os.getenv("AI_CASE_STORE_DIR", "./ai_case_store")
+
+# Region shards (see ai_regions.py) are stores of their own below this directory
+REGIONS_DIR = "regions"
+
+REQUIRED_CASE_FIELDS = ("symptoms", "diagnosis", "severity")
+
+# Cases learned since the current snapshot are appended to the live pending
+# file. Compaction first renames it to pending.<time_ns>.jsonl under the lock,
+# then folds the rotated files into a new snapshot whose manifest lists them,
+# and only then deletes them, so no append is lost and none is replayed twice.
+PENDING_FILE = "pending.jsonl"
+PENDING_LOCK = "pending.lock"
+COMPACT_LOCK = "compact.lock"
+
+_process_lock = threading.Lock()
+
+
+class CaseSnapshot:
+    """Read-only view of one snapshot; arrays are memory-mapped"""
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(os.path.join(path, "manifest.json")) as f:
+            self.manifest = json.load(f)
+        self.version: int = self.manifest["version"]
+        self.symptoms: List[str] = self.manifest["symptoms"]
+
+        def column(name):
+            return np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r")
+
+        self.ages = column("ages")  # case position -> age (0 if unknown)
+        self.case_signature = column("case_signature")  # case position -> signature id
+        self.signature_ptr = column("signature_ptr")  # signature id -> slice of signature_symptoms
+        self.signature_symptoms = column("signature_symptoms")
+        self.postings_ptr = column("postings_ptr")  # symptom id -> slice of postings
+        self.postings = column("postings")
+        self.detail_ptr = column("detail_ptr")  # case position -> byte range in details.jsonl
+
+        self._details_file = open(os.path.join(path, "details.jsonl"), "rb")
+        self._details = (
+            mmap.mmap(self._details_file.fileno(), 0, access=mmap.ACCESS_READ)
+            if os.path.getsize(self._details_file.name) else b""
+        )
+
+    def description_index(self) -> Optional[DescriptionIndex]:
+        """TF-IDF index saved with the snapshot (None for snapshots written before it existed)"""
+        return DescriptionIndex.load(self.path)
+
+    def __len__(self) -> int:
+        return int(self.ages.shape[0])
+
+    def case(self, position: int) -> Dict:
+        start, end = self.detail_ptr[position], self.detail_ptr[position + 1]
+        return json.loads(self._details[start:end])
+
+    def iter_cases(self):
+        for position in range(len(self)):
+            yield self.case(position)
+
+    def signature(self, signature_id: int) -> frozenset:
+        start, end = self.signature_ptr[signature_id], self.signature_ptr[signature_id + 1]
+        return frozenset(self.symptoms[i] for i in self.signature_symptoms[start:end])
+
+    def symptom_postings(self, symptom_id: int) -> np.ndarray:
+        return self.postings[self.postings_ptr[symptom_id]:self.postings_ptr[symptom_id + 1]]
+
+
+class CaseDetailStore:
+    """
+    Append-only case details kept as compact JSON bytes, decoded on demand.
+    Each case is deflated on its own against a preset dictionary of typical
+    cases, which is what makes such short documents compress well.
+    """
+
+    __slots__ = ("_data", "_offsets", "_compressor", "_decompressor")
+
+    def __init__(self, dictionary: bytes = b""):
+        self._data = bytearray()
+        self._offsets = array("q", [0])
+        # Priming a stream with the dictionary costs more than compressing a
+        # case, so every case starts from a copy of these primed streams
+        dictionary = dictionary[-32768:]  # deflate window size
+        self._compressor = zlib.compressobj(6, zlib.DEFLATED, -15, 4, zlib.Z_DEFAULT_STRATEGY, dictionary)
+        self._decompressor = zlib.decompressobj(-15, dictionary)
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    def append(self, case: Dict):
+        raw = json.dumps(case, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        compressor = self._compressor.copy()
+        self._data += compressor.compress(raw) + compressor.flush()
+        self._offsets.append(len(self._data))
+
+    def get(self, index: int) -> Dict:
+        decompressor = self._decompressor.copy()
+        return json.loads(decompressor.decompress(self._data[self._offsets[index]:self._offsets[index + 1]]))
+
+
+class CaseList(Sequence):
+    """
+    Snapshot cases followed by cases added since the snapshot was loaded.
+    Details are decoded per access, so every item is a fresh dict the caller
+    may modify.
+    """
+
+    def __init__(self, snapshot: Optional[CaseSnapshot] = None, dictionary: bytes = b""):
+        self.snapshot = snapshot
+        self.base_size = len(snapshot) if snapshot is not None else 0
+        self.added = CaseDetailStore(dictionary)
+
+    def __len__(self) -> int:
+        return self.base_size + len(self.added)
+
+    def __getitem__(self, position):
+        if isinstance(position, slice):
+            return [self[i] for i in range(*position.indices(len(self)))]
+        if position < 0:
+            position += len(self)
+        if not 0 <= position < len(self):
+            raise IndexError("case position out of range")
+        if position < self.base_size:
+            return self.snapshot.case(position)
+        return self.added.get(position - self.base_size)
+
+    def append(self, case: Dict):
+        self.added.append(case)
+
+
+def scoring_age(age: Optional[float]) -> int:
+    """Age as kept in the scoring columns: whole years, 0 if unknown (cases may carry 45.0)
+
+    validate_case rejects fractional ages, so this never rounds: rounding would
+    move cases across the ±5/±15 year age bonus windows.
+    """
+    return int(age) if age else 0
+
+
+class ScoringColumns:
+    """
+    What scoring needs per case, without the case details: the id of its
+    interned symptom set and its age (0 if unknown), in compact arrays
+    """
+
+    __slots__ = ("signatures", "signature_ids", "_base_signature", "_base_ages", "_signature", "_ages")
+
+    def __init__(self, snapshot: Optional[CaseSnapshot] = None):
+        self.signatures: List[frozenset] = []
+        self.signature_ids: Dict[frozenset, int] = {}
+        if snapshot is not None:
+            for signature_id in range(len(snapshot.signature_ptr) - 1):
+                self.intern(snapshot.signature(signature_id))
+            self._base_signature, self._base_ages = snapshot.case_signature, snapshot.ages
+        else:
+            self._base_signature, self._base_ages = np.zeros(0, np.int32), np.zeros(0, np.int16)
+        self._signature = array("i")
+        self._ages = array("h")
+
+    def __len__(self) -> int:
+        return len(self._base_ages) + len(self._ages)
+
+    def intern(self, symptoms: Iterable[str]) -> frozenset:
+        """The shared frozenset for a symptom set (symptom strings interned too)"""
+        signature = frozenset(sys.intern(symptom) for symptom in symptoms)
+        signature_id = self.signature_ids.get(signature)
+        if signature_id is None:
+            signature_id = self.signature_ids[signature] = len(self.signatures)
+            self.signatures.append(signature)
+        return self.signatures[signature_id]
+
+    def append(self, symptoms: Iterable[str], age: Optional[float]) -> frozenset:
+        signature = self.intern(symptoms)
+        self._signature.append(self.signature_ids[signature])
+        self._ages.append(scoring_age(age))
+        return signature
+
+    def signature(self, position: int) -> frozenset:
+        base_size = len(self._base_ages)
+        if position < base_size:
+            return self.signatures[int(self._base_signature[position])]
+        return self.signatures[self._signature[position - base_size]]
+
+    def age(self, position: int) -> Optional[int]:
+        base_size = len(self._base_ages)
+        age = int(self._base_ages[position]) if position < base_size else self._ages[position - base_size]
+        return age or None
+
+
+class CaseStore:
+    """Directory of numbered snapshots plus a CURRENT pointer"""
+
+    def __init__(self, root: str = AI_CASE_STORE_DIR):
+        self.root = root
+        self._folded: Tuple[Optional[int], frozenset] = (None, frozenset())  # folded_pending by version
+
+    @contextmanager
+    def _lock(self, name: str = PENDING_LOCK, shared: bool = False):
+        """Lock shared by every process using this store directory"""
+        os.makedirs(self.root, exist_ok=True)
+        if fcntl is None:
+            with _process_lock:
+                yield
+            return
+        with open(os.path.join(self.root, name), "a") as f:
+            fcntl.flock(f, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _snapshot_path(self, version: int) -> str:
+        return os.path.join(self.root, f"v{version:06d}")
+
+    def versions(self) -> List[int]:
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(
+            int(name[1:]) for name in os.listdir(self.root)
+            if name.startswith("v") and name[1:].isdigit()
+        )
+
+    def current_version(self) -> Optional[int]:
+        try:
+            with open(os.path.join(self.root, "CURRENT")) as f:
+                return int(f.read().strip())
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def set_current(self, version: int):
+        if version not in self.versions():
+            raise ValueError(f"Snapshot version {version} does not exist")
+        tmp_path = os.path.join(self.root, "CURRENT.tmp")
+        with open(tmp_path, "w") as f:
+            f.write(str(version))
+        os.replace(tmp_path, os.path.join(self.root, "CURRENT"))
+
+    def load(self, version: Optional[int] = None) -> Optional[CaseSnapshot]:
+        """Open a snapshot (the current one by default); None if the store is empty"""
+        version = version if version is not None else self.current_version()
+        if version is None:
+            return None
+        return CaseSnapshot(self._snapshot_path(version))
+
+    def write_snapshot(self, cases: Iterable[Dict], note: str = "", folded_pending: Iterable[str] = ()) -> int:
+        """Write cases as a new snapshot and make it current; folded_pending names the
+        rotated pending files whose cases it contains"""
+        versions = self.versions()
+        version = versions[-1] + 1 if versions else 1
+        os.makedirs(self.root, exist_ok=True)
+        tmp_path = self._snapshot_path(version) + ".tmp"
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        os.makedirs(tmp_path)
+
+        symptom_ids: Dict[str, int] = {}
+        signature_ids: Dict[frozenset, int] = {}
+        ages, case_signature, detail_ptr = [], [], [0]
+        descriptions = []
+        posting_symptoms, posting_cases = [], []
+
+        with open(os.path.join(tmp_path, "details.jsonl"), "wb") as details:
+            for position, case in enumerate(cases):
+                validate_case(case)
+                case = dict(case)
+                case.setdefault("case_id", f"CS{version:03d}-{position:07d}")
+                signature = frozenset(case["symptoms"])
+                for symptom in sorted(signature):
+                    symptom_id = symptom_ids.setdefault(symptom, len(symptom_ids))
+                    posting_symptoms.append(symptom_id)
+                    posting_cases.append(position)
+                case_signature.append(signature_ids.setdefault(signature, len(signature_ids)))
+                ages.append(scoring_age(case.get("patient_age")))
+                descriptions.append(case.get("symptom_description") or "")
+                line = json.dumps(case, ensure_ascii=False).encode("utf-8") + b"\n"
+                details.write(line)
+                detail_ptr.append(detail_ptr[-1] + len(line))
+
+        symptoms = list(symptom_ids)
+        signature_ptr, signature_symptoms = [0], []
+        for signature in signature_ids:
+            signature_symptoms.extend(symptom_ids[s] for s in signature)
+            signature_ptr.append(len(signature_symptoms))
+
+        # Column-wise postings: case positions grouped by symptom, ascending
+        posting_symptoms = np.asarray(posting_symptoms, dtype=np.int32)
+        posting_cases = np.asarray(posting_cases, dtype=np.int32)
+        order = np.lexsort((posting_cases, posting_symptoms))
+        postings_ptr = np.concatenate(([0], np.cumsum(np.bincount(posting_symptoms, minlength=len(symptoms)))))
+
+        columns = {
+            "ages": np.asarray(ages, dtype=np.int16),
+            "case_signature": np.asarray(case_signature, dtype=np.int32),
+            "signature_ptr": np.asarray(signature_ptr, dtype=np.int64),
+            "signature_symptoms": np.asarray(signature_symptoms, dtype=np.int32),
+            "postings_ptr": postings_ptr.astype(np.int64),
+            "postings": posting_cases[order],
+            "detail_ptr": np.asarray(detail_ptr, dtype=np.int64),
+        }
+        for name, values in columns.items():
+            np.save(os.path.join(tmp_path, f"{name}.npy"), values)
+        # Fitted once here so loading processes never refit the vectorizer
+        DescriptionIndex.fit(descriptions).save(tmp_path)
+
+        manifest = {
+            "version": version,
+            "created_at": datetime.utcnow().isoformat(),
+            "case_count": len(ages),
+            "symptoms": symptoms,
+            "note": note,
+            "folded_pending": list(folded_pending),
+        }
+        with open(os.path.join(tmp_path, "manifest.json"), "w") as f:
+            json.dump(manifest, f, indent=2)
+
+        os.rename(tmp_path, self._snapshot_path(version))
+        self.set_current(version)
+        return version
+
+    def append_pending(self, case: Dict):
+        """Durably record a case learned since the current snapshot"""
+        validate_case(case)
+        line = json.dumps(case, ensure_ascii=False) + "\n"
+        with self._lock():
+            with open(os.path.join(self.root, PENDING_FILE), "a", encoding="utf-8") as f:
+                f.write(line)
+
+    def _rotated_pending(self) -> List[str]:
+        """Rotated pending files, oldest first"""
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(
+            name for name in os.listdir(self.root)
+            if name.startswith("pending.") and name.endswith(".jsonl") and name[8:-6].isdigit()
+        )
+
+    def _read_lines(self, name: str, offset: int = 0) -> Tuple[List[Dict], int, Optional[int]]:
+        """Complete cases of a pending file after offset, the offset after them and the file's inode"""
+        try:
+            with open(os.path.join(self.root, name), "rb") as f:
+                inode = os.fstat(f.fileno()).st_ino
+                f.seek(offset)
+                data = f.read()
+        except FileNotFoundError:
+            return [], offset, None
+        complete = data[:data.rfind(b"\n") + 1]
+        cases = [json.loads(line) for line in complete.splitlines() if line.strip()]
+        return cases, offset + len(complete), inode
+
+    def version_stamp(self) -> Tuple[Optional[int], int]:
+        """(current snapshot, bytes of pending cases on top of it), read without loading any case
+
+        Changes whenever the store's cases do, so it can key caches of processes
+        that never load the case base.
+        """
+        version = self.current_version()
+        if self._folded[0] != version:
+            folded = []
+            if version is not None:
+                with open(os.path.join(self._snapshot_path(version), "manifest.json")) as f:
+                    folded = json.load(f).get("folded_pending", [])
+            self._folded = (version, frozenset(folded))
+        size = 0
+        for name in self._rotated_pending() + [PENDING_FILE]:
+            if name not in self._folded[1]:
+                try:
+                    size += os.path.getsize(os.path.join(self.root, name))
+                except FileNotFoundError:
+                    pass
+        return version, size
+
+    def pending_cases(self) -> List[Dict]:
+        current = self.load()
+        folded = current.manifest.get("folded_pending", []) if current else []
+        return self.read_pending(current.version if current else None, folded=folded)[0] or []
+
+    def read_pending(self, version: Optional[int], cursor: Optional[Tuple[int, int]] = None,
+                     folded: Iterable[str] = ()) -> Tuple[Optional[List[Dict]], Optional[Tuple[int, int]]]:
+        """Pending cases on top of snapshot `version` after cursor, and the cursor to resume from
+
+        The pending cases are the rotated files not folded into that snapshot
+        (`folded`, from its manifest) followed by the live file. The cursor is the
+        (inode, byte offset) reached, so it follows a file through rotation. Cases
+        are None once CURRENT has moved past `version`: reload the snapshot instead.
+        """
+        with self._lock(shared=True):
+            if self.current_version() != version:
+                return None, cursor
+            folded = set(folded)
+            names = [name for name in self._rotated_pending() if name not in folded] + [PENDING_FILE]
+            cases: List[Dict] = []
+            found = cursor is None
+            for name in names:
+                if found:
+                    new_cases, offset, inode = self._read_lines(name)
+                else:
+                    # Files before the cursor's were read in full by earlier calls
+                    new_cases, offset, inode = self._read_lines(name, cursor[1])
+                    if inode != cursor[0]:
+                        continue
+                    found = True
+                if inode is not None:
+                    cases.extend(new_cases)
+                    cursor = (inode, offset)
+            if not found:
+                # The cursor's file was folded and deleted: the snapshot is out of date
+                return None, cursor
+        return cases, cursor
+
+    def _rotate_pending(self) -> Tuple[Optional[CaseSnapshot], List[str], List[str]]:
+        """Rotate the live pending file (caller holds the compact lock)
+
+        Returns the current snapshot, the rotated files already folded into it,
+        and those that are not.
+        """
+        with self._lock():
+            live = os.path.join(self.root, PENDING_FILE)
+            if os.path.exists(live) and os.path.getsize(live):
+                os.rename(live, os.path.join(self.root, f"pending.{time.time_ns():020d}.jsonl"))
+        current = self.load()
+        already_folded = current.manifest.get("folded_pending", []) if current else []
+        rotated = [name for name in self._rotated_pending() if name not in already_folded]
+        return current, list(already_folded), rotated
+
+    def _remove_pending(self, names: Iterable[str]):
+        # Readers of the new snapshot skip these files, and readers of older ones reload
+        with self._lock():
+            for name in names:
+                try:
+                    os.remove(os.path.join(self.root, name))
+                except FileNotFoundError:
+                    pass
+
+    def compact(self, base_cases: Iterable[Dict] = ()) -> Optional[int]:
+        """Fold pending cases into a new snapshot; base_cases seed an empty store"""
+        with self._lock(COMPACT_LOCK):
+            current, already_folded, rotated = self._rotate_pending()
+            if rotated:
+                pending = [case for name in rotated for case in self._read_lines(name)[0]]
+                existing = current.iter_cases() if current else base_cases
+                cases = (case for source in (existing, pending) for case in source)
+                version = self.write_snapshot(cases, note=f"compact {len(pending)} pending cases",
+                                              folded_pending=rotated)
+            else:
+                version = None
+            self._remove_pending(already_folded + rotated)
+            return version
+
+    def import_cases(self, new_cases: List[Dict], note: str = "", replace: bool = False,
+                     keep_pending: bool = True) -> int:
+        """Write the current cases (none with replace), pending cases and new_cases as a new snapshot
+
+        Pending cases are folded in, or dropped when keep_pending is False; either
+        way none of them is replayed on top of the new snapshot.
+        """
+        with self._lock(COMPACT_LOCK):
+            current, already_folded, rotated = self._rotate_pending()
+            pending = [case for name in rotated for case in self._read_lines(name)[0]] if keep_pending else []
+            existing = current.iter_cases() if current and not replace else []
+            cases = (case for source in (existing, pending, new_cases) for case in source)
+            version = self.write_snapshot(cases, note=note, folded_pending=rotated)
+            self._remove_pending(already_folded + rotated)
+            return version
+
+    def prune(self, keep: int) -> List[int]:
+        """Delete all but the newest `keep` snapshots, never the current one"""
+        current = self.current_version()
+        removed = [v for v in self.versions()[:-keep] if v != current] if keep > 0 else []
+        for version in removed:
+            shutil.rmtree(self._snapshot_path(version))
+        return removed
+
+
+def region_store_path(region: str, root: str = AI_CASE_STORE_DIR) -> str:
+    return os.path.join(root, REGIONS_DIR, region)
+
+
+def validate_case(case: Dict):
+    missing = [field for field in REQUIRED_CASE_FIELDS if not case.get(field)]
+    if missing:
+        raise ValueError(f"Case {case.get('case_id', '?')} is missing {', '.join(missing)}")
+    if not isinstance(case["symptoms"], list):
+        raise ValueError(f"Case {case.get('case_id', '?')} symptoms must be a list")
+    age = case.get("patient_age")
+    if age is not None and age != int(age):
+        raise ValueError(f"Case {case.get('case_id', '?')} patient_age must be whole years, got {age}")
+
+
+def read_cases_file(path: str) -> List[Dict]:
+    """Read cases from a JSON array or a JSON-lines file"""
+    with open(path, encoding="utf-8") as f:
+        text = f.read()
+    if text.lstrip().startswith("["):
+        return json.loads(text)
+    return [json.loads(line) for line in text.splitlines() if line.strip()]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Manage the AI case store")
+    parser.add_argument("--store", default=AI_CASE_STORE_DIR, help="case store directory")
+    parser.add_argument("--region", help="manage this region's shard of the store instead")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    commands.add_parser("list", help="list snapshots")
+    import_parser = commands.add_parser("import", help="import cases into a new snapshot")
+    import_parser.add_argument("path", help="JSON array or JSON-lines file of cases")
+    import_parser.add_argument("--replace", action="store_true", help="do not carry over the current cases")
+    import_parser.add_argument("--discard-pending", action="store_true",
+                               help="drop pending learned cases instead of folding them in")
+    commands.add_parser("seed", help="write the built-in cases as a snapshot")
+    use_parser = commands.add_parser("use", help="make a snapshot current")
+    use_parser.add_argument("version", type=int)
+    commands.add_parser("compact", help="fold pending learned cases into a new snapshot")
+    prune_parser = commands.add_parser("prune", help="delete old snapshots")
+    prune_parser.add_argument("--keep", type=int, default=5)
+
+    args = parser.parse_args(argv)
+    store = CaseStore(region_store_path(args.region, args.store) if args.region else args.store)
+
+    if args.command == "list":
+        current = store.current_version()
+        for version in store.versions():
+            snapshot = store.load(version)
+            marker = "*" if version == current else " "
+            print(f"{marker} v{version:06d}  {snapshot.manifest['case_count']:>9} cases  "
+                  f"{snapshot.manifest['created_at']}  {snapshot.manifest['note']}")
+    elif args.command == "import":
+        new_cases = read_cases_file(args.path)
+        version = store.import_cases(new_cases, note=f"import {os.path.basename(args.path)}",
+                                     replace=args.replace, keep_pending=not args.discard_pending)
+        print(f"Imported {len(new_cases)} cases into snapshot v{version:06d}")
+    elif args.command == "seed":
+        from ai_patient_database import BUILTIN_PATIENT_CASES
+        version = store.import_cases(BUILTIN_PATIENT_CASES, note="built-in seed cases", replace=True)
+        print(f"Wrote built-in cases to snapshot v{version:06d}")
+    elif args.command == "use":
+        store.set_current(args.version)
+        print(f"Current snapshot is now v{args.version:06d}")
+    elif args.command == "compact":
+        from ai_patient_database import BUILTIN_PATIENT_CASES
+        # Region shards start empty rather than from the built-in cases
+        version = store.compact([] if args.region else BUILTIN_PATIENT_CASES)
+        print(f"Wrote snapshot v{version:06d}" if version else "No pending cases")
+    elif args.command == "prune":
+        removed = store.prune(args.keep)
+        print(f"Removed {len(removed)} snapshots")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
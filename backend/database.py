@@ -29,4 +29,8 @@ def get_db():
         db.close()
 
 def create_tables():
+    # Creates missing tables only; columns and indexes added to existing
+    # tables come from upgrade_database.py, run once after an upgrade
     Base.metadata.create_all(bind=engine)
+    from record_search import ensure_search_index
+    ensure_search_index()
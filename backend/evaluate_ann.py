@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Offline evaluation of the approximate (MinHash-LSH) case search
+Reports recall@5 against the exact find_similar_cases ranking, candidate
+symptom sets scored and latency for a range of band/row settings.
+
+Usage: python evaluate_ann.py [--size 100000] [--queries 300] [--configs 8x1,16x2,32x2,16x3] [--noise 200]
+"""
+
+import argparse
+import random
+import statistics
+import time
+
+from ai_ann_index import MinHashLSHIndex
+from benchmark_ai import build_synthetic_db, sample_queries
+
+K = 5
+
+
+def add_noise_cases(db, count: int, vocabulary_size: int, seed: int = 11):
+    """Real records bring many rare symptom tokens; mimic them so symptom sets stay diverse"""
+    rng = random.Random(seed)
+    templates = db.patient_cases[:15]
+    for i in range(count):
+        template = rng.choice(templates)
+        case = dict(template)
+        case["case_id"] = f"NOISE{i:07d}"
+        case["symptoms"] = rng.sample(template["symptoms"], rng.randint(1, len(template["symptoms"]))) + \
+            [f"symptom_{rng.randrange(vocabulary_size)}" for _ in range(rng.randint(1, 3))]
+        case["patient_age"] = rng.randint(1, 90)
+        db.add_case(case)
+
+
+def timed_search(db, queries):
+    """(top-k positions per query, latencies in ms)"""
+    results, latencies = [], []
+    for symptoms, age in queries:
+        start = time.perf_counter()
+        matches = db.find_similar_cases(symptoms, age, limit=K)
+        latencies.append((time.perf_counter() - start) * 1000)
+        results.append([case["case_id"] for case in matches])
+    return results, latencies
+
+
+def evaluate(size: int, query_count: int, configs, noise: int):
+    db = build_synthetic_db(size)
+    add_noise_cases(db, size // 4, noise)
+    queries = sample_queries(db, query_count)
+    print(f"{len(db.patient_cases)} cases, {len(db.case_groups)} symptom sets, {len(queries)} queries")
+
+    db.set_ann_index(None)
+    exact, exact_latencies = timed_search(db, queries)
+    exact_candidates = statistics.mean(
+        len(set().union(*(db.symptom_index.get(s, set()) for s in set(symptoms)))) for symptoms, _ in queries
+    )
+    print(f"{'config':>8} {'recall@5':>9} {'candidates':>11} {'p50_ms':>8} {'p99_ms':>8}")
+    print(f"{'exact':>8} {1.0:>9.3f} {exact_candidates:>11.1f} {_p(exact_latencies, 50):>8.3f} {_p(exact_latencies, 99):>8.3f}")
+
+    for bands, rows in configs:
+        db.set_ann_index(MinHashLSHIndex(bands, rows))
+        approximate, latencies = timed_search(db, queries)
+        hits = sum(len(set(a) & set(e)) for a, e in zip(approximate, exact))
+        recall = hits / max(1, sum(len(e) for e in exact))
+        candidates = statistics.mean(len(db.ann_index.candidates(symptoms)) for symptoms, _ in queries)
+        print(f"{bands:>5}x{rows:<2} {recall:>9.3f} {candidates:>11.1f} {_p(latencies, 50):>8.3f} {_p(latencies, 99):>8.3f}")
+    db.set_ann_index(None)
+
+
+def _p(latencies, percentile: int) -> float:
+    ordered = sorted(latencies)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * percentile / 100))]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Evaluate MinHash-LSH recall against exact case search")
+    parser.add_argument("--size", type=int, default=100000)
+    parser.add_argument("--queries", type=int, default=300)
+    parser.add_argument("--configs", default="8x1,16x2,32x2,16x3", help="comma-separated BANDSxROWS")
+    parser.add_argument("--noise", type=int, default=200, help="distinct rare symptom tokens")
+    args = parser.parse_args()
+    configs = [tuple(int(part) for part in config.split("x")) for config in args.configs.split(",")]
+    evaluate(args.size, args.queries, configs, args.noise)
@@ -2,7 +2,9 @@ from fastapi import FastAPI, Depends
 from fastapi.middleware.cors import CORSMiddleware
 from sqlalchemy.orm import Session
 from database import create_tables, get_db
-from routes import auth, doctors, patients, emergency, queues, pharmacy, ai_routes, admin_routes, consultation_queue
+from routes import auth, doctors, patients, emergency, queues, pharmacy, ai_routes, admin_routes, consultation_queue, sync, records, ai
+from ai_worker import ai_dispatcher
+from workload_forecast import workload_forecaster
 
 app = FastAPI(
     title="Rural Telemedicine Portal API",
@@ -17,6 +19,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "X-Total-Count"],
 )
 
 # Include routers
@@ -29,10 +32,20 @@ app.include_router(consultation_queue.router)
 app.include_router(emergency.router)
 app.include_router(ai_routes.router)
 app.include_router(admin_routes.router)
+app.include_router(sync.router)
+app.include_router(records.router)
+app.include_router(ai.router)
 
 @app.on_event("startup")
 def startup_event():
     create_tables()
+    ai_dispatcher.start()
+    workload_forecaster.start()  # first fit in the background, not in the first request
+
+@app.on_event("shutdown")
+def shutdown_event():
+    ai_dispatcher.shutdown()
+    workload_forecaster.shutdown()
 
 @app.get("/")
 def read_root():
@@ -0,0 +1,401 @@
+"""
+Medicine demand model fitted on prescriptions, past outbreaks and stock movements
+
+For a disease (and optionally a village) the model estimates, for every
+medicine in the pharmacy at once:
+  - how often a case of the disease is prescribed it: a Beta posterior built
+    from matching records, shrunk from the village toward all villages and
+    from there toward the built-in disease map when cases are few;
+  - units dispensed per prescription, from stock movements;
+  - the share of an outbreak's affected people who end up treated, from
+    past outbreaks of the disease.
+Demand for N affected people is then linear in N, with a beta-binomial
+interval, so large outbreaks no longer blow up quadratically.
+"""
+
+import os
+import re
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from ai_cache import TTLCache
+from models import Medicine, OutbreakAlert, Patient, Record, StockMovement, normalize_village
+
+MEDICINE_DEMAND_WINDOW_DAYS = int(os.getenv("MEDICINE_DEMAND_WINDOW_DAYS", "365"))  # history fitted
+MEDICINE_DEMAND_CACHE_SECONDS = float(os.getenv("MEDICINE_DEMAND_CACHE_SECONDS", "600"))
+PRIOR_STRENGTH = 10.0  # pseudo-cases behind the built-in disease map
+VILLAGE_STRENGTH = 20.0  # pseudo-cases pulling a village's rates toward all villages
+TREATMENT_PRIOR_STRENGTH = 20.0  # pseudo-affected behind "every affected person is treated"
+DEFAULT_UNITS_PER_COURSE = 10.0
+MIN_PRESCRIPTION_RATE = 0.05  # rarer medicines are left out of outbreak demand
+INTERVAL_Z = 1.645  # two-sided 90%
+
+# Prior knowledge of what each disease is treated with; its rates seed the model
+DISEASE_MEDICINE_PRIOR = {
+    "flu": ["Paracetamol", "Cough Syrup", "Vitamin C"],
+    "diarrhea": ["ORS", "Loperamide", "Zinc Tablets"],
+    "malaria": ["Artemether", "Paracetamol", "ORS"],
+    "dengue": ["Paracetamol", "ORS", "Platelet Rich Plasma"],
+    "covid": ["Paracetamol", "Vitamin D", "Zinc", "Oxygen"]
+}
+DEFAULT_PRIOR_MEDICINES = ["Paracetamol", "Basic Antibiotics"]
+PRIOR_RATE = 0.8  # of medicines in the map
+BASE_RATE = 0.02  # of every other medicine
+
+_fit_cache = TTLCache(maxsize=256, ttl_seconds=MEDICINE_DEMAND_CACHE_SECONDS)
+
+
+def _catalogue(db: Session) -> pd.DataFrame:
+    rows = db.query(Medicine.id, Medicine.name, Medicine.generic_name, Medicine.stock_quantity,
+                    Medicine.minimum_stock_alert).order_by(Medicine.id).all()
+    return pd.DataFrame(rows, columns=["medicine_id", "name", "generic_name", "stock", "minimum_stock"])
+
+
+def _prior_names(disease: str) -> List[str]:
+    key = disease.lower()
+    for name, medicines in DISEASE_MEDICINE_PRIOR.items():
+        if name in key:
+            return medicines
+    return DEFAULT_PRIOR_MEDICINES
+
+
+def _with_prior_medicines(catalogue: pd.DataFrame, disease: str) -> pd.DataFrame:
+    """Catalogue plus prior rates; prior medicines the pharmacy lacks are added without stock"""
+    names = catalogue["name"].fillna("").str.lower() + " " + catalogue["generic_name"].fillna("").str.lower()
+    prior = np.full(len(catalogue), BASE_RATE)
+    missing = []
+    for medicine in _prior_names(disease):
+        matches = names.str.contains(re.escape(medicine.lower()), regex=True).to_numpy()
+        if matches.any():
+            prior[matches] = PRIOR_RATE
+        else:
+            missing.append(medicine)
+    catalogue = catalogue.assign(prior_rate=prior)
+    if missing:
+        catalogue = pd.concat([catalogue, pd.DataFrame({
+            "medicine_id": [None] * len(missing), "name": missing, "generic_name": [None] * len(missing),
+            "stock": [0] * len(missing), "minimum_stock": [0] * len(missing), "prior_rate": [PRIOR_RATE] * len(missing)
+        })], ignore_index=True)
+    return catalogue
+
+
+def prescription_matrix(prescriptions: pd.Series, catalogue: pd.DataFrame) -> np.ndarray:
+    """Records x medicines boolean matrix of which catalogue medicines each prescription names"""
+    matrix = np.zeros((len(prescriptions), len(catalogue)), dtype=bool)
+    aliases = {}
+    for position, (name, generic) in enumerate(zip(catalogue["name"], catalogue["generic_name"])):
+        for alias in (name, generic):
+            if alias and alias.strip():
+                aliases.setdefault(alias.strip().lower(), position)
+    if not aliases or prescriptions.empty:
+        return matrix
+    # Longest names first so "vitamin d3" wins over "vitamin d"
+    pattern = r"\b(" + "|".join(re.escape(alias) for alias in sorted(aliases, key=len, reverse=True)) + r")\b"
+    found = prescriptions.fillna("").str.lower().reset_index(drop=True).str.extractall(pattern)
+    if not found.empty:
+        rows = found.index.get_level_values(0).to_numpy()
+        columns = found[0].map(aliases).to_numpy(dtype=int)
+        matrix[rows, columns] = True
+    return matrix
+
+
+def _units_per_course(db: Session, catalogue: pd.DataFrame, since: datetime) -> np.ndarray:
+    """Units dispensed per prescription of each medicine, all diseases and villages"""
+    key = ("units", tuple(catalogue["medicine_id"]))
+    cached = _fit_cache.get(key)
+    if cached is not None:
+        return cached
+    dispensed = dict(db.query(StockMovement.medicine_id, func.sum(-StockMovement.quantity_change)).filter(
+        StockMovement.quantity_change < 0,
+        StockMovement.created_at >= since
+    ).group_by(StockMovement.medicine_id).all())
+    prescriptions = pd.Series([row[0] for row in db.query(Record.prescriptions).filter(
+        Record.prescriptions.isnot(None),
+        Record.created_at >= since
+    ).all()], dtype=object)
+    prescribed = prescription_matrix(prescriptions, catalogue).sum(axis=0)
+    units = np.array([float(dispensed.get(medicine_id, 0) or 0) for medicine_id in catalogue["medicine_id"]])
+    per_course = np.where((prescribed > 0) & (units > 0), units / np.maximum(prescribed, 1), DEFAULT_UNITS_PER_COURSE)
+    per_course = np.clip(per_course, 1.0, 100.0)
+    _fit_cache.put(key, per_course)
+    return per_course
+
+
+def _treatment_rates(alerts: pd.DataFrame, cases: pd.DataFrame, villages: List[str]) -> Dict[str, float]:
+    """Share of past outbreaks' affected people who got a consultation for the disease, per village"""
+    if alerts.empty:
+        return {village: 1.0 for village in villages}
+    # Cases of each past outbreak: same place, from two weeks before to a month after the alert
+    codes, case_villages = pd.factorize(cases["village"].fillna(""))
+    case_times = cases["created_at"].to_numpy(dtype="datetime64[ns]")
+    treated = np.zeros(len(alerts))
+    for position, alert in enumerate(alerts.itertuples(index=False)):
+        place = np.asarray(case_villages == alert.location, dtype=bool)[codes]
+        window = ((case_times >= np.datetime64(alert.created_at - timedelta(days=14)))
+                  & (case_times <= np.datetime64(alert.created_at + timedelta(days=30))))
+        treated[position] = min(int((place & window).sum()), alert.affected_count)
+    affected = alerts["affected_count"].to_numpy(dtype=float)
+    rates = {}
+    for village in villages:
+        mine = (alerts["location"] == village).to_numpy() if village else np.ones(len(alerts), dtype=bool)
+        rates[village] = min(1.0, (treated[mine].sum() + TREATMENT_PRIOR_STRENGTH)
+                             / (affected[mine].sum() + TREATMENT_PRIOR_STRENGTH))
+    return rates
+
+
+def _fit_disease(db: Session, disease: str, villages: List[str], catalogue: pd.DataFrame,
+                 since: datetime) -> Dict[str, Dict]:
+    """Models of one disease for several villages ("" = all) from a single pass over its cases"""
+    catalogue = _with_prior_medicines(catalogue, disease)
+    cases = pd.DataFrame(db.query(Record.prescriptions, Patient.village, Record.created_at).outerjoin(
+        Patient, Patient.id == Record.patient_id
+    ).filter(
+        Record.diagnosis.ilike(f"%{disease}%"),
+        Record.created_at >= since
+    ).all(), columns=["prescriptions", "village", "created_at"])
+    cases["village"] = cases["village"].map(normalize_village)
+    alerts = pd.DataFrame(db.query(OutbreakAlert.location, OutbreakAlert.affected_count, OutbreakAlert.created_at).filter(
+        OutbreakAlert.disease_name.ilike(f"%{disease}%"),
+        OutbreakAlert.created_at >= since,
+        OutbreakAlert.affected_count > 0
+    ).all(), columns=["location", "affected_count", "created_at"])
+    alerts["location"] = alerts["location"].map(normalize_village)
+
+    prescribed = prescription_matrix(cases["prescriptions"], catalogue)
+    units_per_course = np.concatenate([
+        _units_per_course(db, catalogue.dropna(subset=["medicine_id"]), since),
+        np.full(int(catalogue["medicine_id"].isna().sum()), DEFAULT_UNITS_PER_COURSE)
+    ])
+    treatment_rates = _treatment_rates(alerts, cases, villages)
+
+    # All villages shrink toward the prior, each village toward all villages
+    all_rate = (prescribed.sum(axis=0) + PRIOR_STRENGTH * catalogue["prior_rate"].to_numpy()) / (len(cases) + PRIOR_STRENGTH)
+    models = {}
+    for village in villages:
+        if village:
+            in_village = (cases["village"] == village).to_numpy()
+            village_cases = int(in_village.sum())
+            rate = (prescribed[in_village].sum(axis=0) + VILLAGE_STRENGTH * all_rate) / (village_cases + VILLAGE_STRENGTH)
+            concentration = village_cases + VILLAGE_STRENGTH
+        else:
+            village_cases = len(cases)
+            rate, concentration = all_rate, len(cases) + PRIOR_STRENGTH
+        models[village] = {
+            "disease": disease,
+            "village": village or None,
+            "catalogue": catalogue,
+            "rate": rate,
+            "concentration": float(concentration),
+            "units_per_course": units_per_course,
+            "treatment_rate": treatment_rates[village],
+            "cases": len(cases),
+            "village_cases": village_cases,
+        }
+    return models
+
+
+def fit_demand_models(db: Session, outbreaks: List[Tuple[str, Optional[str]]]) -> Dict[Tuple[str, str], Dict]:
+    """Models for many (disease, village) pairs: one catalogue read and one case scan per disease
+
+    Keys are (lowercased disease, normalized village); fits are cached for MEDICINE_DEMAND_CACHE_SECONDS.
+    """
+    keys = {(disease.strip().lower(), normalize_village(village)) for disease, village in outbreaks}
+    models, missing = {}, defaultdict(list)
+    for disease, village in keys:
+        cached = _fit_cache.get(("fit", disease, village))
+        if cached is not None:
+            models[(disease, village)] = cached
+        else:
+            missing[disease].append(village)
+    if missing:
+        since = datetime.utcnow() - timedelta(days=MEDICINE_DEMAND_WINDOW_DAYS)
+        catalogue = _catalogue(db)
+        for disease, villages in missing.items():
+            for village, model in _fit_disease(db, disease, villages, catalogue, since).items():
+                _fit_cache.put(("fit", disease, village), model)
+                models[(disease, village)] = model
+    return models
+
+
+def fit_demand_model(db: Session, disease: str, village: Optional[str] = None) -> Dict:
+    """Per-medicine prescription rates for a disease, optionally focused on a village"""
+    return fit_demand_models(db, [(disease, village)])[(disease.strip().lower(), normalize_village(village))]
+
+
+def predict_demand(model: Dict, affected_count: int) -> pd.DataFrame:
+    """Expected units and 90% interval of every medicine for `affected_count` affected people"""
+    treated = max(0, affected_count) * model["treatment_rate"]
+    rate, concentration, per_course = model["rate"], model["concentration"], model["units_per_course"]
+    courses = treated * rate
+    # Beta-binomial: binomial spread plus the uncertainty of the rate itself
+    variance = treated * rate * (1 - rate) * (concentration + treated) / (concentration + 1)
+    spread = INTERVAL_Z * np.sqrt(variance) * per_course
+    units = courses * per_course
+    catalogue = model["catalogue"]
+    return pd.DataFrame({
+        "medicine_id": catalogue["medicine_id"],
+        "name": catalogue["name"],
+        "stock": catalogue["stock"].fillna(0).astype(int),
+        "minimum_stock": catalogue["minimum_stock"].fillna(0).astype(int),
+        "prescription_rate": rate,
+        "units_per_course": per_course,
+        "expected_units": units,
+        "variance_units": variance * per_course ** 2,
+        "lower": np.floor(np.clip(units - spread, 0, None)).astype(int),
+        "upper": np.ceil(units + spread).astype(int),
+    })
+
+
+def outbreak_medicine_demand(db: Session, disease: str, affected_count: int,
+                             location: Optional[str] = None) -> List[Dict]:
+    """Medicines an outbreak is expected to need, most units first"""
+    demand = predict_demand(fit_demand_model(db, disease, location), affected_count)
+    demand = demand[(demand["prescription_rate"] >= MIN_PRESCRIPTION_RATE) & (demand["expected_units"] >= 0.5)]
+    demand = demand.sort_values("expected_units", ascending=False)
+    return [
+        {
+            "medicine_id": int(row.medicine_id) if pd.notna(row.medicine_id) else None,
+            "name": row.name,
+            "expected_units": int(np.ceil(row.expected_units)),
+            "interval": [int(row.lower), int(row.upper)],
+            "prescription_rate": round(float(row.prescription_rate), 3),
+            "units_per_course": round(float(row.units_per_course), 1),
+            "current_stock": int(row.stock),
+        }
+        for row in demand.itertuples(index=False)
+    ]
+
+
+def plan_outbreaks(db: Session, outbreaks: List[Dict]) -> Dict:
+    """Demand and shortages of many simultaneous outbreaks, per district and nationally
+
+    `outbreaks` are dicts with disease_name, location and affected_count. Stock is one
+    national pool, so when demand exceeds it each district gets a share proportional
+    to its demand and the rest of its demand is its shortage.
+    """
+    models = fit_demand_models(db, [(outbreak["disease_name"], outbreak["location"]) for outbreak in outbreaks])
+    frames = []
+    for position, outbreak in enumerate(outbreaks):
+        model = models[(outbreak["disease_name"].strip().lower(), normalize_village(outbreak["location"]))]
+        demand = predict_demand(model, outbreak.get("affected_count") or 0)
+        demand = demand[(demand["prescription_rate"] >= MIN_PRESCRIPTION_RATE) & (demand["expected_units"] >= 0.5)]
+        frames.append(demand.assign(outbreak=position, district=outbreak["location"].strip()))
+    if not frames or all(frame.empty for frame in frames):
+        return {"national": [], "districts": [], "outbreak_demand": [{} for _ in outbreaks], "medicine_ids": []}
+    demand = pd.concat(frames, ignore_index=True)
+    # Medicines the pharmacy lacks have no id; they are keyed by name instead
+    demand["medicine"] = demand["medicine_id"].where(demand["medicine_id"].notna(), demand["name"]).astype(str)
+
+    national = demand.groupby("medicine", sort=False).agg(
+        medicine_id=("medicine_id", "first"), name=("name", "first"), stock=("stock", "first"),
+        expected_units=("expected_units", "sum"), variance_units=("variance_units", "sum"))
+    national["shortage"] = np.clip(national["expected_units"] - national["stock"], 0, None)
+    share = np.minimum(1.0, national["stock"] / national["expected_units"].where(national["expected_units"] > 0, 1))
+
+    districts = demand.groupby(["district", "medicine"], sort=False).agg(
+        name=("name", "first"), expected_units=("expected_units", "sum"), variance_units=("variance_units", "sum"))
+    districts["allocated"] = districts["expected_units"] * share.reindex(districts.index.get_level_values("medicine")).to_numpy()
+    districts["shortage"] = districts["expected_units"] - districts["allocated"]
+
+    def interval(frame):
+        spread = INTERVAL_Z * np.sqrt(frame["variance_units"])
+        return list(zip(np.floor(np.clip(frame["expected_units"] - spread, 0, None)).astype(int),
+                        np.ceil(frame["expected_units"] + spread).astype(int)))
+
+    national["interval"] = interval(national)
+    districts["interval"] = interval(districts)
+    diseases = demand.groupby("district", sort=False)["outbreak"].unique()
+    per_outbreak = demand.groupby("outbreak")
+    return {
+        "national": [
+            {"medicine_id": int(row.medicine_id) if pd.notna(row.medicine_id) else None, "name": row.name,
+             "expected_units": int(np.ceil(row.expected_units)), "interval": [int(value) for value in row.interval],
+             "current_stock": int(row.stock), "shortage": int(np.ceil(row.shortage))}
+            for row in national.sort_values("shortage", ascending=False).itertuples(index=False)
+        ],
+        "districts": [
+            {
+                "district": district,
+                "outbreaks": [outbreaks[position]["disease_name"] for position in diseases[district]],
+                "shortage_units": int(np.ceil(rows["shortage"].sum())),
+                "medicines": [
+                    {"name": row.name, "expected_units": int(np.ceil(row.expected_units)),
+                     "interval": [int(value) for value in row.interval],
+                     "allocated_stock": int(np.floor(row.allocated)), "shortage": int(np.ceil(row.shortage))}
+                    for row in rows.sort_values("expected_units", ascending=False).itertuples(index=False)
+                ],
+            }
+            for district, rows in districts.groupby(level="district", sort=False)
+        ],
+        "outbreak_demand": [
+            {row.name: int(np.ceil(row.expected_units)) for row in per_outbreak.get_group(position).itertuples(index=False)}
+            if position in per_outbreak.groups else {}
+            for position in range(len(outbreaks))
+        ],
+        "medicine_ids": sorted({int(value) for value in demand["medicine_id"].dropna()}),
+    }
+
+
+def reorder_plan(db: Session, horizon_days: int = 30) -> List[Dict]:
+    """Reorder quantities: baseline consumption over the horizon plus active outbreaks' demand"""
+    since = datetime.utcnow() - timedelta(days=90)
+    catalogue = _catalogue(db)
+    if catalogue.empty:
+        return []
+
+    # Baseline: mean and variance of daily units dispensed over the last 90 days
+    movements = pd.DataFrame(db.query(
+        StockMovement.medicine_id, func.date(StockMovement.created_at), func.sum(-StockMovement.quantity_change)
+    ).filter(
+        StockMovement.quantity_change < 0,
+        StockMovement.created_at >= since
+    ).group_by(StockMovement.medicine_id, func.date(StockMovement.created_at)).all(),
+        columns=["medicine_id", "day", "units"])
+    daily = movements.pivot_table(index="day", columns="medicine_id", values="units", aggfunc="sum", fill_value=0) \
+        if not movements.empty else pd.DataFrame()
+    daily = daily.reindex(columns=catalogue["medicine_id"], fill_value=0)
+    days = 90
+    totals = daily.sum(axis=0).to_numpy(dtype=float) if not daily.empty else np.zeros(len(catalogue))
+    squares = (daily ** 2).sum(axis=0).to_numpy(dtype=float) if not daily.empty else np.zeros(len(catalogue))
+    daily_mean = totals / days
+    daily_variance = np.maximum(squares / days - daily_mean ** 2, 0)
+    expected = daily_mean * horizon_days
+    variance = daily_variance * horizon_days
+
+    # Active outbreaks add their predicted demand on top
+    outbreak = np.zeros(len(catalogue))
+    positions = {medicine_id: position for position, medicine_id in enumerate(catalogue["medicine_id"])}
+    alerts = db.query(OutbreakAlert).filter(OutbreakAlert.status == "active").all()
+    models = fit_demand_models(db, [(alert.disease_name, alert.location) for alert in alerts])
+    for alert in alerts:
+        model = models[(alert.disease_name.strip().lower(), normalize_village(alert.location))]
+        demand = predict_demand(model, alert.affected_count or 0)
+        demand = demand[demand["medicine_id"].notna() & (demand["prescription_rate"] >= MIN_PRESCRIPTION_RATE)]
+        for row in demand.itertuples(index=False):
+            position = positions[int(row.medicine_id)]
+            outbreak[position] += row.expected_units
+            variance[position] += row.variance_units
+
+    safety = INTERVAL_Z * np.sqrt(variance)
+    stock = catalogue["stock"].fillna(0).to_numpy(dtype=float)
+    minimum = catalogue["minimum_stock"].fillna(0).to_numpy(dtype=float)
+    reorder = np.ceil(np.clip(expected + outbreak + safety + minimum - stock, 0, None)).astype(int)
+    plan = [
+        {
+            "medicine_id": int(medicine_id),
+            "name": name,
+            "current_stock": int(stock[i]),
+            "expected_consumption": round(float(expected[i]), 1),
+            "outbreak_demand": round(float(outbreak[i]), 1),
+            "safety_stock": round(float(safety[i]), 1),
+            "reorder_quantity": int(reorder[i]),
+        }
+        for i, (medicine_id, name) in enumerate(zip(catalogue["medicine_id"], catalogue["name"]))
+    ]
+    return sorted(plan, key=lambda entry: -entry["reorder_quantity"])
@@ -1,10 +1,11 @@
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, Text, ForeignKey, Float, Enum
+from sqlalchemy import Column, Integer, String, Boolean, Date, DateTime, Text, ForeignKey, Float, Enum, Index, UniqueConstraint, event, inspect
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 from datetime import datetime
 import enum
 
 from database import Base
+from symptom_normalizer import normalize_symptoms, encode_symptom_ids
 
 class UserRole(enum.Enum):
     patient = "patient"
@@ -55,6 +56,7 @@ class Patient(Base):
     age = Column(Integer)
     gender = Column(String)
     village = Column(String)
+    village_key = Column(String, index=True)  # normalize_village(village), set on write
     medical_history = Column(Text)
     emergency_contact = Column(String)
     blood_group = Column(String)
@@ -71,6 +73,7 @@ class Record(Base):
     patient_id = Column(Integer, ForeignKey("patients.id"))
     doctor_id = Column(Integer, ForeignKey("doctors.id"))
     symptoms = Column(Text, nullable=False)
+    symptom_ids = Column(Text)  # JSON list of canonical symptom ids, set on write
     diagnosis = Column(Text)
     prescriptions = Column(Text)
     notes = Column(Text)
@@ -81,6 +84,13 @@ class Record(Base):
     patient = relationship("Patient", back_populates="records")
     doctor = relationship("Doctor", back_populates="records")
 
+    # Keyset pagination walks these newest first on (created_at, id)
+    __table_args__ = (
+        Index("ix_records_created_id", "created_at", "id"),
+        Index("ix_records_patient_created_id", "patient_id", "created_at", "id"),
+        Index("ix_records_doctor_created_id", "doctor_id", "created_at", "id"),
+    )
+
 class Medicine(Base):
     __tablename__ = "pharmacy"
     
@@ -95,6 +105,18 @@ class Medicine(Base):
     minimum_stock_alert = Column(Integer, default=10)
     supplier = Column(String)
     
+class StockMovement(Base):
+    """One change to a medicine's stock: negative when dispensed, positive when restocked"""
+    __tablename__ = "stock_movements"
+    __table_args__ = (Index("ix_stock_movements_medicine_created", "medicine_id", "created_at"),)
+    
+    id = Column(Integer, primary_key=True, index=True)
+    medicine_id = Column(Integer, ForeignKey("pharmacy.id"), nullable=False)
+    quantity_change = Column(Integer, nullable=False)
+    reason = Column(String)  # dispensed, restock or adjustment
+    village = Column(String)  # normalized village the stock was dispensed to, if known
+    created_at = Column(DateTime, default=datetime.utcnow)
+    
 class Queue(Base):
     __tablename__ = "queues"
     
@@ -104,6 +126,7 @@ class Queue(Base):
     status = Column(Enum(QueueStatus), default=QueueStatus.WAITING)
     priority = Column(Integer, default=1)  # 1=low, 2=medium, 3=high, 4=emergency
     symptoms_brief = Column(Text)
+    symptom_ids = Column(Text)  # JSON list of canonical symptom ids, set on write
     created_at = Column(DateTime, default=datetime.utcnow)
     started_at = Column(DateTime)
     completed_at = Column(DateTime)
@@ -131,6 +154,7 @@ class ConsultationQueue(Base):
     id = Column(Integer, primary_key=True, index=True)
     patient_name = Column(String, nullable=False)
     symptoms = Column(Text, nullable=False)
+    symptom_ids = Column(Text)  # JSON list of canonical symptom ids, set on write
     status = Column(String, default="waiting")  # waiting, in_consultation, done
     joined_at = Column(DateTime, default=datetime.utcnow)
 
@@ -144,6 +168,106 @@ class OutbreakAlert(Base):
     severity_level = Column(Integer, default=1)  # 1-5 scale
     description = Column(Text)
     medicines_needed = Column(Text)  # JSON string of medicine requirements
-    status = Column(String, default="active")
+    status = Column(String, default="active")  # proposed (by outbreak_clustering), active, resolved
+    villages = Column(Text)  # JSON list of normalized villages of a clustered alert
+    first_day = Column(Date)  # span of the records behind a clustered alert
+    last_day = Column(Date)
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow)
+
+class SymptomDailyCount(Base):
+    """Records per village, canonical symptom and day, kept up to date as records are written"""
+    __tablename__ = "symptom_daily_counts"
+    __table_args__ = (UniqueConstraint("village", "symptom", "day"),)
+    
+    id = Column(Integer, primary_key=True, index=True)
+    village = Column(String, nullable=False, index=True)  # normalized village name
+    symptom = Column(String, nullable=False)  # canonical symptom id, or a per-village total
+    day = Column(Date, nullable=False, index=True)
+    count = Column(Integer, default=0)
+
+class OutbreakDetectorState(Base):
+    """Streaming EWMA baseline and CUSUM score of one village's daily count of one symptom"""
+    __tablename__ = "outbreak_detector_state"
+    __table_args__ = (UniqueConstraint("village", "symptom"),)
+    
+    id = Column(Integer, primary_key=True, index=True)
+    village = Column(String, nullable=False, index=True)
+    symptom = Column(String, nullable=False)
+    day = Column(Date, nullable=False)  # the day still being counted
+    day_count = Column(Integer, default=0)
+    mean = Column(Float, default=0.0)  # EWMA of completed days' counts
+    variance = Column(Float, default=0.0)
+    cusum = Column(Float, default=0.0)  # CUSUM after the last completed day
+    days_observed = Column(Integer, default=0)
+    alert_id = Column(Integer, ForeignKey("outbreak_alerts.id"), nullable=True)  # alert raised in this run-up
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+class RecordSymptom(Base):
+    """One row per record and canonical symptom, written with the record for indexed symptom analytics"""
+    __tablename__ = "record_symptoms"
+    __table_args__ = (
+        Index("ix_record_symptoms_token_created", "symptom_token", "created_at"),
+        Index("ix_record_symptoms_village_token", "village", "symptom_token", "created_at"),
+        Index("ix_record_symptoms_patient_token", "patient_id", "symptom_token"),
+    )
+    
+    id = Column(Integer, primary_key=True, index=True)
+    record_id = Column(Integer, ForeignKey("records.id"), nullable=False, index=True)
+    patient_id = Column(Integer, ForeignKey("patients.id"))
+    symptom_token = Column(String, nullable=False)
+    created_at = Column(DateTime)  # copied from the record
+    village = Column(String)  # patient's normalized village at the time of the record
+
+class PatientInsightProfile(Base):
+    """Per-patient consultation summary, kept current as records are written"""
+    __tablename__ = "patient_insight_profiles"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    patient_id = Column(Integer, ForeignKey("patients.id"), unique=True, nullable=False)
+    consultation_count = Column(Integer, default=0)
+    emergency_count = Column(Integer, default=0)
+    top_symptoms = Column(Text)  # JSON list of [canonical symptom, records] pairs, most frequent first
+    last_visit = Column(DateTime)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+class SyncMutation(Base):
+    """Outcome of one offline mutation uploaded by a client, so retried uploads are not applied twice"""
+    __tablename__ = "sync_mutations"
+    __table_args__ = (UniqueConstraint("user_id", "client_id"),)
+    
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    client_id = Column(String, nullable=False)  # generated by the client when the mutation was queued
+    item_type = Column(String, nullable=False)  # healthRecord or consultation
+    status = Column(String, nullable=False)  # applied, duplicate or conflict
+    entity_id = Column(Integer)  # record or queue entry the mutation resolved to
+    detail = Column(Text)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+# Free-text symptom column of each model whose symptom_ids are derived on write
+SYMPTOM_TEXT_COLUMNS = {Record: "symptoms", Queue: "symptoms_brief", ConsultationQueue: "symptoms"}
+
+def _set_symptom_ids(mapper, connection, target):
+    text = getattr(target, SYMPTOM_TEXT_COLUMNS[type(target)])
+    target.symptom_ids = encode_symptom_ids(normalize_symptoms(text)) if text else None
+
+def _update_symptom_ids(mapper, connection, target):
+    # Only re-normalize when the symptom text itself changed
+    column = SYMPTOM_TEXT_COLUMNS[type(target)]
+    if target.symptom_ids is None or inspect(target).attrs[column].history.has_changes():
+        _set_symptom_ids(mapper, connection, target)
+
+for _model in SYMPTOM_TEXT_COLUMNS:
+    event.listen(_model, "before_insert", _set_symptom_ids)
+    event.listen(_model, "before_update", _update_symptom_ids)
+
+def normalize_village(village):
+    """Village name as stored in analytics tables: lower case, single spaces"""
+    return " ".join((village or "").lower().split())
+
+def _set_village_key(mapper, connection, target):
+    target.village_key = normalize_village(target.village) or None
+
+event.listen(Patient, "before_insert", _set_village_key)
+event.listen(Patient, "before_update", _set_village_key)
@@ -0,0 +1,239 @@
+"""
+Batch upload of the mutations a clinic queued while offline
+The frontend's syncQueue holds health records and consultation requests, each
+tagged with a client-generated id. A batch is applied in chunks of
+SYNC_CHUNK_SIZE items, one transaction per chunk, and every item's outcome is
+committed in the same transaction as its effect. A retried upload therefore
+replays stored outcomes instead of writing twice, and a dropped connection
+loses at most the chunk in flight.
+
+Items are applied oldest first (queued timestamp, then client id), so
+conflicts resolve the same way however the batch was split or retried:
+- a record identical to one already stored (same patient, doctor, time and
+  symptoms) resolves to that record as a duplicate;
+- a consultation for a patient who already has an active queue entry resolves
+  to that entry as a conflict; the earliest request wins;
+- a consultation for an unknown or unavailable doctor joins the general queue.
+Rejected items (bad data, not authorized) are not stored, so they can be
+fixed and sent again.
+"""
+
+import os
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+
+from pydantic import ValidationError
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from models import Doctor, Patient, Queue, QueueStatus, Record, SyncMutation, User, UserRole
+from record_analytics import records_created
+from schemas import QueueCreate, RecordCreate, SyncItem, SyncItemResult
+from utils import calculate_wait_time, prioritize_queue
+
+SYNC_CHUNK_SIZE = int(os.getenv("SYNC_CHUNK_SIZE", "100"))
+
+
+def _naive_utc(moment: Optional[datetime]) -> Optional[datetime]:
+    """Timestamps are stored as naive UTC; clients send them with an offset"""
+    if moment is not None and moment.tzinfo is not None:
+        moment = moment.astimezone(timezone.utc).replace(tzinfo=None)
+    return moment
+
+
+def _apply_order(item: SyncItem):
+    timestamp = _naive_utc(item.timestamp)
+    return (timestamp is None, timestamp or datetime.min, item.client_id)
+
+
+def _validation_detail(error: ValidationError) -> str:
+    first = error.errors()[0]
+    return f"{'.'.join(str(part) for part in first['loc'])}: {first['msg']}"
+
+
+class _Outcome:
+    """Result of one item; entity is an id or an object whose id is known after flush"""
+
+    def __init__(self, item: SyncItem, status: str, entity=None, detail: Optional[str] = None):
+        self.item = item
+        self.status = status
+        self.entity = entity
+        self.detail = detail
+
+    @property
+    def entity_id(self) -> Optional[int]:
+        return self.entity if self.entity is None or isinstance(self.entity, int) else self.entity.id
+
+    def result(self, replayed: bool = False) -> SyncItemResult:
+        return SyncItemResult(client_id=self.item.client_id, type=self.item.type, status=self.status,
+                              entity_id=self.entity_id, detail=self.detail, replayed=replayed)
+
+
+def _apply_chunk(db: Session, user: User, own_doctor: Optional[Doctor], items: List[SyncItem],
+                 now: datetime) -> Tuple[Dict[str, SyncItemResult], List[Record], List[Queue]]:
+    """Apply one chunk in one transaction; returns results by client id and the new rows"""
+    stored = {
+        mutation.client_id: mutation
+        for mutation in db.query(SyncMutation).filter(
+            SyncMutation.user_id == user.id,
+            SyncMutation.client_id.in_([item.client_id for item in items])
+        )
+    }
+    results = {
+        client_id: SyncItemResult(client_id=client_id, type=mutation.item_type, status=mutation.status,
+                                  entity_id=mutation.entity_id, detail=mutation.detail, replayed=True)
+        for client_id, mutation in stored.items()
+    }
+
+    outcomes: List[_Outcome] = []
+    parsed = []
+    for item in items:
+        if item.client_id in stored:
+            continue
+        try:
+            schema = RecordCreate if item.type == "healthRecord" else QueueCreate
+            parsed.append((item, schema(**item.data)))
+        except ValidationError as e:
+            outcomes.append(_Outcome(item, "rejected", detail=_validation_detail(e)))
+
+    # Everything the checks below need, loaded once per chunk
+    patient_ids = {data.patient_id for _, data in parsed}
+    doctor_ids = {data.doctor_id for _, data in parsed if data.doctor_id}
+    patients = {p.id: p for p in db.query(Patient).filter(Patient.id.in_(patient_ids))} if patient_ids else {}
+    doctors = {d.id: d for d in db.query(Doctor).filter(Doctor.id.in_(doctor_ids))} if doctor_ids else {}
+    record_times = {_naive_utc(item.timestamp) for item, _ in parsed
+                    if item.type == "healthRecord" and item.timestamp is not None}
+    existing_records = {}
+    if record_times:
+        for record_id, patient_id, doctor_id, created_at, symptoms in db.query(
+            Record.id, Record.patient_id, Record.doctor_id, Record.created_at, Record.symptoms
+        ).filter(Record.patient_id.in_(patient_ids), Record.created_at.in_(record_times)):
+            existing_records[(patient_id, doctor_id, created_at, symptoms)] = record_id
+    active_queues = {
+        patient_id: queue_id
+        for queue_id, patient_id in db.query(Queue.id, Queue.patient_id).filter(
+            Queue.patient_id.in_(patient_ids),
+            Queue.status.in_([QueueStatus.WAITING, QueueStatus.IN_PROGRESS])
+        )
+    } if patient_ids else {}
+
+    new_records: List[Record] = []
+    new_queues: List[Queue] = []
+    for item, data in parsed:
+        patient = patients.get(data.patient_id)
+        if item.type == "healthRecord":
+            if user.role not in [UserRole.doctor, UserRole.admin]:
+                outcomes.append(_Outcome(item, "rejected", detail="Only doctors can create records"))
+            elif user.role == UserRole.doctor and (own_doctor is None or data.doctor_id != own_doctor.id):
+                outcomes.append(_Outcome(item, "rejected", detail="Doctors can only create records for themselves"))
+            elif patient is None:
+                outcomes.append(_Outcome(item, "rejected", detail="Patient not found"))
+            elif data.doctor_id not in doctors:
+                outcomes.append(_Outcome(item, "rejected", detail="Doctor not found"))
+            else:
+                # Keep the time the record was written offline, unless the client clock ran ahead
+                created_at = min(_naive_utc(item.timestamp) or now, now)
+                key = (data.patient_id, data.doctor_id, created_at, data.symptoms)
+                if key in existing_records:
+                    outcomes.append(_Outcome(item, "duplicate", existing_records[key],
+                                             "Record already stored"))
+                    continue
+                record = Record(**data.dict(), created_at=created_at)
+                db.add(record)
+                new_records.append(record)
+                existing_records[key] = record
+                outcomes.append(_Outcome(item, "applied", record))
+        else:
+            if patient is None:
+                outcomes.append(_Outcome(item, "rejected", detail="Patient not found"))
+            elif user.role == UserRole.patient and patient.user_id != user.id:
+                outcomes.append(_Outcome(item, "rejected", detail="Patients can only join queue for themselves"))
+            elif user.role not in [UserRole.patient, UserRole.admin, UserRole.doctor]:
+                outcomes.append(_Outcome(item, "rejected", detail="Not authorized"))
+            elif patient.id in active_queues:
+                outcomes.append(_Outcome(item, "conflict", active_queues[patient.id],
+                                         "Patient already has an active queue entry"))
+            else:
+                doctor = doctors.get(data.doctor_id)
+                detail = None
+                if data.doctor_id and (doctor is None or not doctor.is_available):
+                    detail = "Requested doctor unavailable; joined the general queue"
+                    doctor = None
+                # Queued at upload time: an offline request does not jump the live queue
+                queue = Queue(
+                    patient_id=patient.id,
+                    doctor_id=doctor.id if doctor else None,
+                    symptoms_brief=data.symptoms_brief,
+                    priority=prioritize_queue(data.symptoms_brief, patient.age, patient.medical_history),
+                    status=QueueStatus.WAITING
+                )
+                db.add(queue)
+                new_queues.append(queue)
+                active_queues[patient.id] = queue
+                outcomes.append(_Outcome(item, "applied", queue, detail))
+
+    db.flush()
+    records_created(db, new_records)
+    for outcome in outcomes:
+        if outcome.status != "rejected":
+            db.add(SyncMutation(user_id=user.id, client_id=outcome.item.client_id, item_type=outcome.item.type,
+                                status=outcome.status, entity_id=outcome.entity_id, detail=outcome.detail))
+        results[outcome.item.client_id] = outcome.result()
+    db.commit()
+    return results, new_records, new_queues
+
+
+def _estimate_wait_times(db: Session, queues: List[Queue]):
+    """Wait estimates for new queue entries from one count of the entries ahead of them"""
+    if not queues:
+        return
+    queues = sorted(queues, key=lambda queue: (queue.created_at, queue.id))
+    ahead = db.query(func.count(Queue.id)).filter(
+        Queue.status == QueueStatus.WAITING,
+        Queue.created_at < queues[0].created_at
+    ).scalar()
+    for position, queue in enumerate(queues, start=ahead + 1):
+        queue.estimated_wait_time = calculate_wait_time(position)
+    db.commit()
+
+
+def apply_sync_batch(db: Session, user: User, items: List[SyncItem]) -> Tuple[List[SyncItemResult], List[int]]:
+    """Apply a batch of queued offline mutations
+
+    Returns one result per item in request order, and the ids of records created,
+    for the caller to hand to the post-commit record pipeline.
+    """
+    own_doctor = None
+    if user.role == UserRole.doctor:
+        own_doctor = db.query(Doctor).filter(Doctor.user_id == user.id).first()
+
+    unique = {}
+    for item in items:
+        unique.setdefault(item.client_id, item)
+    ordered = sorted(unique.values(), key=_apply_order)
+
+    results: Dict[str, SyncItemResult] = {}
+    record_ids: List[int] = []
+    for start in range(0, len(ordered), SYNC_CHUNK_SIZE):
+        chunk = ordered[start:start + SYNC_CHUNK_SIZE]
+        now = datetime.utcnow()
+        try:
+            chunk_results, records, queues = _apply_chunk(db, user, own_doctor, chunk, now)
+        except IntegrityError:
+            # A concurrent upload of the same items committed first: replay its outcomes
+            db.rollback()
+            chunk_results, records, queues = _apply_chunk(db, user, own_doctor, chunk, now)
+        results.update(chunk_results)
+        record_ids.extend(record.id for record in records)
+        _estimate_wait_times(db, queues)
+
+    response = []
+    seen = set()
+    for item in items:
+        result = results[item.client_id]
+        if item.client_id in seen:
+            result = result.model_copy(update={"replayed": True})
+        seen.add(item.client_id)
+        response.append(result)
+    return response, record_ids
@@ -0,0 +1,284 @@
+#!/usr/bin/env python3
+"""
+Geo-temporal outbreak clustering
+
+Recent emergency and symptom-bearing records are placed at their village's
+coordinates and clustered per district with DBSCAN over a scaled feature
+space: east/north distance in units of CLUSTER_RADIUS_KM, time in units of
+CLUSTER_TIME_SCALE_DAYS, and the record's canonical symptoms as a unit
+vector (records sharing a symptom set coincide there, records with disjoint
+symptoms are sqrt(2) * CLUSTER_SYMPTOM_WEIGHT apart). Records identical in
+village, day and symptoms are collapsed into one point weighted by its excess
+over the village's baseline for those symptoms, so only unusual activity
+clusters and a district's 60-day window is a few thousand points at most.
+
+Each cluster large enough proposes an OutbreakAlert (status "proposed"), or
+updates the open alert covering the same villages over an overlapping span;
+an official reviews proposals with GET /ai/outbreak-alerts?status=proposed
+and confirms one with PUT /ai/outbreak-alert/{id}/confirm, making it active.
+
+Village coordinates come from a JSON file (VILLAGE_COORDINATES_FILE):
+    {"Rampur": {"lat": 27.21, "lon": 77.49, "district": "bharatpur"}, ...}
+Villages missing from it are skipped.
+
+Usage:
+    python outbreak_clustering.py run [--district bharatpur] [--every 3600]
+"""
+
+import argparse
+import json
+import math
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from sklearn.cluster import DBSCAN
+from sqlalchemy.orm import Session
+
+from database import SessionLocal
+from models import OutbreakAlert, Patient, Record, normalize_village
+from symptom_normalizer import decode_symptom_ids
+
+VILLAGE_COORDINATES_FILE = os.getenv("VILLAGE_COORDINATES_FILE", "./village_coordinates.json")
+CLUSTER_WINDOW_DAYS = int(os.getenv("CLUSTER_WINDOW_DAYS", "60"))
+CLUSTER_RADIUS_KM = float(os.getenv("CLUSTER_RADIUS_KM", "10"))  # neighbouring villages within this
+CLUSTER_TIME_SCALE_DAYS = float(os.getenv("CLUSTER_TIME_SCALE_DAYS", "3"))  # ... and this many days
+CLUSTER_SYMPTOM_WEIGHT = float(os.getenv("CLUSTER_SYMPTOM_WEIGHT", "1.0"))
+CLUSTER_MIN_CASES = int(os.getenv("CLUSTER_MIN_CASES", "8"))  # DBSCAN min_samples, in excess records
+CLUSTER_MIN_Z = float(os.getenv("CLUSTER_MIN_Z", "5"))  # Poisson z-score of a cluster over its baseline
+CLUSTER_MIN_RATIO = float(os.getenv("CLUSTER_MIN_RATIO", "2"))  # ... and its ratio to the baseline
+
+EARTH_RADIUS_KM = 6371.0
+ALL_DISTRICTS = "all"
+ALERT_PREFIX = "Cluster of "
+
+
+def load_village_coordinates(path: str = VILLAGE_COORDINATES_FILE) -> Dict[str, Tuple[float, float, str]]:
+    """Normalized village -> (lat, lon, district)"""
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding="utf-8") as f:
+        entries = json.load(f)
+    return {
+        normalize_village(village): (float(spec["lat"]), float(spec["lon"]), spec.get("district") or ALL_DISTRICTS)
+        for village, spec in entries.items()
+    }
+
+
+def load_window(db: Session, since: datetime, coordinates: Dict[str, Tuple[float, float, str]]) -> pd.DataFrame:
+    """Emergency or symptom-bearing records since `since`, one row per record, with coordinates"""
+    rows = db.query(Record.created_at, Record.is_emergency, Record.symptom_ids, Patient.village).join(
+        Patient, Patient.id == Record.patient_id
+    ).filter(
+        Record.created_at >= since,
+        (Record.is_emergency == True) | ((Record.symptom_ids.isnot(None)) & (Record.symptom_ids != "[]"))
+    ).all()
+    frame = pd.DataFrame(rows, columns=["created_at", "is_emergency", "symptom_ids", "village"])
+    frame["village"] = frame["village"].map(normalize_village)
+    frame = frame[frame["village"].isin(coordinates.keys())]
+    if frame.empty:
+        return frame.assign(lat=[], lon=[], district=[], day=[], symptoms=[])
+    located = frame["village"].map(coordinates)
+    frame = frame.assign(
+        lat=located.str[0], lon=located.str[1], district=located.str[2],
+        day=pd.to_datetime(frame["created_at"]).dt.floor("D"),
+        # Canonical symptom set as a sorted, comma-joined key
+        symptoms=frame["symptom_ids"].map(lambda ids: ",".join(sorted(set(decode_symptom_ids(ids))))),
+        is_emergency=frame["is_emergency"].fillna(False).astype(bool)
+    )
+    return frame
+
+
+def _features(points: pd.DataFrame, since: pd.Timestamp) -> np.ndarray:
+    """Scaled (east, north, time, symptoms..., emergency) features of the weighted points"""
+    latitude = math.radians(points["lat"].mean())
+    east = np.radians(points["lon"].to_numpy()) * math.cos(latitude) * EARTH_RADIUS_KM / CLUSTER_RADIUS_KM
+    north = np.radians(points["lat"].to_numpy()) * EARTH_RADIUS_KM / CLUSTER_RADIUS_KM
+    days = (points["day"] - since).dt.days.to_numpy() / CLUSTER_TIME_SCALE_DAYS
+
+    tokens = points["symptoms"].str.get_dummies(sep=",")
+    vectors = tokens.to_numpy(dtype=float)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    vectors = np.divide(vectors, norms, out=np.zeros_like(vectors), where=norms > 0) * CLUSTER_SYMPTOM_WEIGHT
+    emergency = points["is_emergency"].to_numpy(dtype=float)[:, None] * CLUSTER_SYMPTOM_WEIGHT
+    return np.hstack([east[:, None], north[:, None], days[:, None], vectors, emergency])
+
+
+def cluster_district(records: pd.DataFrame, since: pd.Timestamp, window_days: int = CLUSTER_WINDOW_DAYS) -> List[Dict]:
+    """DBSCAN clusters of one district's excess records, largest first
+
+    Each (village, day, symptoms) point is weighted by its count above the window's
+    daily baseline for that village and symptom set (plus one Poisson standard
+    deviation), so the steady background of common complaints does not cluster.
+    A cluster is kept when all records of its series over its span exceed their
+    baseline by CLUSTER_MIN_Z standard deviations and CLUSTER_MIN_RATIO times.
+    """
+    keys = ["village", "symptoms", "is_emergency"]
+    every_point = records.groupby(["village", "lat", "lon", "day", "symptoms", "is_emergency"], as_index=False).size()
+    baseline = every_point.groupby(keys)["size"].transform("sum") / window_days
+    every_point = every_point.assign(baseline=baseline, excess=every_point["size"] - baseline - np.sqrt(baseline))
+    points = every_point[every_point["excess"] > 0]
+    if points["excess"].sum() < CLUSTER_MIN_CASES:
+        return []
+    labels = DBSCAN(eps=1.0, min_samples=CLUSTER_MIN_CASES).fit_predict(
+        _features(points, since), sample_weight=points["excess"].to_numpy()
+    )
+    points = points.assign(cluster=labels)
+    series = every_point.set_index(keys).index
+    daily_baseline = every_point.drop_duplicates(keys).set_index(keys)["baseline"]
+    clusters = []
+    for label, members in points[points["cluster"] >= 0].groupby("cluster"):
+        # Judge the cluster on all of its series' records over its span, not only the busy days DBSCAN saw
+        member_series = members.set_index(keys).index.unique()
+        first_day, last_day = members["day"].min(), members["day"].max()
+        in_span = (series.isin(member_series) & (every_point["day"] >= first_day).to_numpy()
+                   & (every_point["day"] <= last_day).to_numpy())
+        observed = int(every_point.loc[in_span, "size"].sum())
+        expected = float(daily_baseline.loc[member_series].sum()) * ((last_day - first_day).days + 1)
+        if observed - expected < CLUSTER_MIN_Z * math.sqrt(max(expected, 1.0)) or observed < CLUSTER_MIN_RATIO * expected:
+            continue
+        spanned = every_point[in_span]
+        weights = spanned["size"]
+        symptom_counts = spanned.assign(symptom=spanned["symptoms"].str.split(",")).explode("symptom")
+        symptom_counts = symptom_counts[symptom_counts["symptom"] != ""].groupby("symptom")["size"].sum()
+        villages = spanned.groupby("village")["size"].sum().sort_values(ascending=False)
+        clusters.append({
+            "affected_count": observed,
+            "expected_count": round(expected, 1),
+            "emergencies": int(weights[spanned["is_emergency"]].sum()),
+            "symptoms": symptom_counts.sort_values(ascending=False).head(3).index.tolist(),
+            "villages": villages.index.tolist(),
+            "first_day": first_day.date(),
+            "last_day": last_day.date(),
+        })
+    return sorted(clusters, key=lambda cluster: -cluster["affected_count"])
+
+
+def _alert_fields(cluster: Dict, district: str, display_names: Dict[str, str]) -> Dict:
+    symptom = cluster["symptoms"][0] if cluster["symptoms"] else "emergencies"
+    location = display_names.get(cluster["villages"][0], cluster["villages"][0])
+    where = ", ".join(display_names.get(village, village) for village in cluster["villages"][:5])
+    return {
+        "disease_name": f"{ALERT_PREFIX}{symptom.replace('_', ' ')}",
+        "location": location,
+        "affected_count": cluster["affected_count"],
+        "severity_level": min(5, 1 + cluster["affected_count"] // (CLUSTER_MIN_CASES * 2) + (cluster["emergencies"] > 0)),
+        "description": (f"Automatic cluster in {district}: {cluster['affected_count']} records "
+                        f"({cluster['emergencies']} emergencies, {cluster['expected_count']} expected) from {cluster['first_day']} to {cluster['last_day']} "
+                        f"in {where}; symptoms: {', '.join(cluster['symptoms']) or 'emergency'}"),
+    }
+
+
+def _overlapping_alert(alerts: List[OutbreakAlert], cluster: Dict) -> Optional[OutbreakAlert]:
+    """Open alert sharing the most villages with the cluster over an overlapping span, if any"""
+    best, best_shared = None, 0
+    for alert in alerts:
+        villages = set(json.loads(alert.villages)) if alert.villages else {normalize_village(alert.location)}
+        shared = len(villages.intersection(cluster["villages"]))
+        # Alerts from before spans were stored overlap any span in the window
+        overlaps = alert.first_day is None or (alert.first_day <= cluster["last_day"]
+                                               and cluster["first_day"] <= alert.last_day)
+        if shared > best_shared and overlaps:
+            best, best_shared = alert, shared
+    return best
+
+
+def propose_alerts(db: Session, clusters: List[Tuple[str, Dict]], since: datetime,
+                   display_names: Dict[str, str]) -> Tuple[int, int]:
+    """Create or update one proposed alert per cluster; returns (created, updated)
+
+    A cluster continues the open alert it shares villages with over an overlapping
+    span, whatever its leading symptom or busiest village is on this run; each
+    alert takes at most one cluster per run.
+    """
+    open_alerts = db.query(OutbreakAlert).filter(
+        OutbreakAlert.disease_name.like(f"{ALERT_PREFIX}%"),
+        OutbreakAlert.status.in_(["proposed", "active"]),
+        OutbreakAlert.updated_at >= since
+    ).all()
+    created = updated = 0
+    now = datetime.utcnow()
+    for district, cluster in clusters:
+        fields = _alert_fields(cluster, district, display_names)
+        alert = _overlapping_alert(open_alerts, cluster)
+        if alert is None:
+            alert = OutbreakAlert(status="proposed", created_at=now, updated_at=now,
+                                  villages=json.dumps(cluster["villages"]), first_day=cluster["first_day"],
+                                  last_day=cluster["last_day"], **fields)
+            db.add(alert)
+            created += 1
+        else:
+            open_alerts.remove(alert)
+            known = json.loads(alert.villages) if alert.villages else [normalize_village(alert.location)]
+            alert.villages = json.dumps(known + [village for village in cluster["villages"] if village not in known])
+            alert.first_day = min(alert.first_day or cluster["first_day"], cluster["first_day"])
+            alert.last_day = max(alert.last_day or cluster["last_day"], cluster["last_day"])
+            if alert.status == "proposed":
+                # Not yet confirmed: the name still follows the cluster
+                alert.disease_name, alert.location = fields["disease_name"], fields["location"]
+            alert.affected_count = max(alert.affected_count or 0, fields["affected_count"])
+            alert.severity_level = max(alert.severity_level or 1, fields["severity_level"])
+            alert.description = fields["description"]
+            alert.updated_at = now
+            updated += 1
+    db.commit()
+    return created, updated
+
+
+def run(district: Optional[str] = None, window_days: int = CLUSTER_WINDOW_DAYS, verbose: bool = False) -> Dict:
+    """Cluster the window of every district (or one) and propose alerts"""
+    coordinates = load_village_coordinates()
+    if not coordinates:
+        return {"districts": 0, "records": 0, "clusters": 0, "created": 0, "updated": 0}
+    since = datetime.utcnow() - timedelta(days=window_days)
+    db = SessionLocal()
+    try:
+        records = load_window(db, since, coordinates)
+        if district:
+            records = records[records["district"] == district]
+        display_names = {}
+        for (village,) in db.query(Patient.village).distinct().all():
+            display_names.setdefault(normalize_village(village), (village or "").strip())
+        found = []
+        for name, rows in records.groupby("district"):
+            started = time.perf_counter()
+            clusters = cluster_district(rows, pd.Timestamp(since).floor("D"), window_days)
+            found += [(name, cluster) for cluster in clusters]
+            if verbose:
+                print(f"  {name:<20} {len(rows):>7} records  {len(clusters):>3} clusters  "
+                      f"{time.perf_counter() - started:.2f}s")
+        created, updated = propose_alerts(db, found, since, display_names)
+        return {"districts": int(records["district"].nunique()), "records": len(records),
+                "clusters": len(found), "created": created, "updated": updated}
+    finally:
+        db.close()
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Geo-temporal outbreak clustering")
+    commands = parser.add_subparsers(dest="command", required=True)
+    run_parser = commands.add_parser("run", help="cluster recent records and propose alerts")
+    run_parser.add_argument("--district", help="only this district")
+    run_parser.add_argument("--days", type=int, default=CLUSTER_WINDOW_DAYS, help="window length")
+    run_parser.add_argument("--every", type=float, default=0, help="repeat every N seconds")
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(VILLAGE_COORDINATES_FILE):
+        print(f"❌ No village coordinates at {VILLAGE_COORDINATES_FILE}")
+        return 1
+    while True:
+        started = time.perf_counter()
+        result = run(args.district, args.days, verbose=True)
+        print(f"✅ {result['clusters']} clusters in {result['records']} records across {result['districts']} districts "
+              f"({result['created']} proposed, {result['updated']} updated) in {time.perf_counter() - started:.2f}s")
+        if not args.every:
+            return 0
+        time.sleep(args.every)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,281 @@
+#!/usr/bin/env python3
+"""
+Streaming outbreak detection per village and symptom
+
+Every written record bumps daily counters for its village: one per
+canonical symptom plus the village's record and emergency totals. Each
+(village, symptom) series keeps an EWMA baseline of its daily count and a
+CUSUM of the standardized excess over that baseline; when the CUSUM of the
+day being counted crosses the threshold an OutbreakAlert is raised.
+Trend reads aggregate the small counter table instead of scanning records.
+
+Usage:
+    python outbreak_detector.py rebuild [--alerts]   # replay all records into the counters
+    python outbreak_detector.py status [--top 20]    # highest current scores
+"""
+
+import argparse
+import logging
+import math
+import os
+import sys
+from datetime import date, datetime
+from typing import Dict, List, Optional
+
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from database import SessionLocal
+from models import Record, Patient, OutbreakAlert, SymptomDailyCount, OutbreakDetectorState, normalize_village
+from symptom_normalizer import normalize_symptoms, decode_symptom_ids
+
+logger = logging.getLogger(__name__)
+
+OUTBREAK_EWMA_ALPHA = float(os.getenv("OUTBREAK_EWMA_ALPHA", "0.1"))  # baseline smoothing per day
+OUTBREAK_CUSUM_K = float(os.getenv("OUTBREAK_CUSUM_K", "0.5"))  # allowance, in standard deviations
+OUTBREAK_CUSUM_H = float(os.getenv("OUTBREAK_CUSUM_H", "4.0"))  # alarm threshold
+OUTBREAK_MIN_CASES = int(os.getenv("OUTBREAK_MIN_CASES", "3"))  # cases that day before alerting
+OUTBREAK_MIN_SD = float(os.getenv("OUTBREAK_MIN_SD", "1.0"))  # floor for sparse, near-zero baselines
+OUTBREAK_WARMUP_DAYS = int(os.getenv("OUTBREAK_WARMUP_DAYS", "7"))  # baseline days before alerting
+
+# Pseudo-symptoms holding each village's record and emergency totals
+TOTAL_SERIES = "_records"
+EMERGENCY_SERIES = "_emergency"
+# Zero-count days folded into a baseline after a gap; older ones no longer matter
+MAX_GAP_DAYS = 365
+
+
+def _z_score(state: OutbreakDetectorState, count: int) -> float:
+    return (count - state.mean) / max(math.sqrt(state.variance), OUTBREAK_MIN_SD)
+
+
+def current_score(state: OutbreakDetectorState) -> float:
+    """CUSUM including the day still being counted"""
+    return max(0.0, state.cusum + _z_score(state, state.day_count) - OUTBREAK_CUSUM_K)
+
+
+def _close_day(state: OutbreakDetectorState, count: int):
+    """Fold a completed day's count into the CUSUM and then the EWMA baseline"""
+    state.cusum = max(0.0, state.cusum + _z_score(state, count) - OUTBREAK_CUSUM_K)
+    difference = count - state.mean
+    state.mean += OUTBREAK_EWMA_ALPHA * difference
+    state.variance = (1 - OUTBREAK_EWMA_ALPHA) * (state.variance + OUTBREAK_EWMA_ALPHA * difference ** 2)
+    state.days_observed += 1
+
+
+def _advance(state: OutbreakDetectorState, day: date):
+    """Close the counted day and any silent days before `day`"""
+    gap = (day - state.day).days
+    _close_day(state, state.day_count)
+    for _ in range(min(gap - 1, MAX_GAP_DAYS)):
+        _close_day(state, 0)
+    state.day, state.day_count = day, 0
+    if state.cusum == 0:
+        state.alert_id = None  # back in control; a new run-up may alert again
+
+
+def _bump_count(db: Session, village: str, symptom: str, day: date):
+    updated = db.query(SymptomDailyCount).filter(
+        SymptomDailyCount.village == village,
+        SymptomDailyCount.symptom == symptom,
+        SymptomDailyCount.day == day
+    ).update({SymptomDailyCount.count: SymptomDailyCount.count + 1}, synchronize_session=False)
+    if not updated:
+        db.add(SymptomDailyCount(village=village, symptom=symptom, day=day, count=1))
+        db.flush()
+
+
+def _claim_state(db: Session, village: str, symptom: str) -> Optional[OutbreakDetectorState]:
+    """The series' state, read after writing to its row so concurrent observers of
+    a series take turns: the write holds the row lock on Postgres and the database
+    write lock on SQLite (where SELECT ... FOR UPDATE does nothing) until commit"""
+    claimed = db.query(OutbreakDetectorState).filter(
+        OutbreakDetectorState.village == village,
+        OutbreakDetectorState.symptom == symptom
+    ).update({OutbreakDetectorState.updated_at: datetime.utcnow()}, synchronize_session=False)
+    if not claimed:
+        return None
+    return db.query(OutbreakDetectorState).filter(
+        OutbreakDetectorState.village == village,
+        OutbreakDetectorState.symptom == symptom
+    ).populate_existing().one()
+
+
+def _raise_alert(db: Session, state: OutbreakDetectorState, location: str, score: float) -> OutbreakAlert:
+    name = state.symptom.replace("_", " ")
+    alert = OutbreakAlert(
+        disease_name=f"Unusual rise in {name}",
+        location=location,
+        affected_count=state.day_count,
+        severity_level=min(5, 1 + int(score // OUTBREAK_CUSUM_H)),
+        description=(f"Automatic alert: {state.day_count} {name} cases in {location} on {state.day} "
+                     f"against a baseline of {state.mean:.1f}/day (CUSUM {score:.1f})"),
+        status="active"
+    )
+    db.add(alert)
+    db.flush()
+    state.alert_id = alert.id
+    return alert
+
+
+def observe(db: Session, village: str, symptom: str, day: date, location: str = "",
+            raise_alerts: bool = True) -> Optional[OutbreakAlert]:
+    """Count one case of `symptom` in `village` on `day`; returns a newly raised alert"""
+    _bump_count(db, village, symptom, day)
+    state = _claim_state(db, village, symptom)
+    if state is None:
+        # A symptom new to the village starts from a zero baseline as long as the village has history;
+        # a concurrent first observer fails on the unique (village, symptom) and is retried
+        first_day = db.query(func.min(SymptomDailyCount.day)).filter(
+            SymptomDailyCount.village == village,
+            SymptomDailyCount.symptom == TOTAL_SERIES
+        ).scalar()
+        state = OutbreakDetectorState(village=village, symptom=symptom, day=day, day_count=0,
+                                      mean=0.0, variance=0.0, cusum=0.0,
+                                      days_observed=max(0, (day - first_day).days) if first_day else 0)
+        db.add(state)
+        db.flush()
+    elif day > state.day:
+        _advance(state, day)
+    elif day < state.day:
+        return None  # late record: counted for trends, but the baseline has moved on
+
+    state.day_count += 1
+    state.updated_at = datetime.utcnow()
+    if not raise_alerts or state.days_observed < OUTBREAK_WARMUP_DAYS or state.day_count < OUTBREAK_MIN_CASES:
+        return None
+    score = current_score(state)
+    if score <= OUTBREAK_CUSUM_H:
+        return None
+    if state.alert_id is not None:
+        alert = db.query(OutbreakAlert).filter(OutbreakAlert.id == state.alert_id).first()
+        if alert is not None and alert.status == "active":
+            alert.affected_count = max(alert.affected_count or 0, state.day_count)
+            alert.severity_level = max(alert.severity_level or 1, min(5, 1 + int(score // OUTBREAK_CUSUM_H)))
+            alert.updated_at = datetime.utcnow()
+            return None
+    return _raise_alert(db, state, location or village, score)
+
+
+def observe_case(db: Session, record: Record, patient: Optional[Patient], raise_alerts: bool = True) -> List[OutbreakAlert]:
+    """Update every series a record belongs to (caller commits)"""
+    village = normalize_village(patient.village if patient else None)
+    if not village:
+        return []
+    day = (record.created_at or datetime.utcnow()).date()
+    location = patient.village.strip()
+    _bump_count(db, village, TOTAL_SERIES, day)
+    if record.is_emergency:
+        _bump_count(db, village, EMERGENCY_SERIES, day)
+    symptoms = decode_symptom_ids(record.symptom_ids) or normalize_symptoms(record.symptoms or "")
+    alerts = []
+    for symptom in sorted(set(symptoms)):
+        alert = observe(db, village, symptom, day, location, raise_alerts)
+        if alert is not None:
+            alerts.append(alert)
+    return alerts
+
+
+def observe_record(record_id: int):
+    """Background task: feed a committed record to the outbreak detector"""
+    for attempt in range(2):
+        db = SessionLocal()
+        try:
+            record = db.query(Record).filter(Record.id == record_id).first()
+            if not record:
+                return
+            patient = db.query(Patient).filter(Patient.id == record.patient_id).first()
+            alerts = observe_case(db, record, patient)
+            db.commit()
+            for alert in alerts:
+                logger.warning("Outbreak alert %s raised: %s in %s", alert.id, alert.disease_name, alert.location)
+            return
+        except IntegrityError:
+            # Another writer created the same counter row first; retry once
+            db.rollback()
+        except Exception:
+            db.rollback()
+            logger.exception("Outbreak detection failed for record %s", record_id)
+            return
+        finally:
+            db.close()
+
+
+def location_counts(db: Session, location: str, since: date) -> Dict[str, int]:
+    """Series (symptom or total) -> count since `since` in the village named `location`"""
+    rows = db.query(SymptomDailyCount.symptom, func.sum(SymptomDailyCount.count)).filter(
+        SymptomDailyCount.village == normalize_village(location),
+        SymptomDailyCount.day >= since
+    ).group_by(SymptomDailyCount.symptom).all()
+    return {symptom: int(count or 0) for symptom, count in rows}
+
+
+def location_scores(db: Session, location: str, top: int = 10) -> List[Dict]:
+    """Highest current anomaly scores of the symptom series of the village named `location` (all if empty)"""
+    query = db.query(OutbreakDetectorState)
+    if location:
+        query = query.filter(OutbreakDetectorState.village == normalize_village(location))
+    states = query.all()
+    scored = [
+        {"village": state.village, "symptom": state.symptom, "day": state.day.isoformat(),
+         "day_count": state.day_count, "baseline": round(state.mean, 2), "score": round(current_score(state), 2),
+         "alert_id": state.alert_id}
+        for state in states
+    ]
+    scored = [entry for entry in scored if entry["score"] > 0]
+    return sorted(scored, key=lambda entry: -entry["score"])[:top]
+
+
+def rebuild(raise_alerts: bool = False, batch_size: int = 500) -> int:
+    """Clear the counters and replay every record in time order"""
+    db = SessionLocal()
+    try:
+        db.query(OutbreakDetectorState).delete()
+        db.query(SymptomDailyCount).delete()
+        db.commit()
+        replayed, last_key = 0, (datetime.min, 0)
+        while True:
+            batch = db.query(Record, Patient).outerjoin(Patient, Patient.id == Record.patient_id).filter(
+                Record.created_at.isnot(None)
+            ).filter(
+                (Record.created_at > last_key[0]) | ((Record.created_at == last_key[0]) & (Record.id > last_key[1]))
+            ).order_by(Record.created_at, Record.id).limit(batch_size).all()
+            if not batch:
+                break
+            for record, patient in batch:
+                observe_case(db, record, patient, raise_alerts)
+            db.commit()
+            replayed += len(batch)
+            last_key = (batch[-1][0].created_at, batch[-1][0].id)
+        return replayed
+    finally:
+        db.close()
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Streaming outbreak detector")
+    commands = parser.add_subparsers(dest="command", required=True)
+    rebuild_parser = commands.add_parser("rebuild", help="replay all records into the counters")
+    rebuild_parser.add_argument("--alerts", action="store_true", help="raise alerts for past anomalies too")
+    status_parser = commands.add_parser("status", help="highest current anomaly scores")
+    status_parser.add_argument("--top", type=int, default=20)
+    args = parser.parse_args(argv)
+
+    if args.command == "rebuild":
+        replayed = rebuild(args.alerts)
+        print(f"✅ Replayed {replayed} records into the outbreak counters")
+    elif args.command == "status":
+        db = SessionLocal()
+        try:
+            for entry in location_scores(db, "", args.top):
+                flag = "🚨" if entry["alert_id"] else "  "
+                print(f"{flag} {entry['village']:<20} {entry['symptom']:<25} {entry['day_count']:>4} today  "
+                      f"baseline {entry['baseline']:>6}  score {entry['score']:>6}")
+        finally:
+            db.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
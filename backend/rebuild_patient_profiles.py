@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Script to rebuild the patient_insight_profiles table from existing records,
+for databases that predate it or after records were changed by bulk SQL.
+Top symptoms come from record_symptoms, so run backfill_record_symptoms.py
+first on databases that predate that table too. Safe to re-run.
+"""
+
+import json
+from collections import defaultdict
+from datetime import datetime
+
+from sqlalchemy import case, func
+
+from database import SessionLocal, create_tables
+from models import Patient, Record, RecordSymptom, PatientInsightProfile
+from record_analytics import PROFILE_TOP_SYMPTOMS
+
+BATCH_SIZE = 500
+
+def rebuild_patient_profiles():
+    """Rewrite the profile of every patient, batch by batch, from grouped aggregates"""
+    create_tables()  # creates patient_insight_profiles in older databases
+    db = SessionLocal()
+
+    try:
+        profiles = 0
+        last_id = 0
+        while True:
+            patient_ids = [row[0] for row in db.query(Patient.id).filter(Patient.id > last_id)
+                           .order_by(Patient.id).limit(BATCH_SIZE).all()]
+            if not patient_ids:
+                break
+            totals = {
+                patient_id: (consultations, int(emergencies or 0), last_visit)
+                for patient_id, consultations, emergencies, last_visit in db.query(
+                    Record.patient_id,
+                    func.count(Record.id),
+                    func.sum(case((Record.is_emergency == True, 1), else_=0)),
+                    func.max(Record.created_at)
+                ).filter(Record.patient_id.in_(patient_ids)).group_by(Record.patient_id).all()
+            }
+            symptoms = defaultdict(list)
+            for patient_id, token, count in db.query(
+                RecordSymptom.patient_id, RecordSymptom.symptom_token, func.count(RecordSymptom.id)
+            ).filter(RecordSymptom.patient_id.in_(patient_ids)).group_by(
+                RecordSymptom.patient_id, RecordSymptom.symptom_token
+            ).all():
+                symptoms[patient_id].append([token, count])
+
+            now = datetime.utcnow()
+            rows = []
+            for patient_id in patient_ids:
+                consultations, emergencies, last_visit = totals.get(patient_id, (0, 0, None))
+                top = sorted(symptoms[patient_id], key=lambda pair: (-pair[1], pair[0]))[:PROFILE_TOP_SYMPTOMS]
+                rows.append({"patient_id": patient_id, "consultation_count": consultations,
+                             "emergency_count": emergencies, "top_symptoms": json.dumps(top),
+                             "last_visit": last_visit, "updated_at": now})
+            db.query(PatientInsightProfile).filter(
+                PatientInsightProfile.patient_id.in_(patient_ids)
+            ).delete(synchronize_session=False)
+            db.execute(PatientInsightProfile.__table__.insert(), rows)
+            db.commit()
+            profiles += len(rows)
+            last_id = patient_ids[-1]
+        print(f"✅ patient_insight_profiles: rebuilt {profiles} patient profiles")
+
+    except Exception as e:
+        print(f"❌ Error rebuilding patient profiles: {e}")
+        db.rollback()
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    rebuild_patient_profiles()
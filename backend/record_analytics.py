@@ -0,0 +1,142 @@
+"""
+Rows derived from health records: the record_symptoms token table and each
+patient's insight profile. Code that creates, changes or deletes records calls
+these explicitly, in the same transaction as the record itself, so a
+committed record is always counted.
+"""
+
+import json
+from datetime import datetime
+from typing import Iterable, Optional
+
+from sqlalchemy import case, func, select
+from sqlalchemy.orm import Session
+
+from models import Patient, PatientInsightProfile, Record, RecordSymptom, normalize_village
+from symptom_normalizer import decode_symptom_ids
+
+PROFILE_TOP_SYMPTOMS = 5
+
+
+def record_symptom_rows(connection, record):
+    """record_symptoms rows for a record, with the patient's village looked up on the same connection"""
+    village = None
+    if record.patient_id is not None:
+        village = connection.execute(select(Patient.village).where(Patient.id == record.patient_id)).scalar()
+    return [
+        {"record_id": record.id, "patient_id": record.patient_id, "symptom_token": token,
+         "created_at": record.created_at, "village": normalize_village(village) or None}
+        for token in sorted(set(decode_symptom_ids(record.symptom_ids)))
+    ]
+
+
+def _top_symptoms(connection, patient_id):
+    """Most frequent symptoms of a patient, from their indexed record_symptoms rows"""
+    records = func.count(RecordSymptom.id)
+    rows = connection.execute(
+        select(RecordSymptom.symptom_token, records)
+        .where(RecordSymptom.patient_id == patient_id)
+        .group_by(RecordSymptom.symptom_token)
+        .order_by(records.desc(), RecordSymptom.symptom_token)
+        .limit(PROFILE_TOP_SYMPTOMS)
+    ).all()
+    return json.dumps([[token, count] for token, count in rows])
+
+
+def patient_profile_values(connection, patient_id):
+    """Profile columns of a patient computed from all of their records"""
+    consultations, emergencies, last_visit = connection.execute(
+        select(func.count(Record.id),
+               func.sum(case((Record.is_emergency == True, 1), else_=0)),
+               func.max(Record.created_at))
+        .where(Record.patient_id == patient_id)
+    ).one()
+    return {"patient_id": patient_id, "consultation_count": consultations, "emergency_count": int(emergencies or 0),
+            "top_symptoms": _top_symptoms(connection, patient_id), "last_visit": last_visit,
+            "updated_at": datetime.utcnow()}
+
+
+def refresh_patient_profile(connection, patient_id):
+    """Recompute one patient's profile row, creating it if missing"""
+    if patient_id is None:
+        return
+    table = PatientInsightProfile.__table__
+    values = patient_profile_values(connection, patient_id)
+    if not connection.execute(table.update().where(table.c.patient_id == patient_id).values(values)).rowcount:
+        connection.execute(table.insert(), values)
+
+
+def _merge_top_symptoms(connection, top_symptoms, record):
+    """Stored top symptoms with the record's tokens recounted; only their counts can have changed"""
+    tokens = sorted(set(decode_symptom_ids(record.symptom_ids)))
+    if not tokens:
+        return top_symptoms
+    counts = dict(json.loads(top_symptoms or "[]"))
+    counts.update(connection.execute(
+        select(RecordSymptom.symptom_token, func.count(RecordSymptom.id))
+        .where(RecordSymptom.patient_id == record.patient_id, RecordSymptom.symptom_token.in_(tokens))
+        .group_by(RecordSymptom.symptom_token)
+    ).all())
+    ranked = sorted(counts.items(), key=lambda item: (-item[1], item[0]))[:PROFILE_TOP_SYMPTOMS]
+    return json.dumps([[token, count] for token, count in ranked])
+
+
+def _count_record_in_profile(connection, record) -> bool:
+    """Add a new record to its patient's profile row; False if the patient has no row yet"""
+    table = PatientInsightProfile.__table__
+    top_symptoms = connection.execute(
+        select(table.c.top_symptoms).where(table.c.patient_id == record.patient_id)
+    ).first()
+    if top_symptoms is None:
+        return False
+    visit = record.created_at or datetime.utcnow()
+    connection.execute(table.update().where(table.c.patient_id == record.patient_id).values(
+        consultation_count=table.c.consultation_count + 1,
+        emergency_count=table.c.emergency_count + (1 if record.is_emergency else 0),
+        last_visit=case((table.c.last_visit > visit, table.c.last_visit), else_=visit),
+        top_symptoms=_merge_top_symptoms(connection, top_symptoms[0], record),
+        updated_at=datetime.utcnow()
+    ))
+    return True
+
+
+def records_created(db: Session, records: Iterable[Record]):
+    """Index new records' symptoms and count them in their patients' profiles"""
+    records = list(records)
+    if not records:
+        return
+    db.flush()  # assigns the record ids
+    connection = db.connection()
+    rows = [row for record in records for row in record_symptom_rows(connection, record)]
+    if rows:
+        connection.execute(RecordSymptom.__table__.insert(), rows)
+    # Tokens are indexed first, so _merge_top_symptoms already counts them
+    refreshed = set()
+    for record in records:
+        if record.patient_id is None or record.patient_id in refreshed:
+            continue
+        if not _count_record_in_profile(connection, record):
+            # First record counted for this patient: their whole history comes in at once
+            refresh_patient_profile(connection, record.patient_id)
+            refreshed.add(record.patient_id)
+
+
+def record_changed(db: Session, record: Record, previous_patient_id: Optional[int] = None):
+    """Re-index a changed record and recount its profile (and the previous patient's, if it moved)"""
+    db.flush()
+    connection = db.connection()
+    connection.execute(RecordSymptom.__table__.delete().where(RecordSymptom.record_id == record.id))
+    rows = record_symptom_rows(connection, record)
+    if rows:
+        connection.execute(RecordSymptom.__table__.insert(), rows)
+    for patient_id in {record.patient_id, previous_patient_id}:
+        refresh_patient_profile(connection, patient_id)
+
+
+def delete_record(db: Session, record: Record):
+    """Delete a record with its token rows and take it out of its patient's profile"""
+    connection = db.connection()
+    connection.execute(RecordSymptom.__table__.delete().where(RecordSymptom.record_id == record.id))
+    db.delete(record)
+    db.flush()
+    refresh_patient_profile(connection, record.patient_id)
@@ -0,0 +1,93 @@
+"""
+Keyset pagination and field projection for record listings
+Pages are ordered newest first on (created_at, id) and continue from an opaque
+cursor holding the last row's key, so every page is an index range scan no
+matter how deep the client has scrolled. Total counts are optional and cached
+briefly, since counting a large listing costs more than reading a page of it.
+"""
+
+import base64
+import os
+from datetime import datetime
+from typing import Dict, Hashable, List, Optional, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy import and_, func, or_
+from sqlalchemy.orm import Query
+
+from ai_cache import TTLCache
+from models import Record
+
+RECORD_PAGE_SIZE = 50
+RECORD_MAX_PAGE_SIZE = 200
+RECORD_COUNT_CACHE_SECONDS = float(os.getenv("RECORD_COUNT_CACHE_SECONDS", "60"))
+
+RECORD_FIELDS = ("id", "patient_id", "doctor_id", "symptoms", "diagnosis", "prescriptions",
+                 "notes", "follow_up_date", "is_emergency", "created_at")
+# Always returned: the cursor is built from them
+KEY_FIELDS = ("id", "created_at")
+
+_count_cache = TTLCache(maxsize=1024, ttl_seconds=RECORD_COUNT_CACHE_SECONDS)
+
+
+def parse_fields(fields: Optional[str]) -> Tuple[str, ...]:
+    """Requested record fields in schema order; every field when none are given"""
+    if not fields:
+        return RECORD_FIELDS
+    requested = {field.strip() for field in fields.split(",") if field.strip()}
+    unknown = requested - set(RECORD_FIELDS)
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown record fields: {', '.join(sorted(unknown))}")
+    return tuple(field for field in RECORD_FIELDS if field in requested or field in KEY_FIELDS)
+
+
+def encode_cursor(created_at: Optional[datetime], record_id: int) -> str:
+    stamp = created_at.isoformat() if created_at else ""
+    return base64.urlsafe_b64encode(f"{stamp}|{record_id}".encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[Optional[datetime], int]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        created_at, record_id = raw.rsplit("|", 1)
+        return (datetime.fromisoformat(created_at) if created_at else None), int(record_id)
+    except (ValueError, UnicodeDecodeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def record_page(query: Query, fields: Tuple[str, ...], limit: int = RECORD_PAGE_SIZE,
+                cursor: Optional[str] = None) -> Tuple[List[Dict], Optional[str]]:
+    """One page of a record query, newest first, as dicts of the selected fields
+
+    `query` is a filtered query over Record; returns the rows and the cursor of the
+    next page, or None on the last page. Records without created_at (written by raw
+    SQL; the column allows NULL) come last, ordered by id.
+    """
+    if cursor:
+        created_at, record_id = decode_cursor(cursor)
+        if created_at is None:
+            query = query.filter(Record.created_at.is_(None), Record.id < record_id)
+        else:
+            query = query.filter(or_(
+                Record.created_at < created_at,
+                and_(Record.created_at == created_at, Record.id < record_id),
+                Record.created_at.is_(None)
+            ))
+    rows = query.with_entities(*[getattr(Record, field) for field in fields]).order_by(
+        Record.created_at.desc().nulls_last(), Record.id.desc()
+    ).limit(limit + 1).all()
+    records = [dict(row._mapping) for row in rows[:limit]]
+    next_cursor = None
+    if len(rows) > limit:
+        last = records[-1]
+        next_cursor = encode_cursor(last["created_at"], last["id"])
+    return records, next_cursor
+
+
+def cached_count(key: Hashable, query: Query) -> int:
+    """Row count of a record query, cached for RECORD_COUNT_CACHE_SECONDS under `key`"""
+    total = _count_cache.get(key)
+    if total is None:
+        total = query.with_entities(func.count(Record.id)).scalar()
+        _count_cache.put(key, total)
+    return total
@@ -0,0 +1,146 @@
+"""
+Full-text search over health records
+SQLite keeps an external-content FTS5 table in step with `records` through
+triggers; Postgres keeps a generated tsvector column with a GIN index. Either
+way the index is written by the database in the same transaction as the
+record, so a committed record is immediately searchable.
+"""
+
+import re
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import inspect, text
+from sqlalchemy.orm import Session
+
+from database import engine
+from models import normalize_village
+
+SEARCH_TABLE = "records_fts"
+SEARCH_COLUMNS = ("symptoms", "diagnosis", "prescriptions", "notes")
+# bm25 / setweight weights per column: symptoms and diagnosis matter most
+SQLITE_WEIGHTS = (4.0, 3.0, 1.5, 1.0)
+POSTGRES_WEIGHTS = ("A", "B", "C", "D")
+MAX_QUERY_TERMS = 8
+
+_SQLITE_TRIGGERS = {
+    "records_fts_insert": f"""
+        CREATE TRIGGER IF NOT EXISTS records_fts_insert AFTER INSERT ON records BEGIN
+            INSERT INTO {SEARCH_TABLE}(rowid, symptoms, diagnosis, prescriptions, notes)
+            VALUES (new.id, new.symptoms, new.diagnosis, new.prescriptions, new.notes);
+        END""",
+    "records_fts_delete": f"""
+        CREATE TRIGGER IF NOT EXISTS records_fts_delete AFTER DELETE ON records BEGIN
+            INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}, rowid, symptoms, diagnosis, prescriptions, notes)
+            VALUES ('delete', old.id, old.symptoms, old.diagnosis, old.prescriptions, old.notes);
+        END""",
+    "records_fts_update": f"""
+        CREATE TRIGGER IF NOT EXISTS records_fts_update
+        AFTER UPDATE OF symptoms, diagnosis, prescriptions, notes ON records BEGIN
+            INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}, rowid, symptoms, diagnosis, prescriptions, notes)
+            VALUES ('delete', old.id, old.symptoms, old.diagnosis, old.prescriptions, old.notes);
+            INSERT INTO {SEARCH_TABLE}(rowid, symptoms, diagnosis, prescriptions, notes)
+            VALUES (new.id, new.symptoms, new.diagnosis, new.prescriptions, new.notes);
+        END""",
+}
+
+
+def ensure_search_index():
+    """Create the search index for the current backend if it is missing (idempotent)"""
+    inspector = inspect(engine)
+    if not inspector.has_table("records"):
+        return
+    with engine.begin() as connection:
+        if engine.dialect.name == "sqlite":
+            created = not inspector.has_table(SEARCH_TABLE)
+            connection.execute(text(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_TABLE} USING fts5("
+                f"{', '.join(SEARCH_COLUMNS)}, content='records', content_rowid='id', "
+                "tokenize='unicode61 remove_diacritics 2')"
+            ))
+            for statement in _SQLITE_TRIGGERS.values():
+                connection.execute(text(statement))
+            if created:
+                # Index the records written before the table existed
+                connection.execute(text(f"INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}) VALUES ('rebuild')"))
+        elif engine.dialect.name == "postgresql":
+            vector = " || ".join(
+                f"setweight(to_tsvector('simple', coalesce({column}, '')), '{weight}')"
+                for column, weight in zip(SEARCH_COLUMNS, POSTGRES_WEIGHTS)
+            )
+            if "search_vector" not in {column["name"] for column in inspector.get_columns("records")}:
+                connection.execute(text(
+                    f"ALTER TABLE records ADD COLUMN search_vector tsvector GENERATED ALWAYS AS ({vector}) STORED"
+                ))
+            connection.execute(text(
+                "CREATE INDEX IF NOT EXISTS ix_records_search_vector ON records USING GIN (search_vector)"
+            ))
+
+
+def rebuild_search_index():
+    """Re-index every record (SQLite only; the Postgres column is always current)"""
+    ensure_search_index()
+    if engine.dialect.name == "sqlite":
+        with engine.begin() as connection:
+            connection.execute(text(f"INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}) VALUES ('rebuild')"))
+
+
+def query_terms(q: str) -> List[str]:
+    """Lowercased word terms of a free-text query; operators and quotes are dropped"""
+    return re.findall(r"\w+", q.lower())[:MAX_QUERY_TERMS]
+
+
+def _match_expression(terms: List[str]) -> str:
+    """All terms must match; the last one as a prefix so partial words still find records"""
+    if engine.dialect.name == "postgresql":
+        return " & ".join(terms[:-1] + [f"{terms[-1]}:*"])
+    return " ".join([f'"{term}"' for term in terms[:-1]] + [f'"{terms[-1]}"*'])
+
+
+def search_records(db: Session, q: str, village: Optional[str] = None, patient_id: Optional[int] = None,
+                   limit: int = 20, offset: int = 0) -> List[Tuple[int, float, str]]:
+    """(record id, rank, snippet) of matching records, best first; higher rank is better"""
+    terms = query_terms(q)
+    if not terms:
+        return []
+
+    params: Dict = {"query": _match_expression(terms), "limit": limit, "offset": offset}
+    filters = ""
+    if patient_id is not None:
+        filters += " AND r.patient_id = :patient_id"
+        params["patient_id"] = patient_id
+    village = normalize_village(village)
+    if village:
+        filters += " AND p.village_key = :village"
+        params["village"] = village
+
+    if engine.dialect.name == "postgresql":
+        statement = f"""
+            SELECT r.id, ts_rank_cd(r.search_vector, tsq) AS score,
+                   ts_headline('simple', concat_ws(' … ', r.symptoms, r.diagnosis, r.prescriptions, r.notes),
+                               tsq, 'StartSel=[, StopSel=], MaxFragments=2') AS snippet
+            FROM records r
+            CROSS JOIN to_tsquery('simple', :query) AS tsq
+            LEFT JOIN patients p ON p.id = r.patient_id
+            WHERE r.search_vector @@ tsq{filters}
+            ORDER BY score DESC, r.created_at DESC
+            LIMIT :limit OFFSET :offset"""
+    else:
+        weights = ", ".join(str(weight) for weight in SQLITE_WEIGHTS)
+        statement = f"""
+            SELECT r.id, -bm25({SEARCH_TABLE}, {weights}) AS score,
+                   snippet({SEARCH_TABLE}, -1, '[', ']', '…', 12) AS snippet
+            FROM {SEARCH_TABLE}
+            JOIN records r ON r.id = {SEARCH_TABLE}.rowid
+            LEFT JOIN patients p ON p.id = r.patient_id
+            WHERE {SEARCH_TABLE} MATCH :query{filters}
+            ORDER BY score DESC, r.created_at DESC
+            LIMIT :limit OFFSET :offset"""
+    rows = db.execute(text(statement), params).all()
+    return [(record_id, float(score or 0.0), snippet or "") for record_id, score, snippet in rows]
+
+
+if __name__ == "__main__":
+    from database import create_tables
+    create_tables()
+    rebuild_search_index()
+    print(f"✅ Search index rebuilt ({engine.dialect.name})")
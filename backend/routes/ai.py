@@ -1,10 +1,16 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
 from typing import List
+from datetime import datetime
+import json
 from database import get_db
-from models import User, Patient, Record, Medicine, OutbreakAlert
-from schemas import SymptomAnalysisRequest, SymptomAnalysisResponse, OutbreakAlertCreate, OutbreakAlertResponse
-from utils import analyze_symptoms_ai, predict_medicine_demand
+from models import User, Patient, Record, Medicine, OutbreakAlert, PatientInsightProfile, UserRole, normalize_village
+from schemas import SymptomAnalysisRequest, SymptomAnalysisResponse, OutbreakAlertCreate, OutbreakAlertResponse, OutbreakPlanRequest
+from utils import analyze_symptoms_ai
+from record_analytics import patient_profile_values
+from medicine_demand import outbreak_medicine_demand, plan_outbreaks
+from workload_forecast import workload_forecaster
+from outbreak_detector import location_counts, location_scores, TOTAL_SERIES, EMERGENCY_SERIES
 from .auth import get_current_user
 
 router = APIRouter(prefix="/ai", tags=["ai"])
@@ -20,10 +26,10 @@ def analyze_symptoms(
     if not patient:
         raise HTTPException(status_code=404, detail="Patient not found")
     
-    if current_user.role == "patient":
+    if current_user.role == UserRole.patient:
         if patient.user_id != current_user.id:
             raise HTTPException(status_code=403, detail="Not authorized to analyze symptoms for this patient")
-    elif current_user.role not in ["admin", "doctor"]:
+    elif current_user.role not in [UserRole.admin, UserRole.doctor]:
         raise HTTPException(status_code=403, detail="Not authorized")
     
     # Get patient's medical history for context
@@ -55,18 +61,20 @@ def get_patient_insights(
     if not patient:
         raise HTTPException(status_code=404, detail="Patient not found")
     
-    if current_user.role == "patient":
+    if current_user.role == UserRole.patient:
         if patient.user_id != current_user.id:
             raise HTTPException(status_code=403, detail="Not authorized")
-    elif current_user.role not in ["admin", "doctor"]:
+    elif current_user.role not in [UserRole.admin, UserRole.doctor]:
         raise HTTPException(status_code=403, detail="Not authorized")
     
-    # Get patient's consultation history
-    records = db.query(Record).filter(
-        Record.patient_id == patient_id
-    ).order_by(Record.created_at.desc()).all()
+    # Consultation history from the patient's precomputed profile row
+    profile = db.query(PatientInsightProfile).filter(PatientInsightProfile.patient_id == patient_id).first()
+    if profile is None:
+        # No records counted yet, or the patient predates profiles: compute, don't store
+        profile = PatientInsightProfile(**patient_profile_values(db.connection(), patient_id))
     
-    if not records:
+    total_consultations = profile.consultation_count or 0
+    if not total_consultations:
         return {
             "total_consultations": 0,
             "common_symptoms": [],
@@ -74,32 +82,21 @@ def get_patient_insights(
             "recommendations": ["Schedule regular health checkups"]
         }
     
-    # Analyze patterns
-    all_symptoms = []
-    emergency_count = 0
-    
-    for record in records:
-        if record.symptoms:
-            all_symptoms.extend(record.symptoms.lower().split())
-        if record.is_emergency:
-            emergency_count += 1
-    
-    # Find most common symptoms
-    from collections import Counter
-    symptom_counter = Counter(all_symptoms)
-    common_symptoms = [symptom for symptom, count in symptom_counter.most_common(5) if len(symptom) > 3]
+    emergency_count = profile.emergency_count or 0
+    last_visit = profile.last_visit
+    common_symptoms = [symptom for symptom, _ in json.loads(profile.top_symptoms or "[]")]
     
     # Generate insights
     health_trends = "Stable health pattern"
-    if emergency_count > len(records) * 0.3:
+    if emergency_count > total_consultations * 0.3:
         health_trends = "Frequent emergency visits - requires attention"
-    elif len(records) > 10:
+    elif total_consultations > 10:
         health_trends = "Regular consultation pattern - good health monitoring"
     
     recommendations = []
     if "fever" in common_symptoms:
         recommendations.append("Monitor temperature regularly")
-    if "pain" in common_symptoms:
+    if any("pain" in symptom or "ache" in symptom for symptom in common_symptoms):
         recommendations.append("Consider pain management consultation")
     if emergency_count > 2:
         recommendations.append("Schedule preventive health checkup")
@@ -107,47 +104,73 @@ def get_patient_insights(
         recommendations.append("Maintain current health practices")
     
     return {
-        "total_consultations": len(records),
+        "total_consultations": total_consultations,
         "emergency_visits": emergency_count,
         "common_symptoms": common_symptoms,
         "health_trends": health_trends,
         "recommendations": recommendations,
-        "last_visit": records[0].created_at if records else None
+        "last_visit": last_visit
     }
 
+@router.get("/outbreak-alerts", response_model=List[OutbreakAlertResponse])
+def get_outbreak_alerts(
+    status: str = "proposed",
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Outbreak alerts by status; "proposed" lists the clusters awaiting confirmation"""
+    if current_user.role not in [UserRole.admin, UserRole.gov_official]:
+        raise HTTPException(status_code=403, detail="Not authorized to view outbreak alerts")
+    
+    query = db.query(OutbreakAlert)
+    if status:
+        query = query.filter(OutbreakAlert.status == status)
+    return query.order_by(OutbreakAlert.updated_at.desc()).all()
+
+@router.put("/outbreak-alert/{alert_id}/confirm", response_model=OutbreakAlertResponse)
+def confirm_outbreak_alert(
+    alert_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Confirm a proposed outbreak alert, making it active"""
+    if current_user.role not in [UserRole.admin, UserRole.gov_official]:
+        raise HTTPException(status_code=403, detail="Not authorized to confirm outbreak alerts")
+    
+    alert = db.query(OutbreakAlert).filter(OutbreakAlert.id == alert_id).first()
+    if not alert:
+        raise HTTPException(status_code=404, detail="Outbreak alert not found")
+    if alert.status != "proposed":
+        raise HTTPException(status_code=400, detail=f"Outbreak alert is {alert.status}, not proposed")
+    
+    alert.status = "active"
+    alert.updated_at = datetime.utcnow()
+    db.commit()
+    db.refresh(alert)
+    return alert
+
 @router.post("/outbreak-prediction")
 def predict_outbreak_impact(
     outbreak_data: OutbreakAlertCreate,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    if current_user.role not in ["admin", "gov_official"]:
+    if current_user.role not in [UserRole.admin, UserRole.gov_official]:
         raise HTTPException(status_code=403, detail="Not authorized to create outbreak predictions")
     
-    # Predict medicine demand
-    medicine_demand = predict_medicine_demand(
+    # Predict medicine demand from the fitted model, with stock read in the same pass
+    demand = outbreak_medicine_demand(
+        db,
         outbreak_data.disease_name,
         outbreak_data.affected_count,
         outbreak_data.location
     )
-    
-    # Check current medicine stock
-    current_stock = {}
-    for medicine_name in medicine_demand.keys():
-        medicine = db.query(Medicine).filter(
-            Medicine.name.ilike(f"%{medicine_name}%")
-        ).first()
-        if medicine:
-            current_stock[medicine_name] = medicine.stock_quantity
-        else:
-            current_stock[medicine_name] = 0
-    
-    # Calculate shortages
-    shortages = {}
-    for medicine, demand in medicine_demand.items():
-        current = current_stock.get(medicine, 0)
-        if current < demand:
-            shortages[medicine] = demand - current
+    medicine_demand = {entry["name"]: entry["expected_units"] for entry in demand}
+    current_stock = {entry["name"]: entry["current_stock"] for entry in demand}
+    shortages = {
+        entry["name"]: entry["expected_units"] - entry["current_stock"]
+        for entry in demand if entry["current_stock"] < entry["expected_units"]
+    }
     
     # Create outbreak alert
     db_outbreak = OutbreakAlert(
@@ -156,25 +179,23 @@ def predict_outbreak_impact(
         affected_count=outbreak_data.affected_count,
         severity_level=outbreak_data.severity_level,
         description=outbreak_data.description,
-        medicines_needed=str(medicine_demand)
+        medicines_needed=json.dumps(medicine_demand)
     )
-    
     db.add(db_outbreak)
-    db.commit()
-    db.refresh(db_outbreak)
     
     # Update medicine outbreak flags
-    for medicine_name in medicine_demand.keys():
-        medicine = db.query(Medicine).filter(
-            Medicine.name.ilike(f"%{medicine_name}%")
-        ).first()
-        if medicine:
-            medicine.outbreak_demand_flag = True
-            db.commit()
+    medicine_ids = [entry["medicine_id"] for entry in demand if entry["medicine_id"] is not None]
+    if medicine_ids:
+        db.query(Medicine).filter(Medicine.id.in_(medicine_ids)).update(
+            {Medicine.outbreak_demand_flag: True}, synchronize_session=False
+        )
+    db.commit()
+    db.refresh(db_outbreak)
     
     return {
         "outbreak_alert": OutbreakAlertResponse.from_orm(db_outbreak),
         "predicted_demand": medicine_demand,
+        "demand_intervals": {entry["name"]: entry["interval"] for entry in demand},
         "current_stock": current_stock,
         "shortages": shortages,
         "recommendations": [
@@ -183,61 +204,89 @@ def predict_outbreak_impact(
         ] if shortages else ["Current stock levels are adequate"]
     }
 
+@router.post("/outbreak-plan")
+def plan_outbreak_response(
+    plan_request: OutbreakPlanRequest,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Medicine plan for many simultaneous outbreaks: district shortages from one national stock pool"""
+    if current_user.role not in [UserRole.admin, UserRole.gov_official]:
+        raise HTTPException(status_code=403, detail="Not authorized to create outbreak predictions")
+    if not plan_request.outbreaks:
+        raise HTTPException(status_code=400, detail="At least one outbreak is required")
+    
+    plan = plan_outbreaks(db, [outbreak.dict() for outbreak in plan_request.outbreaks])
+    
+    # Alerts and medicine flags are written together, in one transaction
+    alert_responses = []
+    if not plan_request.dry_run:
+        if plan_request.create_alerts:
+            alerts = [
+                OutbreakAlert(
+                    disease_name=outbreak.disease_name,
+                    location=outbreak.location,
+                    affected_count=outbreak.affected_count,
+                    severity_level=outbreak.severity_level,
+                    description=outbreak.description,
+                    medicines_needed=json.dumps(demand)
+                )
+                for outbreak, demand in zip(plan_request.outbreaks, plan["outbreak_demand"])
+            ]
+            db.add_all(alerts)
+            db.flush()
+            alert_responses = [OutbreakAlertResponse.from_orm(alert) for alert in alerts]
+        if plan["medicine_ids"]:
+            db.query(Medicine).filter(Medicine.id.in_(plan["medicine_ids"])).update(
+                {Medicine.outbreak_demand_flag: True}, synchronize_session=False
+            )
+        db.commit()
+    
+    national_shortages = [entry for entry in plan["national"] if entry["shortage"] > 0]
+    return {
+        "outbreak_alerts": alert_responses,
+        "national": plan["national"],
+        "districts": sorted(plan["districts"], key=lambda district: -district["shortage_units"]),
+        "flagged_medicines": plan["medicine_ids"] if not plan_request.dry_run else [],
+        "recommendations": [
+            f"Increase stock for {entry['name']} by {entry['shortage']} units"
+            for entry in national_shortages
+        ] if national_shortages else ["Current stock levels are adequate"]
+    }
+
 @router.get("/doctor-workload-prediction")
 def predict_doctor_workload(
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    if current_user.role not in ["admin", "gov_official"]:
+    if current_user.role not in [UserRole.admin, UserRole.gov_official]:
         raise HTTPException(status_code=403, detail="Not authorized to view workload predictions")
     
     from sqlalchemy import func
-    from datetime import datetime, timedelta
-    from ..models import Queue, Doctor
+    from models import Queue, QueueStatus, Doctor
     
-    # Analyze current queue patterns
+    # Current queue patterns are live; the demand forecasts are precomputed
     current_queues = db.query(
         Doctor.specialization,
         func.count(Queue.id).label("queue_count"),
         func.avg(Queue.priority).label("avg_priority")
-    ).join(Queue, Doctor.id == Queue.doctor_id, isouter=True)\
-     .filter(Queue.status == "waiting")\
+    ).join(Queue, Doctor.id == Queue.doctor_id)\
+     .filter(Queue.status == QueueStatus.WAITING)\
      .group_by(Doctor.specialization).all()
+    queue_by_specialization = {row[0]: (row[1] or 0, row[2] or 1) for row in current_queues}
+    forecast = workload_forecaster.latest()
     
-    # Analyze historical patterns (last 30 days)
-    thirty_days_ago = datetime.utcnow() - timedelta(days=30)
-    historical_data = db.query(
-        Doctor.specialization,
-        func.count(Record.id).label("consultations"),
-        func.avg(
-            func.extract('epoch', Record.created_at - Queue.created_at) / 60
-        ).label("avg_consultation_time")
-    ).join(Record, Doctor.id == Record.doctor_id)\
-     .join(Queue, Queue.patient_id == Record.patient_id, isouter=True)\
-     .filter(Record.created_at >= thirty_days_ago)\
-     .group_by(Doctor.specialization).all()
-    
-    # Predict workload for next week
     predictions = []
-    for spec_data in current_queues:
-        specialization = spec_data[0]
-        current_queue = spec_data[1] or 0
-        avg_priority = spec_data[2] or 1
-        
-        # Find historical data for this specialization
-        historical = next((h for h in historical_data if h[0] == specialization), None)
-        avg_consultations = historical[1] if historical else 10
-        avg_time = historical[2] if historical and historical[2] else 15
-        
-        # Simple prediction model
-        predicted_demand = int(avg_consultations * 1.2)  # 20% increase assumption
-        estimated_hours = (predicted_demand * avg_time) / 60
-        
+    for specialization in sorted(set(queue_by_specialization) | set(forecast["specializations"])):
+        current_queue, avg_priority = queue_by_specialization.get(specialization, (0, 1))
+        expected = forecast["specializations"].get(specialization, {})
         predictions.append({
             "specialization": specialization,
             "current_queue": current_queue,
-            "predicted_weekly_demand": predicted_demand,
-            "estimated_hours_needed": round(estimated_hours, 1),
+            "predicted_weekly_demand": expected.get("predicted_weekly_demand", 0),
+            "demand_interval": expected.get("interval", [0, 0]),
+            "daily_forecast": expected.get("daily_forecast", []),
+            "estimated_hours_needed": expected.get("estimated_hours_needed", 0.0),
             "priority_level": "high" if avg_priority > 2.5 else "medium" if avg_priority > 1.5 else "low"
         })
     
@@ -257,7 +306,9 @@ def predict_doctor_workload(
         "workload_predictions": predictions,
         "total_predicted_hours": round(total_predicted_hours, 1),
         "available_doctors": available_doctors,
-        "recommendations": recommendations
+        "recommendations": recommendations,
+        "forecast_model": forecast["model"],
+        "forecast_generated_at": forecast["generated_at"]
     }
 
 @router.get("/health-trends/{location}")
@@ -266,59 +317,50 @@ def analyze_location_health_trends(
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    if current_user.role not in ["admin", "gov_official"]:
+    if current_user.role not in [UserRole.admin, UserRole.gov_official]:
         raise HTTPException(status_code=403, detail="Not authorized to view health trends")
     
     from datetime import datetime, timedelta
+    from sqlalchemy import func
     
-    # Get patients from the specified location
-    patients_in_location = db.query(Patient).filter(
-        Patient.village.ilike(f"%{location}%")
-    ).all()
+    # Population is one COUNT; visit and symptom figures come from the
+    # per-village daily counters kept by the outbreak detector. Both match the
+    # village by its normalize_village form (the patient's stored village_key)
+    population = db.query(func.count(Patient.id)).filter(
+        Patient.village_key == normalize_village(location)
+    ).scalar()
     
-    if not patients_in_location:
+    if not population:
         return {"message": f"No patients found in {location}"}
     
-    patient_ids = [p.id for p in patients_in_location]
-    
     # Analyze recent health records (last 60 days)
-    sixty_days_ago = datetime.utcnow() - timedelta(days=60)
-    recent_records = db.query(Record).filter(
-        Record.patient_id.in_(patient_ids),
-        Record.created_at >= sixty_days_ago
-    ).all()
-    
-    # Analyze symptom patterns
-    all_symptoms = []
-    emergency_cases = 0
-    
-    for record in recent_records:
-        if record.symptoms:
-            all_symptoms.extend(record.symptoms.lower().split())
-        if record.is_emergency:
-            emergency_cases += 1
-    
-    from collections import Counter
-    symptom_counter = Counter(all_symptoms)
+    sixty_days_ago = datetime.utcnow().date() - timedelta(days=60)
+    counts = location_counts(db, location, sixty_days_ago)
+    recent_consultations = counts.pop(TOTAL_SERIES, 0)
+    emergency_cases = counts.pop(EMERGENCY_SERIES, 0)
+    
     common_symptoms = [
         {"symptom": symptom, "frequency": count}
-        for symptom, count in symptom_counter.most_common(10)
-        if len(symptom) > 3
+        for symptom, count in sorted(counts.items(), key=lambda item: (-item[1], item[0]))[:10]
     ]
+    anomalies = location_scores(db, location)
     
     # Check for potential outbreak indicators
     outbreak_risk = "low"
-    if len(recent_records) > len(patients_in_location) * 0.5:  # More than 50% of population visited
+    if recent_consultations > population * 0.5:  # More than 50% of population visited
         outbreak_risk = "medium"
-    if emergency_cases > len(recent_records) * 0.2:  # More than 20% emergency cases
+    if emergency_cases > recent_consultations * 0.2:  # More than 20% emergency cases
+        outbreak_risk = "high"
+    if any(anomaly["alert_id"] for anomaly in anomalies):  # Detector raised an outbreak alert
         outbreak_risk = "high"
     
     return {
         "location": location,
-        "population": len(patients_in_location),
-        "recent_consultations": len(recent_records),
+        "population": population,
+        "recent_consultations": recent_consultations,
         "emergency_cases": emergency_cases,
         "common_symptoms": common_symptoms,
+        "symptom_anomalies": anomalies,
         "outbreak_risk": outbreak_risk,
         "recommendations": [
             "Monitor symptom patterns closely" if outbreak_risk == "medium" else
@@ -1,22 +1,39 @@
 from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from typing import List, Optional
+import json
 import sys
 import os
 
 # Add the backend directory to the Python path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from ai_patient_database import ai_patient_db
+from ai_worker import ai_dispatcher
+from symptom_matcher import symptom_matcher
+from symptom_normalizer import normalize_symptom_list
 
 router = APIRouter(prefix="/ai-symptom", tags=["AI Health Assistant"])
 
+MAX_BATCH_SIZE = 200
+BATCH_STREAM_CHUNK = 10
+
 class SymptomAnalysisRequest(BaseModel):
     symptoms: List[str]
     symptom_description: Optional[str] = ""
     patient_age: Optional[int] = None
     patient_gender: Optional[str] = None
     severity: Optional[str] = "moderate"
+    village: Optional[str] = None  # searches the village's region first when regions are configured
+
+    def canonical(self) -> dict:
+        """Request as a scoring profile, with symptoms mapped to canonical ids"""
+        profile = self.dict()
+        profile["symptoms"] = normalize_symptom_list(self.symptoms)
+        return profile
+
+class BatchSymptomAnalysisRequest(BaseModel):
+    profiles: List[SymptomAnalysisRequest]
 
 class SymptomAnalysisResponse(BaseModel):
     risk_level: str
@@ -33,38 +50,83 @@ async def analyze_symptoms(request: SymptomAnalysisRequest):
     Analyze symptoms using AI patient database and provide health insights
     """
     try:
-        # Get AI recommendations from patient database
-        ai_result = ai_patient_db.get_ai_recommendations(
-            symptoms=request.symptoms,
-            symptom_description=request.symptom_description,
-            patient_age=request.patient_age,
-            patient_gender=request.patient_gender
-        )
-        
-        # Enhanced AI insights
-        ai_insights = {
-            "analysis_method": "Case-based reasoning with patient database",
-            "database_cases_analyzed": len(ai_patient_db.patient_cases),
-            "matching_algorithm": "Weighted symptom similarity with demographic factors",
-            "confidence_explanation": _get_confidence_explanation(ai_result["confidence"]),
-            "risk_factors": _analyze_risk_factors(request.symptoms, request.patient_age),
-            "follow_up_timeline": _get_follow_up_timeline(ai_result["risk_level"]),
-            "red_flags": _identify_red_flags(request.symptoms)
-        }
-        
-        return SymptomAnalysisResponse(
-            risk_level=ai_result["risk_level"],
-            possible_conditions=ai_result["possible_conditions"],
-            recommendations=ai_result["recommendations"],
-            similar_cases=ai_result["similar_cases"],
-            confidence=ai_result["confidence"],
-            emergency_required=ai_result["emergency_required"],
-            ai_insights=ai_insights
-        )
+        # Get AI recommendations from patient database (scored in the AI worker pool)
+        ai_result = await ai_dispatcher.recommend(request.canonical())
+        return _build_analysis_response(request, ai_result)
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"AI analysis failed: {str(e)}")
 
+@router.post("/analyze-symptoms/batch")
+async def analyze_symptoms_batch(request: BatchSymptomAnalysisRequest, stream: bool = False):
+    """
+    Analyze many patients' symptoms in one request (e.g. screening camps).
+    Results come back in input order; with stream=true they are sent as
+    NDJSON lines, one chunk of patients at a time.
+    """
+    if len(request.profiles) > MAX_BATCH_SIZE:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_SIZE} profiles per batch")
+    
+    async def analyze_chunk(profiles: List[SymptomAnalysisRequest]) -> List[SymptomAnalysisResponse]:
+        ai_results = await ai_dispatcher.recommend_batch([profile.canonical() for profile in profiles])
+        return [_build_analysis_response(profile, ai_result) for profile, ai_result in zip(profiles, ai_results)]
+    
+    if not stream:
+        try:
+            return {"results": await analyze_chunk(request.profiles)}
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"AI analysis failed: {str(e)}")
+    
+    async def stream_results():
+        for start in range(0, len(request.profiles), BATCH_STREAM_CHUNK):
+            chunk = request.profiles[start:start + BATCH_STREAM_CHUNK]
+            try:
+                responses = [response.dict() for response in await analyze_chunk(chunk)]
+            except Exception as e:
+                responses = [{"error": f"AI analysis failed: {str(e)}"}] * len(chunk)
+            for offset, response in enumerate(responses):
+                yield json.dumps({"index": start + offset, "result": response}) + "\n"
+    
+    return StreamingResponse(stream_results(), media_type="application/x-ndjson")
+
+def _build_analysis_response(request: SymptomAnalysisRequest, ai_result: dict) -> SymptomAnalysisResponse:
+    """Wrap AI recommendations with the enhanced insights"""
+    ai_insights = {
+        "analysis_method": "Case-based reasoning with patient database",
+        "database_cases_analyzed": ai_dispatcher.cases_analyzed(),
+        "matching_algorithm": "Weighted symptom similarity with demographic factors",
+        "confidence_explanation": _get_confidence_explanation(ai_result["confidence"]),
+        "risk_factors": _analyze_risk_factors(normalize_symptom_list(request.symptoms), request.patient_age),
+        "follow_up_timeline": _get_follow_up_timeline(ai_result["risk_level"]),
+        "red_flags": _identify_red_flags(normalize_symptom_list(request.symptoms))
+    }
+    if ai_result.get("degraded"):
+        ai_insights["analysis_method"] = "Rule-based red flag check (AI service busy, degraded mode)"
+        ai_insights["degraded"] = True
+    
+    return SymptomAnalysisResponse(
+        risk_level=ai_result["risk_level"],
+        possible_conditions=ai_result["possible_conditions"],
+        recommendations=ai_result["recommendations"],
+        similar_cases=ai_result["similar_cases"],
+        confidence=ai_result["confidence"],
+        emergency_required=ai_result.get("emergency_required", False),
+        ai_insights=ai_insights
+    )
+
+@router.get("/cache-stats")
+def get_cache_stats():
+    """Hit-rate metrics for memoized AI recommendations
+
+    Totals are summed over the scoring workers, each with its case base version
+    and (with regions) its shards; front_cache is the cache the dispatcher checks
+    in this process before sending a job to them.
+    """
+    stats = ai_dispatcher.worker_cache_stats()
+    stats["front_cache"] = ai_dispatcher.front_cache.stats()
+    stats["worker"] = ai_dispatcher.stats()
+    return stats
+
 def _get_confidence_explanation(confidence: float) -> str:
     """Explain the confidence score"""
     if confidence >= 0.8:
@@ -90,10 +152,8 @@ def _analyze_risk_factors(symptoms: List[str], age: Optional[int]) -> List[str]:
             risk_factors.append("Young age requires careful monitoring")
     
     # Symptom-based risk factors
-    high_risk_symptoms = ["chest_pain", "shortness_of_breath", "severe_headache", "neck_stiffness"]
-    for symptom in symptoms:
-        if symptom in high_risk_symptoms:
-            risk_factors.append(f"{symptom.replace('_', ' ').title()} is a concerning symptom")
+    for symptom in symptom_matcher.match_symptoms(symptoms).get("high_risk", []):
+        risk_factors.append(f"{symptom.replace('_', ' ').title()} is a concerning symptom")
     
     return risk_factors
 
@@ -113,6 +173,7 @@ def _identify_red_flags(symptoms: List[str]) -> List[str]:
     
     emergency_symptoms = {
         "chest_pain": "Chest pain may indicate heart attack",
+        "chest_tightness": "Chest tightness needs a heart and lung check",
         "shortness_of_breath": "Breathing difficulty requires urgent evaluation",
         "severe_headache": "Sudden severe headache may indicate serious condition",
         "neck_stiffness": "Neck stiffness with fever suggests meningitis",
@@ -120,8 +181,7 @@ def _identify_red_flags(symptoms: List[str]) -> List[str]:
         "high_fever": "Very high fever can lead to complications"
     }
     
-    for symptom in symptoms:
-        if symptom in emergency_symptoms:
-            red_flags.append(emergency_symptoms[symptom])
+    for symptom in symptom_matcher.match_symptoms(symptoms).get("red_flag", []):
+        red_flags.append(emergency_symptoms[symptom])
     
     return red_flags
@@ -1,8 +1,9 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
 from database import get_db
-from models import Medicine, User
+from models import Medicine, StockMovement, User, normalize_village, UserRole
+from medicine_demand import reorder_plan
 from schemas import MedicineResponse, MedicineCreate, MedicineUpdate
 from .auth import get_current_user
 
@@ -45,7 +46,7 @@ def create_medicine(
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    if current_user.role not in ["admin"]:
+    if current_user.role not in [UserRole.admin]:
         raise HTTPException(status_code=403, detail="Not authorized to create medicines")
     
     db_medicine = Medicine(**medicine.dict())
@@ -61,7 +62,7 @@ def update_medicine(
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    if current_user.role not in ["admin"]:
+    if current_user.role not in [UserRole.admin]:
         raise HTTPException(status_code=403, detail="Not authorized to update medicines")
     
     medicine = db.query(Medicine).filter(Medicine.id == medicine_id).first()
@@ -82,13 +83,14 @@ def delete_medicine(
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    if current_user.role not in ["admin"]:
+    if current_user.role not in [UserRole.admin]:
         raise HTTPException(status_code=403, detail="Not authorized to delete medicines")
     
     medicine = db.query(Medicine).filter(Medicine.id == medicine_id).first()
     if not medicine:
         raise HTTPException(status_code=404, detail="Medicine not found")
     
+    db.query(StockMovement).filter(StockMovement.medicine_id == medicine.id).delete()
     db.delete(medicine)
     db.commit()
     return {"message": "Medicine deleted successfully"}
@@ -97,10 +99,12 @@ def delete_medicine(
 def update_stock(
     medicine_id: int,
     quantity_change: int,
+    reason: Optional[str] = None,
+    village: Optional[str] = None,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    if current_user.role not in ["admin"]:
+    if current_user.role not in [UserRole.admin]:
         raise HTTPException(status_code=403, detail="Not authorized to update stock")
     
     medicine = db.query(Medicine).filter(Medicine.id == medicine_id).first()
@@ -112,6 +116,13 @@ def update_stock(
         raise HTTPException(status_code=400, detail="Stock cannot be negative")
     
     medicine.stock_quantity = new_quantity
+    # Every change is kept as a movement; the demand model learns consumption from them
+    db.add(StockMovement(
+        medicine_id=medicine.id,
+        quantity_change=quantity_change,
+        reason=reason or ("restock" if quantity_change > 0 else "dispensed"),
+        village=normalize_village(village) or None
+    ))
     db.commit()
     
     return {"message": f"Stock updated. New quantity: {new_quantity}"}
@@ -122,7 +133,7 @@ def toggle_outbreak_alert(
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    if current_user.role not in ["admin", "gov_official"]:
+    if current_user.role not in [UserRole.admin, UserRole.gov_official]:
         raise HTTPException(status_code=403, detail="Not authorized to manage outbreak alerts")
     
     medicine = db.query(Medicine).filter(Medicine.id == medicine_id).first()
@@ -139,7 +150,7 @@ def get_inventory_analytics(
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    if current_user.role not in ["admin", "gov_official"]:
+    if current_user.role not in [UserRole.admin, UserRole.gov_official]:
         raise HTTPException(status_code=403, detail="Not authorized to view analytics")
     
     from sqlalchemy import func
@@ -192,3 +203,20 @@ def get_inventory_analytics(
             } for med in critical_medicines
         ]
     }
+
+@router.get("/analytics/reorder-plan")
+def get_reorder_plan(
+    horizon_days: int = 30,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Reorder quantities covering expected consumption and active outbreaks over the horizon"""
+    if current_user.role not in [UserRole.admin, UserRole.gov_official]:
+        raise HTTPException(status_code=403, detail="Not authorized to view analytics")
+    
+    plan = reorder_plan(db, horizon_days)
+    return {
+        "horizon_days": horizon_days,
+        "reorders": [entry for entry in plan if entry["reorder_quantity"] > 0],
+        "adequate": [entry["name"] for entry in plan if entry["reorder_quantity"] == 0]
+    }
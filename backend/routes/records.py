@@ -1,78 +1,143 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query, Response, status
 from sqlalchemy.orm import Session
 from typing import List, Optional
 from datetime import datetime, timedelta
 from database import get_db
-from models import Record, User, Patient, Doctor
-from schemas import RecordResponse, RecordCreate
+from models import Record, User, Patient, Doctor, UserRole
+from schemas import RecordResponse, RecordCreate, RecordListItem, RecordSearchResult
+from case_ingestion import ingest_record
+from outbreak_detector import observe_record
+from record_analytics import records_created
+from symptom_analytics import record_symptom_counts
+from record_search import search_records
+from record_pagination import RECORD_MAX_PAGE_SIZE, RECORD_PAGE_SIZE, cached_count, parse_fields, record_page
 from .auth import get_current_user
 
 router = APIRouter(prefix="/records", tags=["records"])
 
-@router.get("/", response_model=List[RecordResponse])
+class RecordPageParams:
+    """Query parameters shared by the paginated record listings"""
+
+    def __init__(
+        self,
+        limit: int = Query(RECORD_PAGE_SIZE, ge=1, le=RECORD_MAX_PAGE_SIZE),
+        cursor: Optional[str] = Query(None, description="X-Next-Cursor header of the previous page"),
+        fields: Optional[str] = Query(None, description="Comma-separated fields to return, e.g. id,symptoms,diagnosis"),
+        include_total: bool = Query(False, description="Also send the total count in X-Total-Count")
+    ):
+        self.limit = limit
+        self.cursor = cursor
+        self.fields = parse_fields(fields)
+        self.include_total = include_total
+
+def list_records(query, page: RecordPageParams, response: Response, count_key: tuple):
+    """One page of `query`, newest first; the next cursor and total go in response headers"""
+    records, next_cursor = record_page(query, page.fields, limit=page.limit, cursor=page.cursor)
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    if page.include_total:
+        response.headers["X-Total-Count"] = str(cached_count(count_key, query))
+    return records
+
+@router.get("/", response_model=List[RecordListItem], response_model_exclude_unset=True)
 def get_all_records(
+    response: Response,
+    page: RecordPageParams = Depends(),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    if current_user.role not in ["admin", "gov_official"]:
+    if current_user.role not in [UserRole.admin, UserRole.gov_official]:
         raise HTTPException(status_code=403, detail="Not authorized to view all records")
     
-    records = db.query(Record).all()
-    return records
+    return list_records(db.query(Record), page, response, ("all",))
 
-@router.get("/patient/{patient_id}", response_model=List[RecordResponse])
+@router.get("/patient/{patient_id}", response_model=List[RecordListItem], response_model_exclude_unset=True)
 def get_patient_records(
     patient_id: int,
+    response: Response,
+    page: RecordPageParams = Depends(),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
     # Check if current user can access this patient's records
-    if current_user.role == "patient":
+    if current_user.role == UserRole.patient:
         patient = db.query(Patient).filter(Patient.user_id == current_user.id).first()
         if not patient or patient.id != patient_id:
             raise HTTPException(status_code=403, detail="Not authorized to view these records")
-    elif current_user.role not in ["admin", "doctor", "gov_official"]:
+    elif current_user.role not in [UserRole.admin, UserRole.doctor, UserRole.gov_official]:
         raise HTTPException(status_code=403, detail="Not authorized")
     
-    records = db.query(Record).filter(Record.patient_id == patient_id).order_by(Record.created_at.desc()).all()
-    return records
+    query = db.query(Record).filter(Record.patient_id == patient_id)
+    return list_records(query, page, response, ("patient", patient_id))
 
-@router.get("/doctor/{doctor_id}", response_model=List[RecordResponse])
+@router.get("/doctor/{doctor_id}", response_model=List[RecordListItem], response_model_exclude_unset=True)
 def get_doctor_records(
     doctor_id: int,
+    response: Response,
+    page: RecordPageParams = Depends(),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
     # Check if current user can access this doctor's records
-    if current_user.role == "doctor":
+    if current_user.role == UserRole.doctor:
         doctor = db.query(Doctor).filter(Doctor.user_id == current_user.id).first()
         if not doctor or doctor.id != doctor_id:
             raise HTTPException(status_code=403, detail="Not authorized to view these records")
-    elif current_user.role not in ["admin", "gov_official"]:
+    elif current_user.role not in [UserRole.admin, UserRole.gov_official]:
         raise HTTPException(status_code=403, detail="Not authorized")
     
-    records = db.query(Record).filter(Record.doctor_id == doctor_id).order_by(Record.created_at.desc()).all()
-    return records
+    query = db.query(Record).filter(Record.doctor_id == doctor_id)
+    return list_records(query, page, response, ("doctor", doctor_id))
 
-@router.get("/my-records", response_model=List[RecordResponse])
+@router.get("/my-records", response_model=List[RecordListItem], response_model_exclude_unset=True)
 def get_my_records(
+    response: Response,
+    page: RecordPageParams = Depends(),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    if current_user.role == "patient":
+    if current_user.role == UserRole.patient:
         patient = db.query(Patient).filter(Patient.user_id == current_user.id).first()
         if not patient:
             raise HTTPException(status_code=404, detail="Patient profile not found")
-        records = db.query(Record).filter(Record.patient_id == patient.id).order_by(Record.created_at.desc()).all()
-    elif current_user.role == "doctor":
+        query = db.query(Record).filter(Record.patient_id == patient.id)
+        count_key = ("patient", patient.id)
+    elif current_user.role == UserRole.doctor:
         doctor = db.query(Doctor).filter(Doctor.user_id == current_user.id).first()
         if not doctor:
             raise HTTPException(status_code=404, detail="Doctor profile not found")
-        records = db.query(Record).filter(Record.doctor_id == doctor.id).order_by(Record.created_at.desc()).all()
+        query = db.query(Record).filter(Record.doctor_id == doctor.id)
+        count_key = ("doctor", doctor.id)
     else:
         raise HTTPException(status_code=403, detail="Only patients and doctors can access this endpoint")
     
-    return records
+    return list_records(query, page, response, count_key)
+
+@router.get("/search", response_model=List[RecordSearchResult])
+def search_health_records(
+    q: str = Query(..., min_length=2, description="Words to find in symptoms, diagnosis, prescriptions or notes"),
+    village: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Ranked full-text search; patients only search their own records"""
+    patient_id = None
+    if current_user.role == UserRole.patient:
+        patient = db.query(Patient).filter(Patient.user_id == current_user.id).first()
+        if not patient:
+            raise HTTPException(status_code=404, detail="Patient profile not found")
+        patient_id = patient.id
+    elif current_user.role not in [UserRole.admin, UserRole.doctor, UserRole.gov_official]:
+        raise HTTPException(status_code=403, detail="Not authorized to search records")
+    
+    hits = search_records(db, q, village=village, patient_id=patient_id, limit=limit, offset=offset)
+    records = {record.id: record for record in db.query(Record).filter(Record.id.in_([hit[0] for hit in hits])).all()}
+    return [
+        RecordSearchResult(**RecordResponse.model_validate(records[record_id]).model_dump(), rank=rank, snippet=snippet)
+        for record_id, rank, snippet in hits if record_id in records
+    ]
 
 @router.get("/{record_id}", response_model=RecordResponse)
 def get_record(
@@ -85,15 +150,15 @@ def get_record(
         raise HTTPException(status_code=404, detail="Record not found")
     
     # Check authorization
-    if current_user.role == "patient":
+    if current_user.role == UserRole.patient:
         patient = db.query(Patient).filter(Patient.user_id == current_user.id).first()
         if not patient or record.patient_id != patient.id:
             raise HTTPException(status_code=403, detail="Not authorized to view this record")
-    elif current_user.role == "doctor":
+    elif current_user.role == UserRole.doctor:
         doctor = db.query(Doctor).filter(Doctor.user_id == current_user.id).first()
         if not doctor or record.doctor_id != doctor.id:
             raise HTTPException(status_code=403, detail="Not authorized to view this record")
-    elif current_user.role not in ["admin", "gov_official"]:
+    elif current_user.role not in [UserRole.admin, UserRole.gov_official]:
         raise HTTPException(status_code=403, detail="Not authorized")
     
     return record
@@ -101,14 +166,15 @@ def get_record(
 @router.post("/", response_model=RecordResponse)
 def create_record(
     record: RecordCreate,
+    background_tasks: BackgroundTasks,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    if current_user.role not in ["doctor", "admin"]:
+    if current_user.role not in [UserRole.doctor, UserRole.admin]:
         raise HTTPException(status_code=403, detail="Only doctors can create records")
     
     # If current user is a doctor, ensure they can only create records for themselves
-    if current_user.role == "doctor":
+    if current_user.role == UserRole.doctor:
         doctor = db.query(Doctor).filter(Doctor.user_id == current_user.id).first()
         if not doctor or record.doctor_id != doctor.id:
             raise HTTPException(status_code=403, detail="Doctors can only create records for themselves")
@@ -124,33 +190,43 @@ def create_record(
     
     db_record = Record(**record.dict())
     db.add(db_record)
+    records_created(db, [db_record])
     db.commit()
     db.refresh(db_record)
+    
+    # Feed the finalized record to the AI case base and the outbreak detector after the response is sent
+    background_tasks.add_task(ingest_record, db_record.id)
+    background_tasks.add_task(observe_record, db_record.id)
     return db_record
 
-@router.get("/emergency/recent")
+@router.get("/emergency/recent", response_model=List[RecordListItem], response_model_exclude_unset=True)
 def get_recent_emergency_records(
+    response: Response,
     days: int = 7,
+    page: RecordPageParams = Depends(),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    if current_user.role not in ["admin", "doctor", "gov_official"]:
+    if current_user.role not in [UserRole.admin, UserRole.doctor, UserRole.gov_official]:
         raise HTTPException(status_code=403, detail="Not authorized to view emergency records")
     
     since_date = datetime.utcnow() - timedelta(days=days)
-    records = db.query(Record).filter(
+    query = db.query(Record).filter(
         Record.is_emergency == True,
         Record.created_at >= since_date
-    ).order_by(Record.created_at.desc()).all()
-    
-    return records
+    )
+    # The window moves with the clock, so the cached total is keyed by the hour it started in
+    return list_records(query, page, response, ("emergency", days, since_date.strftime("%Y-%m-%dT%H")))
 
 @router.get("/analytics/trends")
 def get_health_trends(
+    days: Optional[int] = None,
+    village: Optional[str] = None,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    if current_user.role not in ["admin", "gov_official"]:
+    """Consultation trends; symptom counts can be narrowed to recent days and a village"""
+    if current_user.role not in [UserRole.admin, UserRole.gov_official]:
         raise HTTPException(status_code=403, detail="Not authorized to view analytics")
     
     from sqlalchemy import func, extract
@@ -162,16 +238,9 @@ def get_health_trends(
         func.count(Record.id).label('consultation_count')
     ).group_by('year', 'month').order_by('year', 'month').all()
     
-    # Common symptoms analysis
-    # This is a simplified version - in production, you'd want better text analysis
-    symptom_keywords = ['fever', 'cough', 'headache', 'pain', 'nausea', 'fatigue', 'breathing']
-    symptom_counts = {}
-    
-    for keyword in symptom_keywords:
-        count = db.query(func.count(Record.id)).filter(
-            Record.symptoms.ilike(f'%{keyword}%')
-        ).scalar()
-        symptom_counts[keyword] = count
+    # Common symptoms: one GROUP BY over the per-record symptom tokens
+    since = datetime.utcnow() - timedelta(days=days) if days else None
+    symptom_counts = dict(record_symptom_counts(db, since=since, village=village, limit=10))
     
     # Emergency vs regular consultations
     emergency_count = db.query(func.count(Record.id)).filter(Record.is_emergency == True).scalar()
@@ -199,7 +268,7 @@ def get_offline_sync_data(
     current_user: User = Depends(get_current_user)
 ):
     """Get records for offline synchronization"""
-    if current_user.role != "patient":
+    if current_user.role != UserRole.patient:
         raise HTTPException(status_code=403, detail="Only patients can sync offline data")
     
     patient = db.query(Patient).filter(Patient.user_id == current_user.id).first()
@@ -0,0 +1,38 @@
+from fastapi import APIRouter, BackgroundTasks, Depends
+from sqlalchemy.orm import Session
+from datetime import datetime
+from database import get_db
+from models import User
+from schemas import SyncBatchRequest, SyncBatchResponse
+from offline_sync import apply_sync_batch
+from case_ingestion import ingest_record
+from outbreak_detector import observe_record
+from .auth import get_current_user
+
+router = APIRouter(prefix="/sync", tags=["sync"])
+
+@router.post("/batch", response_model=SyncBatchResponse)
+def sync_batch(
+    batch: SyncBatchRequest,
+    background_tasks: BackgroundTasks,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Apply the offline syncQueue in one request; safe to retry with the same client ids"""
+    results, record_ids = apply_sync_batch(db, current_user, batch.items)
+    
+    # Same post-commit pipeline as POST /records/
+    for record_id in record_ids:
+        background_tasks.add_task(ingest_record, record_id)
+        background_tasks.add_task(observe_record, record_id)
+    
+    counts = {status: sum(1 for result in results if result.status == status)
+              for status in ("applied", "duplicate", "conflict", "rejected")}
+    return SyncBatchResponse(
+        results=results,
+        applied=counts["applied"],
+        duplicates=counts["duplicate"],
+        conflicts=counts["conflict"],
+        rejected=counts["rejected"],
+        sync_timestamp=datetime.utcnow()
+    )
@@ -1,6 +1,6 @@
-from pydantic import BaseModel, EmailStr
-from typing import Optional, List, Dict
-from datetime import datetime
+from pydantic import BaseModel, EmailStr, Field
+from typing import Optional, List, Dict, Any, Literal
+from datetime import date, datetime
 from enum import Enum
 
 class UserRole(str, Enum):
@@ -120,6 +120,22 @@ class RecordResponse(RecordBase):
     class Config:
         from_attributes = True
 
+class RecordListItem(BaseModel):  # fields left out by ?fields= are omitted from the response
+    id: int
+    created_at: Optional[datetime] = None
+    patient_id: Optional[int] = None
+    doctor_id: Optional[int] = None
+    symptoms: Optional[str] = None
+    diagnosis: Optional[str] = None
+    prescriptions: Optional[str] = None
+    notes: Optional[str] = None
+    follow_up_date: Optional[datetime] = None
+    is_emergency: Optional[bool] = None
+
+class RecordSearchResult(RecordResponse):
+    rank: float
+    snippet: str = ""
+
 # Medicine Schemas
 class MedicineBase(BaseModel):
     name: str
@@ -208,9 +224,17 @@ class OutbreakAlertBase(BaseModel):
 class OutbreakAlertCreate(OutbreakAlertBase):
     pass
 
+class OutbreakPlanRequest(BaseModel):
+    outbreaks: List[OutbreakAlertCreate]
+    create_alerts: bool = True
+    dry_run: bool = False  # plan only: no alerts, no medicine flags
+
 class OutbreakAlertResponse(OutbreakAlertBase):
     id: int
     status: str
+    villages: Optional[str] = None  # JSON list; clustered alerts only
+    first_day: Optional[date] = None
+    last_day: Optional[date] = None
     created_at: datetime
     updated_at: datetime
     
@@ -268,3 +292,29 @@ class AISymptomData(BaseModel):
     symptom_description: Optional[str] = None
     patient_age: Optional[int] = None
     patient_gender: Optional[str] = None
+
+# Offline Sync Schemas
+class SyncItem(BaseModel):
+    client_id: str = Field(..., min_length=1, max_length=64)  # unique per user, reused on retry
+    type: Literal["healthRecord", "consultation"]
+    data: Dict[str, Any]  # body the item's own POST endpoint would take
+    timestamp: Optional[datetime] = None  # when it was queued offline
+
+class SyncBatchRequest(BaseModel):
+    items: List[SyncItem] = Field(..., max_length=2000)
+
+class SyncItemResult(BaseModel):
+    client_id: str
+    type: str
+    status: str  # applied, duplicate, conflict or rejected
+    entity_id: Optional[int] = None
+    detail: Optional[str] = None
+    replayed: bool = False  # outcome stored by an earlier upload of the same item
+
+class SyncBatchResponse(BaseModel):
+    results: List[SyncItemResult]
+    applied: int
+    duplicates: int
+    conflicts: int
+    rejected: int
+    sync_timestamp: datetime
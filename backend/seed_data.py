@@ -2,6 +2,9 @@ import asyncio
 from sqlalchemy.orm import Session
 from database import SessionLocal, create_tables
 from models import User, Doctor, Patient, Medicine, Record, Queue, EmergencyAlert, OutbreakAlert, UserRole, QueueStatus
+from models import SymptomDailyCount, OutbreakDetectorState, RecordSymptom, PatientInsightProfile, StockMovement, SyncMutation
+from outbreak_detector import rebuild as rebuild_outbreak_counters
+from record_analytics import records_created
 from utils import get_password_hash
 from datetime import datetime, timedelta
 import random
@@ -16,10 +19,16 @@ def seed_database():
     
     try:
         # Clear existing data (optional - remove in production)
+        db.query(SyncMutation).delete()
+        db.query(OutbreakDetectorState).delete()
+        db.query(SymptomDailyCount).delete()
         db.query(OutbreakAlert).delete()
         db.query(EmergencyAlert).delete()
         db.query(Queue).delete()
+        db.query(RecordSymptom).delete()
         db.query(Record).delete()
+        db.query(PatientInsightProfile).delete()
+        db.query(StockMovement).delete()
         db.query(Medicine).delete()
         db.query(Patient).delete()
         db.query(Doctor).delete()
@@ -329,8 +338,10 @@ def seed_database():
             db.add(record)
             records.append(record)
         
+        records_created(db, records)
         db.commit()
         print(f"Created {len(records)} medical records")
+        print(f"Replayed {rebuild_outbreak_counters()} records into the outbreak counters")
         
         # Create some queue entries
         queue_symptoms = [
@@ -0,0 +1,30 @@
+"""
+Symptom counts over the record_symptoms token table
+Each query is a GROUP BY on indexed columns instead of a scan of record text.
+"""
+
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from models import RecordSymptom, normalize_village
+
+
+def record_symptom_counts(db: Session, since: Optional[datetime] = None, village: Optional[str] = None,
+                          patient_id: Optional[int] = None, limit: Optional[int] = None) -> List[Tuple[str, int]]:
+    """(canonical symptom, records) pairs, most frequent first; village is matched by its normalized name"""
+    query = db.query(RecordSymptom.symptom_token, func.count(RecordSymptom.id).label("records"))
+    if since is not None:
+        query = query.filter(RecordSymptom.created_at >= since)
+    if village:
+        # Stored normalized, so equality uses the (village, symptom_token, created_at) index
+        query = query.filter(RecordSymptom.village == normalize_village(village))
+    if patient_id is not None:
+        query = query.filter(RecordSymptom.patient_id == patient_id)
+    query = query.group_by(RecordSymptom.symptom_token).order_by(func.count(RecordSymptom.id).desc(),
+                                                                  RecordSymptom.symptom_token)
+    if limit:
+        query = query.limit(limit)
+    return [(token, int(count)) for token, count in query.all()]
@@ -0,0 +1,110 @@
+"""
+Compiled multi-pattern symptom matcher (Aho-Corasick)
+Finds every emergency, high-priority, specialist, risk-factor and red-flag
+symptom, including its aliases and underscore/space forms, in one pass over
+the text. Categories and aliases come from symptom_vocabulary.
+"""
+
+import re
+import unicodedata
+from collections import deque
+from typing import Dict, Iterable, List, Tuple
+
+from symptom_vocabulary import SYMPTOM_ALIASES, SYMPTOM_CATEGORIES
+
+# category -> canonical id -> aliases, from the shared vocabulary (the id always matches itself)
+SYMPTOM_VOCABULARIES: Dict[str, Dict[str, List[str]]] = {
+    category: {symptom_id: SYMPTOM_ALIASES[symptom_id] for symptom_id in symptom_ids}
+    for category, symptom_ids in SYMPTOM_CATEGORIES.items()
+}
+
+
+def normalize_text(text: str) -> str:
+    """Lowercase, underscores to spaces, collapsed whitespace"""
+    return re.sub(r"\s+", " ", (text or "").lower().replace("_", " ")).strip()
+
+
+def _is_word_char(char: str) -> bool:
+    # Combining marks (Devanagari/Gurmukhi vowel signs) are part of a word
+    return char.isalnum() or unicodedata.category(char).startswith("M")
+
+
+class SymptomMatcher:
+    """Aho-Corasick automaton over every vocabulary term"""
+
+    def __init__(self, vocabularies: Dict[str, Dict[str, Iterable[str]]]):
+        self.goto: List[Dict[str, int]] = [{}]
+        self.fail: List[int] = [0]
+        self.outputs: List[List[Tuple[str, str, int]]] = [[]]  # (category, canonical, pattern length)
+
+        for category, terms in vocabularies.items():
+            for canonical, synonyms in terms.items():
+                for pattern in {normalize_text(canonical), *map(normalize_text, synonyms)}:
+                    self._add_pattern(pattern, (category, canonical, len(pattern)))
+        self._build_failure_links()
+
+    def _add_pattern(self, pattern: str, output: Tuple[str, str, int]):
+        state = 0
+        for char in pattern:
+            next_state = self.goto[state].get(char)
+            if next_state is None:
+                next_state = len(self.goto)
+                self.goto[state][char] = next_state
+                self.goto.append({})
+                self.fail.append(0)
+                self.outputs.append([])
+            state = next_state
+        if output not in self.outputs[state]:
+            self.outputs[state].append(output)
+
+    def _build_failure_links(self):
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self.goto[state].items():
+                queue.append(next_state)
+                fallback = self.fail[state]
+                while fallback and char not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                self.fail[next_state] = self.goto[fallback].get(char, 0)
+                self.outputs[next_state] = self.outputs[next_state] + [
+                    output for output in self.outputs[self.fail[next_state]] if output not in self.outputs[next_state]
+                ]
+
+    def find(self, text: str, whole_words: bool = False) -> List[Tuple[str, str, int, int]]:
+        """
+        (category, canonical term, start, end) of every match in the normalized
+        text. Terms must start at a word boundary; suffixes ("fevers") still
+        match unless whole_words is set.
+        """
+        text = normalize_text(text)
+        matches = []
+        state = 0
+        for position, char in enumerate(text):
+            while state and char not in self.goto[state]:
+                state = self.fail[state]
+            state = self.goto[state].get(char, 0)
+            for category, canonical, length in self.outputs[state]:
+                start, end = position - length + 1, position + 1
+                if start and _is_word_char(text[start - 1]):
+                    continue
+                if whole_words and end < len(text) and _is_word_char(text[end]):
+                    continue
+                matches.append((category, canonical, start, end))
+        return matches
+
+    def match(self, text: str) -> Dict[str, List[str]]:
+        """Canonical terms found per category, in order of first appearance"""
+        found: Dict[str, List[str]] = {}
+        for category, canonical, _, _ in sorted(self.find(text), key=lambda match: match[2]):
+            terms = found.setdefault(category, [])
+            if canonical not in terms:
+                terms.append(canonical)
+        return found
+
+    def match_symptoms(self, symptoms: List[str]) -> Dict[str, List[str]]:
+        """match() over a symptom list; terms never span two symptoms"""
+        return self.match(" | ".join(symptoms))
+
+
+symptom_matcher = SymptomMatcher(SYMPTOM_VOCABULARIES)
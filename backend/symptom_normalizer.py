@@ -0,0 +1,70 @@
+"""
+Symptom normalization service
+Maps free text, underscore tokens and Hindi/Punjabi aliases (Devanagari,
+Gurmukhi and romanized) to canonical symptom ids such as "chest_pain".
+Aliases are compiled once into a trie (the Aho-Corasick automaton of
+symptom_matcher), so normalizing is one pass over the text.
+"""
+
+import json
+import re
+from typing import List, Optional
+
+from symptom_matcher import SymptomMatcher, normalize_text
+from symptom_vocabulary import SYMPTOM_ALIASES
+
+_alias_trie = SymptomMatcher({"symptom": SYMPTOM_ALIASES})
+
+# Separators between symptoms in free text (English, Hindi, Punjabi "and")
+_SEPARATORS = re.compile(r"[,;|\n]|\band\b|\baur\b|\bwith\b|और|तथा|ਅਤੇ")
+
+
+def _known_symptoms(text: str) -> List[str]:
+    """Canonical ids in text, leftmost-longest so "severe headache" is not also "headache" """
+    matches = sorted(_alias_trie.find(text, whole_words=True), key=lambda match: (match[2], -match[3]))
+    symptoms = []
+    covered_until = 0
+    for _, symptom_id, start, end in matches:
+        if start >= covered_until:
+            covered_until = end
+            if symptom_id not in symptoms:
+                symptoms.append(symptom_id)
+    return symptoms
+
+
+def normalize_symptoms(text: str, keep_unknown: bool = True) -> List[str]:
+    """
+    Canonical symptom ids in free text, in order of appearance. With
+    keep_unknown, comma/"and"-separated phrases with no known symptom become
+    their own underscore ids (latin letters only).
+    """
+    normalized = normalize_text(text)
+    symptoms = _known_symptoms(normalized)
+    if keep_unknown:
+        for part in _SEPARATORS.split(normalized):
+            if _known_symptoms(part):
+                continue
+            token = "_".join(re.findall(r"[a-z]+", part))
+            if token and token not in symptoms:
+                symptoms.append(token)
+    return symptoms
+
+
+def normalize_symptom_list(symptoms: List[str]) -> List[str]:
+    """Canonical ids for a list of symptoms (tokens or phrases), deduplicated in order"""
+    normalized = []
+    for symptom in symptoms:
+        for symptom_id in normalize_symptoms(symptom):
+            if symptom_id not in normalized:
+                normalized.append(symptom_id)
+    return normalized
+
+
+def encode_symptom_ids(symptom_ids: List[str]) -> str:
+    """Column value for a model's symptom_ids field"""
+    return json.dumps(symptom_ids)
+
+
+def decode_symptom_ids(value: Optional[str]) -> List[str]:
+    """Symptom ids stored by encode_symptom_ids ([] for rows not yet normalized)"""
+    return json.loads(value) if value else []
@@ -0,0 +1,91 @@
+"""
+Symptom vocabulary shared by the symptom matcher and the normalizer
+Every symptom has one canonical id and one alias list. The triage categories
+of symptom_matcher name ids from this table instead of keeping synonym lists
+of their own, so a phrase means the same symptom everywhere.
+"""
+
+from typing import Dict, List
+
+# Canonical id -> aliases; the id itself ("chest_pain" / "chest pain") always matches
+SYMPTOM_ALIASES: Dict[str, List[str]] = {
+    "fever": ["feverish", "pyrexia", "febrile", "bukhar", "bukhaar", "बुखार", "ज्वर", "ਬੁਖਾਰ", "ਬੁਖ਼ਾਰ"],
+    "high_fever": ["very high fever", "high temperature", "tez bukhar", "तेज बुखार", "ਤੇਜ਼ ਬੁਖਾਰ", "ਤੇਜ ਬੁਖਾਰ"],
+    "chills": ["shivering", "thand lagna", "ठंड लगना", "ਕਾਂਬਾ"],
+    "cough": ["coughing", "khansi", "khaansi", "खांसी", "खाँसी", "ਖੰਘ", "khangh"],
+    "headache": ["headaches", "head ache", "head pain", "migraine", "sir dard", "sar dard", "sirdard",
+                 "सिर दर्द", "सिरदर्द", "ਸਿਰ ਦਰਦ", "ਸਿਰਦਰਦ"],
+    "severe_headache": ["worst headache", "tez sir dard", "तेज सिर दर्द", "ਤੇਜ਼ ਸਿਰ ਦਰਦ"],
+    "chest_pain": ["heart pain", "chhati mein dard", "seene mein dard", "seene me dard", "छाती में दर्द",
+                   "सीने में दर्द", "ਛਾਤੀ ਵਿੱਚ ਦਰਦ", "ਛਾਤੀ ਦਰਦ", "chhati dard"],
+    "chest_tightness": ["tight chest", "chest feels tight"],
+    "shortness_of_breath": ["difficulty breathing", "breathlessness", "trouble breathing",
+                            "cannot breathe", "can't breathe",
+                            "saans phoolna", "saans lene mein taklif", "सांस फूलना",
+                            "सांस लेने में तकलीफ", "ਸਾਹ ਚੜ੍ਹਨਾ", "ਸਾਹ ਲੈਣ ਵਿੱਚ ਤਕਲੀਫ਼", "sah charhna"],
+    "wheezing": ["wheeze"],
+    "sore_throat": ["throat pain", "gale mein dard", "gala kharab", "गले में दर्द", "गला खराब",
+                    "ਗਲੇ ਵਿੱਚ ਦਰਦ", "ਗਲਾ ਖਰਾਬ"],
+    "stomach_pain": ["abdominal pain", "stomach ache", "stomachache", "belly pain", "pet dard",
+                     "pet mein dard", "पेट दर्द", "पेट में दर्द", "ਪੇਟ ਦਰਦ", "ਢਿੱਡ ਦਰਦ", "ਢਿੱਡ ਪੀੜ"],
+    "nausea": ["nauseous", "ji machlana", "jee machlana", "जी मचलाना", "मतली", "ਜੀ ਕੱਚਾ ਹੋਣਾ", "ਮਤਲੀ"],
+    "vomiting": ["vomit", "throwing up", "emesis", "ulti", "ultee", "उल्टी", "ਉਲਟੀ", "ਉਲਟੀਆਂ"],
+    "diarrhea": ["diarrhoea", "loose motion", "loose motions", "dast", "दस्त", "ਦਸਤ", "ਟੱਟੀਆਂ"],
+    "rash": ["rashes", "daane", "दाने", "ਧੱਫੜ", "ਦਾਣੇ"],
+    "skin_rash": ["skin rashes"],
+    "itching": ["itchy", "khujli", "खुजली", "ਖੁਜਲੀ", "ਖਾਰਸ਼"],
+    "swelling": ["sujan", "soojan", "सूजन", "ਸੋਜ", "ਸੋਜਸ਼"],
+    "joint_pain": ["joint pains", "jodon mein dard", "jodo ka dard", "जोड़ों में दर्द",
+                   "जोड़ों का दर्द", "ਜੋੜਾਂ ਦਾ ਦਰਦ", "ਜੋੜਾਂ ਵਿੱਚ ਦਰਦ"],
+    "body_ache": ["body pain", "badan dard", "बदन दर्द", "शरीर में दर्द", "ਸਰੀਰ ਦਰਦ", "ਸਰੀਰ ਵਿੱਚ ਦਰਦ"],
+    "neck_pain": ["gardan dard", "गर्दन दर्द", "गर्दन में दर्द", "ਗਰਦਨ ਦਰਦ"],
+    "neck_stiffness": ["stiff neck", "gardan akadna", "गर्दन अकड़ना", "ਗਰਦਨ ਅਕੜਨਾ"],
+    "fatigue": ["tiredness", "weakness", "thakan", "kamzori", "थकान", "कमजोरी", "कमज़ोरी",
+                "ਥਕਾਵਟ", "ਕਮਜ਼ੋਰੀ"],
+    "dizziness": ["dizzy", "chakkar", "चक्कर", "ਚੱਕਰ"],
+    "weight_loss": ["losing weight", "vajan kam", "वजन कम होना", "ਭਾਰ ਘਟਣਾ"],
+    "sweating": ["paseena", "पसीना", "ਪਸੀਨਾ"],
+    "night_sweats": ["raat ko paseena", "रात को पसीना", "ਰਾਤ ਨੂੰ ਪਸੀਨਾ"],
+    "frequent_urination": ["baar baar peshab", "बार बार पेशाब", "बार-बार पेशाब", "ਵਾਰ ਵਾਰ ਪਿਸ਼ਾਬ"],
+    "excessive_thirst": ["zyada pyaas", "ज्यादा प्यास", "बहुत प्यास", "ਬਹੁਤ ਪਿਆਸ"],
+    "blurred_vision": ["blurry vision", "dhundhla dikhna", "धुंधला दिखना", "ਧੁੰਦਲਾ ਦਿਖਣਾ"],
+    "sensitivity_to_light": ["photophobia"],
+    "memory_loss": ["forgetfulness", "भूलने की बीमारी", "ਯਾਦਦਾਸ਼ਤ ਘਟਣਾ"],
+    "confusion": ["confused", "disoriented", "altered mental status", "उलझन"],
+    "difficulty_speaking": ["slurred speech", "trouble speaking"],
+    "anxiety": ["ghabrahat", "घबराहट", "चिंता", "ਘਬਰਾਹਟ", "ਚਿੰਤਾ"],
+    "palpitations": ["dil ki dhadkan tez", "धड़कन तेज", "दिल की धड़कन तेज", "ਦਿਲ ਦੀ ਧੜਕਣ ਤੇਜ਼"],
+    "trembling": ["shaking", "kaanpna", "कांपना", "ਕੰਬਣਾ"],
+    "mood_swings": [],
+    "mood_changes": [],
+    "hot_flashes": [],
+    "irregular_periods": [],
+    "missed_periods": [],
+    "breast_tenderness": [],
+    "morning_stiffness": [],
+    "redness": [],
+    "scaling": [],
+    "high_blood_pressure": ["hypertension", "bp high", "उच्च रक्तचाप", "ਹਾਈ ਬੀਪੀ"],
+    # "fitting" and "fits" alone also mean clothes and shoes; only phrases that name an episode count
+    "seizure": ["seizures", "convulsion", "convulsions", "having fits", "having a fit", "had a fit",
+                "fitting episode", "daura", "दौरा", "ਦੌਰਾ"],
+    # Slurred speech alone is difficulty_speaking; it points to a stroke only with sudden onset
+    "stroke": ["facial droop", "face drooping", "sudden slurred speech", "lakwa", "लकवा", "ਅਧਰੰਗ"],
+    "heart_attack": ["cardiac arrest", "myocardial infarction", "dil ka daura", "दिल का दौरा", "ਦਿਲ ਦਾ ਦੌਰਾ"],
+    "unconscious": ["unresponsive", "passed out", "loss of consciousness", "behosh", "बेहोश", "ਬੇਹੋਸ਼"],
+    "bleeding": ["khoon behna", "खून बहना", "ਖੂਨ ਵਗਣਾ"],
+    "severe_bleeding": ["heavy bleeding", "hemorrhage", "haemorrhage"],
+    "severe_pain": ["intense pain", "excruciating pain"],
+    "infection": ["infections", "infected", "sankraman", "संक्रमण", "ਲਾਗ"],
+}
+
+# Triage category -> canonical ids it covers
+SYMPTOM_CATEGORIES: Dict[str, List[str]] = {
+    "emergency": ["chest_pain", "shortness_of_breath", "severe_bleeding", "unconscious", "heart_attack",
+                  "stroke", "seizure"],
+    "high_priority": ["fever", "high_fever", "vomiting", "severe_pain", "infection"],
+    "specialist": ["fever", "chest_pain", "chest_tightness", "headache", "cough", "stomach_pain"],
+    "high_risk": ["chest_pain", "chest_tightness", "shortness_of_breath", "severe_headache", "neck_stiffness"],
+    "red_flag": ["chest_pain", "chest_tightness", "shortness_of_breath", "severe_headache", "neck_stiffness",
+                 "confusion", "high_fever"],
+}
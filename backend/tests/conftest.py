@@ -0,0 +1,55 @@
+"""
+Shared setup for the backend tests: modules import each other by bare name,
+and the database and case store point at a throwaway directory before any of
+them is imported.
+"""
+
+import atexit
+import os
+import shutil
+import sys
+import tempfile
+
+import pytest
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+_scratch = tempfile.mkdtemp(prefix="backend-tests-")
+atexit.register(shutil.rmtree, _scratch, ignore_errors=True)
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_scratch, 'test.db')}"
+os.environ["AI_CASE_STORE_DIR"] = os.path.join(_scratch, "ai_case_store")
+os.environ["AI_WORKER_PROCESSES"] = "0"
+
+
+@pytest.fixture
+def db():
+    """Session on the test database; every table is emptied afterwards"""
+    import models  # noqa: F401  registers the tables
+    from database import Base, SessionLocal, create_tables, engine
+
+    create_tables()
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+        with engine.begin() as connection:
+            for table in reversed(Base.metadata.sorted_tables):
+                connection.execute(table.delete())
+
+
+@pytest.fixture
+def clinic(db):
+    """A doctor and a patient in Rampur, with their users"""
+    from models import Doctor, Patient, User, UserRole
+
+    doctor_user = User(name="Dr. Test", email="doctor@test.example", password="x", role=UserRole.doctor)
+    patient_user = User(name="Patient Test", email="patient@test.example", password="x", role=UserRole.patient)
+    db.add_all([doctor_user, patient_user])
+    db.flush()
+    doctor = Doctor(user_id=doctor_user.id, specialization="General Medicine", is_available=True)
+    patient = Patient(user_id=patient_user.id, age=40, gender="female", village="Rampur")
+    db.add_all([doctor, patient])
+    db.commit()
+    return {"doctor_user": doctor_user, "doctor": doctor, "patient": patient}
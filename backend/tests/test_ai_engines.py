@@ -0,0 +1,88 @@
+import pytest
+
+from ai_ann_index import MinHashLSHIndex
+from ai_patient_database import AIPatientDatabase
+from ai_worker import AIDispatcher
+from benchmark_ai import build_synthetic_db, sample_queries
+from case_store import CaseStore
+from test_case_store import make_case
+
+SIZE = 2000
+
+
+@pytest.fixture(scope="module")
+def databases():
+    return {engine: build_synthetic_db(SIZE, engine=engine) for engine in ("python", "numpy")}
+
+
+@pytest.fixture(scope="module")
+def queries(databases):
+    edge_cases = [(["fever"], None), (["fever", "cough"], 0), (["not_a_symptom"], 40), (["rash"], 90)]
+    return sample_queries(databases["python"], 150) + edge_cases
+
+
+def ranking(cases):
+    return [(case["case_id"], case["similarity_score"]) for case in cases]
+
+
+def test_numpy_engine_matches_python_engine(databases, queries):
+    for symptoms, age in queries:
+        expected = ranking(databases["python"].find_similar_cases(symptoms, age))
+        assert ranking(databases["numpy"].find_similar_cases(symptoms, age)) == expected
+
+
+@pytest.mark.parametrize("engine", ["python", "numpy"])
+def test_batch_search_matches_single_queries(databases, queries, engine):
+    database = databases[engine]
+    batch = database.find_similar_cases_batch(queries)
+    assert [ranking(cases) for cases in batch] == [ranking(database.find_similar_cases(s, a)) for s, a in queries]
+
+
+def test_batch_recommendations_match_single_ones(databases, queries):
+    database = databases["python"]
+    profiles = [{"symptoms": symptoms, "patient_age": age} for symptoms, age in queries]
+    batch = database.get_ai_recommendations_batch(profiles + profiles[:5])
+    database.recommendation_cache.clear()
+    single = [database.get_ai_recommendations(profile["symptoms"], patient_age=profile["patient_age"])
+              for profile in profiles + profiles[:5]]
+    assert batch == single
+
+
+def test_ann_index_recall(queries):
+    database = build_synthetic_db(SIZE)  # set_ann_index changes the instance
+    exact = [[case["case_id"] for case in database.find_similar_cases(s, a)] for s, a in queries]
+    database.set_ann_index(MinHashLSHIndex(32, 2))
+    approximate = [[case["case_id"] for case in database.find_similar_cases(s, a)] for s, a in queries]
+    hits = sum(len(set(a) & set(e)) for a, e in zip(approximate, exact))
+    assert hits / sum(len(e) for e in exact) >= 0.9
+
+
+def test_recommendation_cache_follows_the_case_base(tmp_path):
+    store = CaseStore(str(tmp_path))
+    store.write_snapshot([make_case("A", symptoms=["fever", "cough", "headache"], diagnosis="Influenza")])
+    database = AIPatientDatabase(engine="python", store=store)
+    first = database.get_ai_recommendations(["fever", "cough"], patient_age=30)
+    assert database.get_ai_recommendations(["fever", "cough"], patient_age=30) is first
+
+    store.append_pending(make_case("B", symptoms=["fever", "cough"], diagnosis="Bronchitis"))
+    database.refresh()
+    second = database.get_ai_recommendations(["fever", "cough"], patient_age=30)
+    assert second is not first
+    assert "Bronchitis" in second["possible_conditions"]
+
+    store.compact()
+    database.refresh()  # reloads from the new snapshot
+    assert database.get_ai_recommendations(["fever", "cough"], patient_age=30) is not second
+
+
+def test_front_cache_key_changes_with_the_case_store(tmp_path):
+    dispatcher = AIDispatcher(processes=0)
+    dispatcher._case_store = store = CaseStore(str(tmp_path))
+    profile = {"symptoms": ["fever", "cough"], "patient_age": 30}
+    key = dispatcher._profile_key(profile)
+    assert dispatcher._profile_key(profile) == key
+    store.append_pending(make_case("A"))
+    assert dispatcher._profile_key(profile) != key
+    key = dispatcher._profile_key(profile)
+    store.compact()
+    assert dispatcher._profile_key(profile) != key
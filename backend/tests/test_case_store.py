@@ -0,0 +1,112 @@
+import os
+
+import pytest
+
+from ai_patient_database import AIPatientDatabase
+from case_store import CaseStore
+
+
+def make_case(case_id: str, symptoms=("fever", "cough"), age=30, **fields) -> dict:
+    case = {"case_id": case_id, "patient_age": age, "patient_gender": "female", "symptoms": list(symptoms),
+            "symptom_description": "", "diagnosis": "Common cold", "treatment": "Rest and fluids",
+            "severity": "mild"}
+    case.update(fields)
+    return case
+
+
+def test_snapshot_round_trip(tmp_path):
+    store = CaseStore(str(tmp_path))
+    cases = [make_case("A", symptoms=["fever", "cough"], age=30),
+             make_case("B", symptoms=["rash"], age=None, symptom_description="itchy red rash"),
+             make_case("C", symptoms=["cough", "fever"], age=61)]
+    version = store.write_snapshot(cases, note="test")
+    snapshot = store.load()
+    assert snapshot.version == version == store.current_version()
+    assert snapshot.manifest["case_count"] == 3
+    assert list(snapshot.iter_cases()) == cases
+    assert snapshot.ages.tolist() == [30, 0, 61]
+    signatures = [snapshot.signature(int(signature_id)) for signature_id in snapshot.case_signature]
+    assert signatures == [frozenset(case["symptoms"]) for case in cases]
+
+
+def test_pending_cases_are_read_incrementally(tmp_path):
+    store = CaseStore(str(tmp_path))
+    version = store.write_snapshot([make_case("A")])
+    store.append_pending(make_case("P1"))
+    store.append_pending(make_case("P2"))
+    cases, cursor = store.read_pending(version)
+    assert [case["case_id"] for case in cases] == ["P1", "P2"]
+    store.append_pending(make_case("P3"))
+    cases, cursor = store.read_pending(version, cursor)
+    assert [case["case_id"] for case in cases] == ["P3"]
+    assert store.read_pending(version, cursor)[0] == []
+    store.compact()
+    assert store.read_pending(version, cursor)[0] is None  # reload from the new snapshot
+
+
+def test_case_base_replays_pending_and_reloads_after_compact(tmp_path):
+    store = CaseStore(str(tmp_path))
+    store.write_snapshot([make_case("A")])
+    database = AIPatientDatabase(engine="python", store=store)
+    store.append_pending(make_case("P1", symptoms=["rash"]))
+    assert database.refresh() == 1
+    assert database.refresh() == 0
+    store.compact()
+    store.append_pending(make_case("P2", symptoms=["rash", "fever"]))
+    database.refresh()
+    assert database.snapshot.version == store.current_version()
+    assert [case["case_id"] for case in database.patient_cases] == ["A", "P1", "P2"]
+    assert [case["case_id"] for case in database.find_similar_cases(["rash"])] == ["P1", "P2"]
+
+
+def test_whole_year_float_ages_are_kept_exactly(tmp_path):
+    store = CaseStore(str(tmp_path))
+    store.write_snapshot([make_case("A", age=45.0), make_case("B", age=None)])
+    assert store.load().ages.tolist() == [45, 0]
+
+
+def test_fractional_ages_are_rejected(tmp_path):
+    store = CaseStore(str(tmp_path))
+    with pytest.raises(ValueError, match="whole years"):
+        store.append_pending(make_case("A", age=7.5))
+    with pytest.raises(ValueError, match="whole years"):
+        store.write_snapshot([make_case("B", age=44.6)])
+    assert store.pending_cases() == []
+
+
+def case_ids(store: CaseStore) -> list:
+    snapshot = store.load()
+    cases = list(snapshot.iter_cases()) if snapshot else []
+    return [case["case_id"] for case in cases + store.pending_cases()]
+
+
+def test_import_folds_pending_cases(tmp_path):
+    store = CaseStore(str(tmp_path))
+    store.write_snapshot([make_case("A")])
+    store.append_pending(make_case("P"))
+    store.import_cases([make_case("B")])
+    assert case_ids(store) == ["A", "P", "B"]
+    assert store.load().manifest["folded_pending"]
+    assert store.compact() is None  # nothing left to replay on top
+    assert case_ids(store) == ["A", "P", "B"]
+
+
+def test_import_replace_can_discard_pending(tmp_path):
+    store = CaseStore(str(tmp_path))
+    store.write_snapshot([make_case("A")])
+    store.append_pending(make_case("P"))
+    store.import_cases([make_case("B")], replace=True, keep_pending=False)
+    assert case_ids(store) == ["B"]
+    store.compact()
+    assert case_ids(store) == ["B"]
+
+
+def test_description_index_round_trips_without_pickle(tmp_path):
+    store = CaseStore(str(tmp_path))
+    store.write_snapshot([make_case("A", symptom_description="high fever with dry cough"),
+                          make_case("B", symptom_description="sharp chest pain on exertion")])
+    snapshot = store.load()
+    assert not [name for name in os.listdir(snapshot.path) if name.endswith(".pkl")]
+    index = snapshot.description_index()
+    assert [position for _, position in index.top_matches("dry cough", 2)] == [0]
+    assert [position for _, position in index.top_matches("chest pain", 2)] == [1]
@@ -0,0 +1,42 @@
+from datetime import datetime
+
+from models import PatientInsightProfile, Record, SyncMutation
+from offline_sync import apply_sync_batch
+from schemas import SyncItem
+
+
+def record_item(clinic, client_id: str, symptoms: str = "fever and cough") -> SyncItem:
+    return SyncItem(client_id=client_id, type="healthRecord", timestamp=datetime(2026, 10, 1, 9, 30),
+                    data={"patient_id": clinic["patient"].id, "doctor_id": clinic["doctor"].id,
+                          "symptoms": symptoms, "diagnosis": "Common cold"})
+
+
+def test_retried_upload_replays_stored_outcomes(db, clinic):
+    items = [record_item(clinic, "m1"), record_item(clinic, "m2", "rash")]
+    first, record_ids = apply_sync_batch(db, clinic["doctor_user"], items)
+    assert [result.status for result in first] == ["applied", "applied"]
+    assert len(record_ids) == 2
+
+    retried, record_ids = apply_sync_batch(db, clinic["doctor_user"], items)
+    assert record_ids == []
+    assert [(r.status, r.entity_id, r.replayed) for r in retried] == [(r.status, r.entity_id, True) for r in first]
+    assert db.query(Record).count() == 2
+    assert db.query(SyncMutation).count() == 2
+    profile = db.query(PatientInsightProfile).filter_by(patient_id=clinic["patient"].id).one()
+    assert profile.consultation_count == 2
+
+
+def test_duplicate_ids_in_one_batch_apply_once(db, clinic):
+    item = record_item(clinic, "m1")
+    results, record_ids = apply_sync_batch(db, clinic["doctor_user"], [item, item])
+    assert len(record_ids) == 1
+    assert [(r.status, r.replayed) for r in results] == [("applied", False), ("applied", True)]
+    assert results[0].entity_id == results[1].entity_id
+
+
+def test_identical_record_under_a_new_id_is_a_duplicate(db, clinic):
+    apply_sync_batch(db, clinic["doctor_user"], [record_item(clinic, "m1")])
+    results, record_ids = apply_sync_batch(db, clinic["doctor_user"], [record_item(clinic, "m2")])
+    assert record_ids == []
+    assert results[0].status == "duplicate"
+    assert db.query(Record).count() == 1
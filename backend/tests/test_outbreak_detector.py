@@ -0,0 +1,61 @@
+from datetime import date, timedelta
+
+from models import OutbreakAlert, OutbreakDetectorState
+from outbreak_detector import (OUTBREAK_CUSUM_H, OUTBREAK_MIN_CASES, OUTBREAK_WARMUP_DAYS, current_score,
+                               observe)
+
+VILLAGE, SYMPTOM = "rampur", "fever"
+FIRST_DAY = date(2026, 9, 1)
+
+
+def state(db) -> OutbreakDetectorState:
+    return db.query(OutbreakDetectorState).filter_by(village=VILLAGE, symptom=SYMPTOM).one()
+
+
+def count_cases(db, day: date, cases: int):
+    """Observe `cases` cases on `day`; returns the number of cases counted when each alert was raised"""
+    raised = []
+    for case in range(1, cases + 1):
+        if observe(db, VILLAGE, SYMPTOM, day, "Rampur") is not None:
+            raised.append(case)
+        db.commit()
+    return raised
+
+
+def test_no_alert_during_warm_up(db):
+    assert count_cases(db, FIRST_DAY, 20) == []
+    assert state(db).days_observed < OUTBREAK_WARMUP_DAYS
+    assert db.query(OutbreakAlert).count() == 0
+
+
+def test_alert_is_raised_once_when_cusum_crosses_threshold(db):
+    count_cases(db, FIRST_DAY, 1)
+    spike_day = FIRST_DAY + timedelta(days=OUTBREAK_WARMUP_DAYS + 3)  # quiet days in between
+    scores = []
+    raised = []
+    for case in range(1, 16):
+        if count_cases(db, spike_day, 1):
+            raised.append(case)
+        scores.append(current_score(state(db)))
+
+    first = raised[0]
+    assert first >= OUTBREAK_MIN_CASES
+    assert scores[first - 1] > OUTBREAK_CUSUM_H
+    assert all(score <= OUTBREAK_CUSUM_H for score in scores[:first - 1])
+    assert raised == [first]  # later cases update the same alert
+
+    alert = db.query(OutbreakAlert).one()
+    assert state(db).alert_id == alert.id
+    assert alert.location == "Rampur"
+    assert alert.affected_count == 15
+
+
+def test_late_records_do_not_move_the_baseline(db):
+    count_cases(db, FIRST_DAY, 1)
+    count_cases(db, FIRST_DAY + timedelta(days=10), 1)
+    before = state(db)
+    snapshot = (before.day, before.day_count, before.mean, before.cusum)
+    assert count_cases(db, FIRST_DAY + timedelta(days=2), 10) == []
+    db.expire_all()
+    after = state(db)
+    assert (after.day, after.day_count, after.mean, after.cusum) == snapshot
@@ -0,0 +1,46 @@
+from datetime import datetime, timedelta
+
+from models import Record
+from record_pagination import RECORD_FIELDS, record_page
+
+START = datetime(2026, 10, 1, 8, 0)
+
+
+def add_records(db, clinic, times):
+    records = [Record(patient_id=clinic["patient"].id, doctor_id=clinic["doctor"].id, symptoms="fever",
+                      diagnosis="Common cold", created_at=created_at) for created_at in times]
+    db.add_all(records)
+    db.commit()
+    return records
+
+
+def read_all(db, limit, between_pages=None):
+    ids, cursor = [], None
+    while True:
+        page, cursor = record_page(db.query(Record), RECORD_FIELDS, limit=limit, cursor=cursor)
+        ids.extend(row["id"] for row in page)
+        if cursor is None:
+            return ids
+        if between_pages:
+            between_pages()
+
+
+def test_pages_cover_every_record_once_newest_first(db, clinic):
+    # Ties on created_at are broken by id
+    times = [START + timedelta(minutes=i // 3) for i in range(20)]
+    records = add_records(db, clinic, times)
+    expected = [r.id for r in sorted(records, key=lambda r: (r.created_at, r.id), reverse=True)]
+    assert read_all(db, limit=7) == expected
+
+
+def test_cursor_is_stable_across_inserts(db, clinic):
+    records = add_records(db, clinic, [START + timedelta(minutes=i) for i in range(12)])
+    expected = [r.id for r in reversed(records)]
+    inserted = []
+
+    def insert_newer_record():
+        # Newer than every page already read, so it must not shift later pages
+        inserted.extend(add_records(db, clinic, [START + timedelta(days=1, minutes=len(inserted))]))
+
+    assert read_all(db, limit=5, between_pages=insert_newer_record) == expected
+    assert inserted
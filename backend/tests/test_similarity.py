@@ -0,0 +1,28 @@
+from itertools import permutations
+
+import pytest
+
+from ai_patient_database import AIPatientDatabase
+
+
+@pytest.fixture(scope="module")
+def database():
+    return AIPatientDatabase(engine="python")
+
+
+def test_weights_are_summed_in_sorted_symptom_order(database):
+    # 0.6 + 0.6 + 0.5 is 1.7 in sorted order but 1.7000000000000002 in others,
+    # so the score does not depend on set iteration order (string hashing)
+    symptoms = ["anxiety", "blurred_vision", "fatigue"]
+    expected = (0.6 + 0.6 + 0.5) / 3
+    for order in permutations(symptoms):
+        assert database._calculate_similarity(list(order), symptoms) == expected
+        assert database._calculate_similarity(symptoms, list(order)) == expected
+
+
+def test_age_bonus_windows(database):
+    symptoms = ["fever", "cough"]
+    assert database._calculate_similarity(symptoms, symptoms) == 0.75
+    assert database._calculate_similarity(symptoms, ["fever"], 30, 35) == pytest.approx(0.8 / 2 + 0.2)
+    assert database._calculate_similarity(symptoms, ["fever"], 30, 45) == pytest.approx(0.8 / 2 + 0.1)
+    assert database._calculate_similarity(symptoms, ["fever"], 30, 46) == pytest.approx(0.8 / 2)
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Offline training pipeline for the triage (priority 1-4) model
+
+Learns from historical queue priorities, emergency records and emergency
+alerts, then writes a versioned artifact that the API loads at startup
+(see triage_model.py).
+
+Usage:
+    python train_triage_model.py train [--min-samples 50] [--test-size 0.2]
+    python train_triage_model.py list
+    python train_triage_model.py use <version>
+"""
+
+import argparse
+import sys
+
+import numpy as np
+import pandas as pd
+from sklearn.feature_extraction import DictVectorizer
+from sklearn.linear_model import LogisticRegression
+from sklearn.metrics import accuracy_score, f1_score
+from sklearn.model_selection import train_test_split
+
+from database import SessionLocal
+from models import Queue, Record, EmergencyAlert, Patient
+from symptom_normalizer import normalize_symptoms, decode_symptom_ids
+from triage_model import triage_features, save_model, list_versions, current_version, set_current, load_model
+
+EMERGENCY_PRIORITY = 4
+
+
+def load_training_data(db) -> pd.DataFrame:
+    """One row per labelled visit: symptom ids, patient age and priority"""
+    queues = pd.read_sql(
+        db.query(Queue.symptoms_brief.label("text"), Queue.symptom_ids, Patient.age, Queue.priority)
+        .outerjoin(Patient, Patient.id == Queue.patient_id).statement,
+        db.bind
+    )
+    # Emergency records and alerts are the strongest priority-4 examples
+    records = pd.read_sql(
+        db.query(Record.symptoms.label("text"), Record.symptom_ids, Patient.age)
+        .outerjoin(Patient, Patient.id == Record.patient_id)
+        .filter(Record.is_emergency.is_(True)).statement,
+        db.bind
+    ).assign(priority=EMERGENCY_PRIORITY)
+    alerts = pd.read_sql(
+        db.query(EmergencyAlert.description.label("text"), Patient.age)
+        .outerjoin(Patient, Patient.id == EmergencyAlert.patient_id).statement,
+        db.bind
+    ).assign(symptom_ids=None, priority=EMERGENCY_PRIORITY)
+
+    data = pd.concat([queues, records, alerts], ignore_index=True)
+    data = data[data["priority"].notna()]
+    data["symptoms"] = [
+        decode_symptom_ids(ids) or normalize_symptoms(text or "")
+        for ids, text in zip(data["symptom_ids"], data["text"])
+    ]
+    data["age"] = data["age"].astype("float").fillna(0).astype(int)
+    data["priority"] = data["priority"].astype(int)
+    return data[data["symptoms"].map(len) > 0][["symptoms", "age", "priority"]]
+
+
+def fit(data: pd.DataFrame, test_size: float) -> dict:
+    """Fit the classifier, report holdout metrics and return the compact artifact"""
+    vectorizer = DictVectorizer()
+    features = vectorizer.fit_transform(
+        {feature: 1 for feature in triage_features(symptoms, age)} for symptoms, age in zip(data["symptoms"], data["age"])
+    )
+    labels = data["priority"].to_numpy()
+
+    metrics = {"samples": int(len(labels)), "class_counts": {int(c): int(n) for c, n in zip(*np.unique(labels, return_counts=True))}}
+    stratify = labels if min(metrics["class_counts"].values()) >= 2 else None
+    if test_size > 0 and len(labels) >= 10:
+        X_train, X_test, y_train, y_test = train_test_split(features, labels, test_size=test_size,
+                                                            random_state=42, stratify=stratify)
+        holdout = LogisticRegression(max_iter=1000, class_weight="balanced").fit(X_train, y_train)
+        predicted = holdout.predict(X_test)
+        metrics["holdout_accuracy"] = round(float(accuracy_score(y_test, predicted)), 4)
+        metrics["holdout_macro_f1"] = round(float(f1_score(y_test, predicted, average="macro")), 4)
+
+    model = LogisticRegression(max_iter=1000, class_weight="balanced").fit(features, labels)
+    coef = model.coef_
+    if len(model.classes_) == 2:
+        # Binary models keep one row of weights; expand to one per class
+        coef = np.vstack([-coef[0] / 2, coef[0] / 2])
+        intercept = [-model.intercept_[0] / 2, model.intercept_[0] / 2]
+    else:
+        intercept = model.intercept_.tolist()
+
+    return {
+        "classes": [int(c) for c in model.classes_],
+        "intercept": [round(float(b), 6) for b in intercept],
+        "weights": {
+            feature: [round(float(w), 6) for w in coef[:, index]]
+            for feature, index in vectorizer.vocabulary_.items()
+        },
+        "metrics": metrics,
+    }
+
+
+def train(min_samples: int, test_size: float) -> int:
+    db = SessionLocal()
+    try:
+        data = load_training_data(db)
+    finally:
+        db.close()
+
+    if len(data) < min_samples or data["priority"].nunique() < 2:
+        print(f"❌ Not enough labelled data to train: {len(data)} samples, "
+              f"{data['priority'].nunique()} priority levels (need {min_samples} and 2)")
+        return 1
+
+    artifact = fit(data, test_size)
+    version = save_model(artifact)
+    print(f"✅ Trained triage model v{version:06d} on {artifact['metrics']['samples']} samples")
+    for name, value in artifact["metrics"].items():
+        print(f"   {name}: {value}")
+    return 0
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Train and manage triage model artifacts")
+    commands = parser.add_subparsers(dest="command", required=True)
+    train_parser = commands.add_parser("train", help="train a new model version from the database")
+    train_parser.add_argument("--min-samples", type=int, default=50)
+    train_parser.add_argument("--test-size", type=float, default=0.2)
+    commands.add_parser("list", help="list model versions")
+    use_parser = commands.add_parser("use", help="make a model version current")
+    use_parser.add_argument("version", type=int)
+    args = parser.parse_args(argv)
+
+    if args.command == "train":
+        return train(args.min_samples, args.test_size)
+    if args.command == "list":
+        current = current_version()
+        for version in list_versions():
+            model = load_model(version)
+            metrics = model.metrics if model else {}
+            marker = "*" if version == current else " "
+            print(f"{marker} v{version:06d}  {metrics.get('samples', '?'):>7} samples  "
+                  f"accuracy={metrics.get('holdout_accuracy', '-')}  macro_f1={metrics.get('holdout_macro_f1', '-')}")
+        return 0
+    if args.command == "use":
+        set_current(args.version)
+        print(f"Triage model v{args.version:06d} is now current (restart the API to load it)")
+        return 0
+    return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
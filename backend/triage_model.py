@@ -0,0 +1,118 @@
+"""
+Versioned triage (priority 1-4) model artifacts and their runtime scorer
+Artifacts are small JSON files written by train_triage_model.py. Scoring a
+patient is a sparse dot product over a handful of active features in pure
+Python, so the API needs no scikit-learn at request time.
+"""
+
+import json
+import math
+import os
+from datetime import datetime
+from typing import Dict, List, Optional
+
+AI_TRIAGE_MODEL_DIR = os.getenv("AI_TRIAGE_MODEL_DIR", "./triage_models")
+# Below this probability the keyword rules decide instead of the model
+AI_TRIAGE_MIN_CONFIDENCE = float(os.getenv("AI_TRIAGE_MIN_CONFIDENCE", "0.5"))
+
+
+def triage_features(symptom_ids: List[str], patient_age: Optional[int]) -> List[str]:
+    """Active (binary) features for a patient; shared by training and scoring"""
+    features = [f"symptom:{symptom_id}" for symptom_id in sorted(set(symptom_ids))]
+    if not patient_age:
+        features.append("age:unknown")
+    elif patient_age < 5:
+        features.append("age:child")
+    elif patient_age > 65:
+        features.append("age:elderly")
+    else:
+        features.append("age:adult")
+    return features
+
+
+class TriageModel:
+    """Multinomial logistic regression stored as per-feature class weights"""
+
+    def __init__(self, artifact: Dict):
+        self.version: int = artifact["version"]
+        self.classes: List[int] = artifact["classes"]
+        self.intercept: List[float] = artifact["intercept"]
+        self.weights: Dict[str, List[float]] = artifact["weights"]
+        self.metrics: Dict = artifact.get("metrics", {})
+
+    def predict_proba(self, symptom_ids: List[str], patient_age: Optional[int] = None) -> Dict[int, float]:
+        logits = list(self.intercept)
+        for feature in triage_features(symptom_ids, patient_age):
+            weights = self.weights.get(feature)
+            if weights:
+                for i, weight in enumerate(weights):
+                    logits[i] += weight
+        top = max(logits)
+        exps = [math.exp(logit - top) for logit in logits]
+        total = sum(exps)
+        return {priority: exp / total for priority, exp in zip(self.classes, exps)}
+
+    def predict(self, symptom_ids: List[str], patient_age: Optional[int] = None,
+                min_confidence: float = AI_TRIAGE_MIN_CONFIDENCE) -> Optional[int]:
+        """Most likely priority, or None when the model is not confident enough"""
+        probabilities = self.predict_proba(symptom_ids, patient_age)
+        priority = max(probabilities, key=probabilities.get)
+        return priority if probabilities[priority] >= min_confidence else None
+
+
+def _model_path(version: int, root: str = AI_TRIAGE_MODEL_DIR) -> str:
+    return os.path.join(root, f"triage_v{version:06d}.json")
+
+
+def list_versions(root: str = AI_TRIAGE_MODEL_DIR) -> List[int]:
+    if not os.path.isdir(root):
+        return []
+    return sorted(int(name[len("triage_v"):-len(".json")]) for name in os.listdir(root)
+                  if name.startswith("triage_v") and name.endswith(".json"))
+
+
+def current_version(root: str = AI_TRIAGE_MODEL_DIR) -> Optional[int]:
+    try:
+        with open(os.path.join(root, "CURRENT")) as f:
+            return int(f.read().strip())
+    except (OSError, ValueError):
+        return None
+
+
+def set_current(version: int, root: str = AI_TRIAGE_MODEL_DIR):
+    """Atomically point CURRENT at a model version"""
+    if not os.path.exists(_model_path(version, root)):
+        raise ValueError(f"Triage model v{version} does not exist")
+    tmp_path = os.path.join(root, "CURRENT.tmp")
+    with open(tmp_path, "w") as f:
+        f.write(str(version))
+    os.replace(tmp_path, os.path.join(root, "CURRENT"))
+
+
+def save_model(artifact: Dict, root: str = AI_TRIAGE_MODEL_DIR) -> int:
+    """Write an artifact as the next version and make it current"""
+    os.makedirs(root, exist_ok=True)
+    versions = list_versions(root)
+    version = versions[-1] + 1 if versions else 1
+    artifact = dict(artifact, version=version, trained_at=datetime.utcnow().isoformat())
+    with open(_model_path(version, root), "w") as f:
+        json.dump(artifact, f, separators=(",", ":"))
+    set_current(version, root)
+    return version
+
+
+def load_model(version: Optional[int] = None, root: str = AI_TRIAGE_MODEL_DIR) -> Optional[TriageModel]:
+    """The current (or given) model; None if none was trained or it cannot be read"""
+    version = version if version is not None else current_version(root)
+    if version is None:
+        return None
+    try:
+        with open(_model_path(version, root)) as f:
+            return TriageModel(json.load(f))
+    except (OSError, ValueError, KeyError) as e:
+        print(f"Triage model v{version} could not be loaded, using keyword rules: {e}")
+        return None
+
+
+# Loaded once per worker process
+triage_model = load_model()
@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""
+Script to bring a database created by an older version up to the current
+schema: creates missing tables, adds the nullable columns and the indexes
+declared since its tables were created, and the record search index. Run it
+once after upgrading, before starting the server; the server itself only
+creates missing tables. Safe to re-run.
+
+Then fill the new columns of existing rows with the backfill scripts
+(backfill_symptom_ids.py, backfill_record_symptoms.py, backfill_village_keys.py,
+rebuild_patient_profiles.py).
+"""
+
+from sqlalchemy import inspect, text
+
+import models  # noqa: F401  registers the tables
+from database import Base, create_tables, engine
+
+def add_missing_columns():
+    """Add nullable columns introduced after a table was first created"""
+    inspector = inspect(engine)
+    added = []
+    with engine.begin() as connection:
+        for table in Base.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in existing and column.nullable:
+                    column_type = column.type.compile(dialect=engine.dialect)
+                    connection.execute(text(f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}'))
+                    added.append(f"{table.name}.{column.name}")
+    return added
+
+def add_missing_indexes():
+    """Create indexes declared after a table was first created"""
+    inspector = inspect(engine)
+    added = []
+    for table in Base.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {index["name"] for index in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name not in existing:
+                index.create(bind=engine)
+                added.append(index.name)
+    return added
+
+def upgrade_database():
+    """Create missing tables, then add missing columns, indexes and the search index"""
+    Base.metadata.create_all(bind=engine)
+    columns = add_missing_columns()
+    indexes = add_missing_indexes()
+    create_tables()  # search index, now that records has its current columns
+    print(f"✅ Added {len(columns)} columns{': ' + ', '.join(columns) if columns else ''}")
+    print(f"✅ Added {len(indexes)} indexes{': ' + ', '.join(indexes) if indexes else ''}")
+
+if __name__ == "__main__":
+    upgrade_database()
@@ -5,7 +5,10 @@ from typing import Optional, List
 import os
 from dotenv import load_dotenv
 
-from ai_patient_database import ai_patient_db
+from ai_patient_database import get_ai_patient_db
+from symptom_matcher import symptom_matcher
+from symptom_normalizer import normalize_symptoms, normalize_symptom_list
+from triage_model import triage_model
 
 load_dotenv()
 
@@ -46,22 +49,22 @@ def calculate_wait_time(queue_position: int, avg_consultation_time: int = 15):
     return queue_position * avg_consultation_time
 
 def prioritize_queue(symptoms: str, patient_age: int = None, medical_history: str = None):
-    """Simple rule-based priority calculation"""
+    """Priority 1-4: emergency keywords, then keyword rules, raised by the triage model (if deployed)"""
     priority = 1  # default low priority
     
-    emergency_keywords = ["chest pain", "difficulty breathing", "severe bleeding", 
-                         "unconscious", "heart attack", "stroke", "seizure"]
-    high_priority_keywords = ["fever", "vomiting", "severe pain", "infection"]
+    # Emergency and high-priority terms (with synonyms) in one pass
+    matched = symptom_matcher.match(symptoms)
     
-    symptoms_lower = symptoms.lower()
+    if matched.get("emergency"):
+        return 4  # emergency
     
-    for keyword in emergency_keywords:
-        if keyword in symptoms_lower:
-            return 4  # emergency
+    if matched.get("high_priority"):
+        priority = 3  # high priority
     
-    for keyword in high_priority_keywords:
-        if keyword in symptoms_lower:
-            priority = max(priority, 3)  # high priority
+    # Trained triage model when one is deployed and confident; it can only raise the rule-based priority
+    predicted = triage_model.predict(normalize_symptoms(symptoms), patient_age) if triage_model else None
+    if predicted is not None:
+        priority = max(priority, predicted)
     
     # Age-based priority adjustment
     if patient_age and (patient_age > 65 or patient_age < 5):
@@ -74,7 +77,9 @@ def analyze_symptoms_ai(symptoms: List[str], patient_history: str = None, patien
     Analyzes symptoms using the AI patient database, providing a more advanced
     analysis than the original rule-based system.
     """
-    ai_result = ai_patient_db.get_ai_recommendations(
+    # Canonical ids once, so "chest pain", "chest_pain" and "सीने में दर्द" match the same cases
+    symptoms = normalize_symptom_list(symptoms)
+    ai_result = get_ai_patient_db().get_ai_recommendations(
         symptoms=symptoms,
         patient_age=patient_age,
         patient_gender=patient_gender
@@ -83,6 +88,11 @@ def analyze_symptoms_ai(symptoms: List[str], patient_history: str = None, patien
     # Adapt the AI result to the format expected by legacy endpoints
     risk_map = {"low": 1, "moderate": 2, "high": 3, "critical": 4}
     urgency_level = risk_map.get(ai_result.get("risk_level", "low"), 1)
+    if triage_model:
+        # The triage model can only raise the case-based urgency
+        predicted = triage_model.predict(symptoms, patient_age)
+        if predicted is not None:
+            urgency_level = max(urgency_level, predicted)
 
     possible_conditions = [
         {"name": cond, "probability": ai_result.get("confidence", 0.5)} 
@@ -92,17 +102,15 @@ def analyze_symptoms_ai(symptoms: List[str], patient_history: str = None, patien
     # Maintain specialist suggestions from the old system for compatibility
     symptom_patterns = {
         "fever": {"specialists": ["General Medicine", "Internal Medicine"]},
-        "chest pain": {"specialists": ["Cardiology", "Emergency Medicine"]},
+        "chest_pain": {"specialists": ["Cardiology", "Emergency Medicine"]},
+        "chest_tightness": {"specialists": ["Cardiology", "General Medicine"]},
         "headache": {"specialists": ["Neurology", "General Medicine"]},
         "cough": {"specialists": ["Pulmonology", "General Medicine"]},
-        "abdominal pain": {"specialists": ["Gastroenterology", "General Surgery"]},
+        "stomach_pain": {"specialists": ["Gastroenterology", "General Surgery"]},
     }
     specialists_set = set()
-    for symptom in symptoms:
-        symptom_lower = symptom.lower()
-        for pattern, data in symptom_patterns.items():
-            if pattern in symptom_lower:
-                specialists_set.update(data["specialists"])
+    for pattern in symptom_matcher.match_symptoms(symptoms).get("specialist", []):
+        specialists_set.update(symptom_patterns[pattern]["specialists"])
 
     return {
         "possible_conditions": possible_conditions,
@@ -110,26 +118,3 @@ def analyze_symptoms_ai(symptoms: List[str], patient_history: str = None, patien
         "urgency_level": urgency_level,
         "suggested_specialists": list(specialists_set)
     }
-
-def predict_medicine_demand(disease_name: str, affected_count: int, location: str):
-    """Predict medicine demand during outbreaks"""
-    
-    # Basic medicine requirements for common diseases
-    disease_medicine_map = {
-        "flu": ["Paracetamol", "Cough Syrup", "Vitamin C"],
-        "diarrhea": ["ORS", "Loperamide", "Zinc Tablets"],
-        "malaria": ["Artemether", "Paracetamol", "ORS"],
-        "dengue": ["Paracetamol", "ORS", "Platelet Rich Plasma"],
-        "covid": ["Paracetamol", "Vitamin D", "Zinc", "Oxygen"]
-    }
-    
-    base_medicines = disease_medicine_map.get(disease_name.lower(), ["Paracetamol", "Basic Antibiotics"])
-    
-    # Calculate demand multiplier based on affected count
-    demand_multiplier = max(1, affected_count // 10)
-    
-    medicine_demand = {}
-    for medicine in base_medicines:
-        medicine_demand[medicine] = affected_count * demand_multiplier
-    
-    return medicine_demand
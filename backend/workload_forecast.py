@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+"""
+Seasonal forecasts of doctor workload per specialization
+
+Consultations are rolled up per specialization and day, and one weighted
+least-squares model per specialization (level, linear trend and a
+day-of-week profile) is fitted to all of them at once with NumPy. The
+forecasts are cached in-process and refreshed on a timer by a daemon
+thread, started with the server, so the workload endpoint never fits a model
+while a user waits. The forecast starts today: only complete days are fitted.
+
+Usage:
+    python workload_forecast.py   # fit on the current database and print the forecasts
+"""
+
+import os
+import sys
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import func
+
+from database import SessionLocal
+from models import Doctor, Queue, QueueStatus, Record
+
+WORKLOAD_HISTORY_DAYS = int(os.getenv("WORKLOAD_HISTORY_DAYS", "182"))  # daily rollups fitted
+WORKLOAD_HORIZON_DAYS = int(os.getenv("WORKLOAD_HORIZON_DAYS", "7"))
+WORKLOAD_HALF_LIFE_DAYS = float(os.getenv("WORKLOAD_HALF_LIFE_DAYS", "28"))  # weight of older days halves
+WORKLOAD_REFRESH_SECONDS = float(os.getenv("WORKLOAD_REFRESH_SECONDS", "3600"))
+DEFAULT_CONSULTATION_MINUTES = 15.0
+
+# Fewer days than this: no trend or weekday profile, just the weighted mean
+MIN_SEASONAL_DAYS = 14
+# Two-sided 80% normal interval
+INTERVAL_Z = 1.2816
+
+
+def load_daily_rollups(db, since: datetime) -> pd.DataFrame:
+    """Days x specializations matrix of consultation counts up to yesterday, missing days filled with zero
+
+    Today is still in progress; its partial count would read as a drop in demand.
+    """
+    today = pd.Timestamp(datetime.utcnow().date())
+    rows = db.query(
+        Doctor.specialization,
+        func.date(Record.created_at),
+        func.count(Record.id)
+    ).join(Record, Record.doctor_id == Doctor.id).filter(
+        Record.created_at >= since,
+        Record.created_at < today.to_pydatetime()
+    ).group_by(Doctor.specialization, func.date(Record.created_at)).all()
+    if not rows:
+        return pd.DataFrame()
+    frame = pd.DataFrame(rows, columns=["specialization", "day", "consultations"])
+    frame["day"] = pd.to_datetime(frame["day"])
+    daily = frame.pivot_table(index="day", columns="specialization", values="consultations",
+                              aggfunc="sum", fill_value=0)
+    yesterday = today - pd.Timedelta(days=1)
+    return daily.reindex(pd.date_range(daily.index.min(), yesterday, freq="D"), fill_value=0).astype(float)
+
+
+def load_consultation_minutes(db, since: datetime) -> Dict[str, float]:
+    """Median minutes from start to completion of finished queue entries per specialization"""
+    rows = db.query(Doctor.specialization, Queue.started_at, Queue.completed_at).join(
+        Queue, Queue.doctor_id == Doctor.id
+    ).filter(
+        Queue.status == QueueStatus.COMPLETED,
+        Queue.started_at.isnot(None),
+        Queue.completed_at.isnot(None),
+        Queue.completed_at >= since
+    ).all()
+    if not rows:
+        return {}
+    frame = pd.DataFrame(rows, columns=["specialization", "started_at", "completed_at"])
+    minutes = (pd.to_datetime(frame["completed_at"]) - pd.to_datetime(frame["started_at"])).dt.total_seconds() / 60
+    frame["minutes"] = minutes
+    frame = frame[(frame["minutes"] > 0) & (frame["minutes"] < 8 * 60)]
+    return frame.groupby("specialization")["minutes"].median().to_dict()
+
+
+def _design(days: pd.DatetimeIndex, origin: pd.Timestamp, seasonal: bool) -> np.ndarray:
+    """Columns: intercept, trend in weeks, and six weekday offsets against Monday"""
+    if not seasonal:
+        return np.ones((len(days), 1))
+    weeks = ((days - origin).days.to_numpy() / 7.0)[:, None]
+    weekdays = (days.dayofweek.to_numpy()[:, None] == np.arange(1, 7)[None, :]).astype(float)
+    return np.hstack([np.ones((len(days), 1)), weeks, weekdays])
+
+
+def fit_forecasts(daily: pd.DataFrame, horizon: int = WORKLOAD_HORIZON_DAYS,
+                  half_life: float = WORKLOAD_HALF_LIFE_DAYS) -> pd.DataFrame:
+    """Forecast every column of `daily` for the next `horizon` days in one least-squares solve
+
+    Returns a frame indexed by (specialization, day) with forecast, lower, upper and the
+    residual standard deviation sd.
+    """
+    origin = daily.index[0]
+    seasonal = len(daily) >= MIN_SEASONAL_DAYS
+    x = _design(daily.index, origin, seasonal)
+    y = daily.to_numpy()
+
+    # Exponentially decaying weights, applied as sqrt(w) to rows of X and Y
+    age = (daily.index[-1] - daily.index).days.to_numpy()
+    root_weights = np.sqrt(0.5 ** (age / half_life))[:, None]
+    coefficients, *_ = np.linalg.lstsq(x * root_weights, y * root_weights, rcond=None)
+
+    residuals = (y - x @ coefficients) * root_weights
+    degrees = max(1.0, root_weights.sum() ** 2 / (root_weights ** 2).sum() - x.shape[1])
+    sd = np.sqrt((residuals ** 2).sum(axis=0) / degrees)
+
+    future = pd.date_range(daily.index[-1] + pd.Timedelta(days=1), periods=horizon, freq="D")
+    forecast = np.clip(_design(future, origin, seasonal) @ coefficients, 0, None)
+    lower = np.clip(forecast - INTERVAL_Z * sd, 0, None)
+    upper = forecast + INTERVAL_Z * sd
+
+    index = pd.MultiIndex.from_product([daily.columns, future], names=["specialization", "day"])
+    return pd.DataFrame({
+        "forecast": forecast.T.ravel(),
+        "lower": lower.T.ravel(),
+        "upper": upper.T.ravel(),
+        "sd": np.repeat(sd, horizon),
+    }, index=index)
+
+
+def compute_workload_forecast(db) -> Dict:
+    """Fit on the current database; the shape cached and served by the endpoint"""
+    now = datetime.utcnow()
+    daily = load_daily_rollups(db, now - timedelta(days=WORKLOAD_HISTORY_DAYS))
+    minutes = load_consultation_minutes(db, now - timedelta(days=90))
+    specializations = {}
+    if not daily.empty:
+        forecasts = fit_forecasts(daily)
+        weekly = forecasts.groupby(level="specialization").sum()
+        for specialization, totals in weekly.iterrows():
+            per_day = forecasts.loc[specialization]
+            consultation_minutes = float(minutes.get(specialization, DEFAULT_CONSULTATION_MINUTES))
+            # Daily errors taken as independent, so the weekly spread grows with sqrt(days)
+            spread = INTERVAL_Z * per_day["sd"].iloc[0] * np.sqrt(len(per_day))
+            specializations[specialization] = {
+                "predicted_weekly_demand": int(round(totals["forecast"])),
+                "interval": [max(0, int(np.floor(totals["forecast"] - spread))), int(np.ceil(totals["forecast"] + spread))],
+                "daily_forecast": [
+                    {"date": day.date().isoformat(), "consultations": round(float(row["forecast"]), 1),
+                     "interval": [round(float(row["lower"]), 1), round(float(row["upper"]), 1)]}
+                    for day, row in per_day.iterrows()
+                ],
+                "avg_consultation_minutes": round(consultation_minutes, 1),
+                "estimated_hours_needed": round(totals["forecast"] * consultation_minutes / 60, 1),
+                "history_days": len(daily),
+            }
+    return {
+        "generated_at": now,
+        "horizon_days": WORKLOAD_HORIZON_DAYS,
+        "model": "weighted trend + day-of-week" if len(daily) >= MIN_SEASONAL_DAYS else "weighted mean",
+        "specializations": specializations,
+    }
+
+
+class WorkloadForecaster:
+    """Latest forecasts, fitted when the daemon thread starts and every refresh_seconds after"""
+
+    def __init__(self, refresh_seconds: float = WORKLOAD_REFRESH_SECONDS):
+        self.refresh_seconds = refresh_seconds
+        self._latest: Optional[Dict] = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._fitted = threading.Event()  # set once the first fit has finished or failed
+        self.refreshes = 0
+
+    def refresh(self) -> Dict:
+        db = SessionLocal()
+        try:
+            started = time.perf_counter()
+            result = compute_workload_forecast(db)
+            result["fit_seconds"] = round(time.perf_counter() - started, 3)
+        finally:
+            db.close()
+        with self._lock:
+            self._latest = result
+            self.refreshes += 1
+        return result
+
+    def _run(self):
+        while True:
+            try:
+                self.refresh()
+            except Exception as e:
+                print(f"Workload forecast refresh failed: {e}")
+            finally:
+                self._fitted.set()
+            if self._stop.wait(self.refresh_seconds):
+                return
+
+    def start(self):
+        """Fit in the background and start the refresh timer (idempotent)"""
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name="workload-forecast", daemon=True)
+            self._thread.start()
+
+    def shutdown(self):
+        self._stop.set()
+
+    def latest(self) -> Dict:
+        """Cached forecasts; waits for the first fit if it is still running"""
+        self.start()
+        self._fitted.wait()
+        with self._lock:
+            latest = self._latest
+        # The first fit failed: try again in this request rather than answer nothing
+        return latest if latest is not None else self.refresh()
+
+
+workload_forecaster = WorkloadForecaster()
+
+
+def main() -> int:
+    result = workload_forecaster.refresh()
+    print(f"✅ Workload forecast ({result['model']}, fitted in {result['fit_seconds']}s)")
+    for specialization, entry in sorted(result["specializations"].items()):
+        low, high = entry["interval"]
+        print(f"  {specialization:<25} {entry['predicted_weekly_demand']:>5} consultations next week "
+              f"({low}-{high})  ~{entry['estimated_hours_needed']}h")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -3,7 +3,7 @@ import { useTranslation } from 'react-i18next';
 import { AuthContext } from '../App';
 import Card, { CardHeader, CardTitle, CardSubtitle } from '../components/Card';
 import { getHealthRecordsOffline, saveHealthRecordOffline } from '../utils/offlineStorage';
-import axios from 'axios';
+import { fetchAllRecords } from '../utils/recordPages';
 
 const HealthRecords = () => {
   const { user } = useContext(AuthContext);
@@ -31,14 +31,14 @@ const HealthRecords = () => {
     try {
       if (navigator.onLine) {
         // Try to fetch from server
-        const response = await axios.get('/records/my-records');
-        setRecords(response.data);
+        const allRecords = await fetchAllRecords('/records/my-records');
+        setRecords(allRecords);
         
         // Cache records offline for patients
         if (user?.role === 'patient') {
-          const patientId = response.data[0]?.patient_id;
+          const patientId = allRecords[0]?.patient_id;
           if (patientId) {
-            response.data.forEach(record => saveHealthRecordOffline(record));
+            allRecords.forEach(record => saveHealthRecordOffline(record));
           }
         }
       } else {
@@ -3,6 +3,7 @@ import { useTranslation } from 'react-i18next';
 import { AuthContext } from '../App';
 import Card, { CardHeader, CardTitle, CardSubtitle } from '../components/Card';
 import axios from 'axios';
+import { fetchAllRecords } from '../utils/recordPages';
 
 const Profile = () => {
   const { user } = useContext(AuthContext);
@@ -426,23 +427,25 @@ const AccountStatistics = ({ user }) => {
   const fetchStats = async () => {
     try {
       if (user?.role === 'patient') {
-        const recordsRes = await axios.get('/records/my-records');
+        // Only the fields the stats need, every page
+        const records = await fetchAllRecords('/records/my-records', { fields: 'is_emergency' });
         const queueRes = await axios.get('/queues/my-queue');
         
         setStats({
-          totalConsultations: recordsRes.data.length,
-          emergencyVisits: recordsRes.data.filter(r => r.is_emergency).length,
+          totalConsultations: records.length,
+          emergencyVisits: records.filter(r => r.is_emergency).length,
           activeQueues: queueRes.data.filter(q => q.status === 'waiting' || q.status === 'in_progress').length,
-          lastVisit: recordsRes.data[0]?.created_at
+          lastVisit: records[0]?.created_at
         });
       } else if (user?.role === 'doctor') {
-        const recordsRes = await axios.get('/records/my-records');
+        // Only the fields the stats need, every page
+        const records = await fetchAllRecords('/records/my-records', { fields: 'is_emergency' });
         const queueRes = await axios.get('/queues/my-queue');
         
         setStats({
-          totalConsultations: recordsRes.data.length,
+          totalConsultations: records.length,
           activeQueues: queueRes.data.filter(q => q.status === 'waiting').length,
-          completedToday: recordsRes.data.filter(r => 
+          completedToday: records.filter(r => 
             new Date(r.created_at).toDateString() === new Date().toDateString()
           ).length
         });
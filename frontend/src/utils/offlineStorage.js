@@ -148,6 +148,10 @@ export const getUserProfileOffline = async (userId) => {
 export const addToSyncQueue = async (type, data) => {
   try {
     const queueItem = {
+      // Sent with every upload attempt so the server applies the item only once
+      clientId: (window.crypto && window.crypto.randomUUID)
+        ? window.crypto.randomUUID()
+        : `${Date.now()}-${Math.random().toString(36).slice(2)}`,
       type,
       data,
       timestamp: new Date(),
@@ -186,6 +190,10 @@ export const updateSyncQueueRetry = async (id, retryCount) => {
 };
 
 // Sync functions
+const SYNC_BATCH_SIZE = 500;
+
+const localTable = (type) => (type === 'healthRecord' ? db.healthRecords : db.consultations);
+
 export const syncOfflineData = async () => {
   if (!navigator.onLine) {
     console.log('Cannot sync - offline');
@@ -195,69 +203,54 @@ export const syncOfflineData = async () => {
   try {
     const queue = await getSyncQueue();
     
-    for (const item of queue) {
-      try {
-        await syncItem(item);
-        await removeSyncQueueItem(item.id);
-      } catch (error) {
-        console.error('Failed to sync item:', error);
-        await updateSyncQueueRetry(item.id, item.retryCount + 1);
-        
-        // Remove items that have failed too many times
-        if (item.retryCount >= 3) {
-          await removeSyncQueueItem(item.id);
-        }
-      }
-    }
-  } catch (error) {
-    console.error('Failed to sync offline data:', error);
-  }
-};
-
-const syncItem = async (item) => {
-  const { type, data } = item;
-  
-  switch (type) {
-    case 'healthRecord':
-      // Sync health record to server
-      const response = await fetch('/records/', {
+    for (let start = 0; start < queue.length; start += SYNC_BATCH_SIZE) {
+      const batch = queue.slice(start, start + SYNC_BATCH_SIZE);
+      // Items queued before client ids existed get a stable one from their local id
+      const clientIds = batch.map(item => item.clientId || `local-${item.id}`);
+      
+      const response = await fetch('/sync/batch', {
         method: 'POST',
         headers: {
           'Content-Type': 'application/json',
           'Authorization': `Bearer ${localStorage.getItem('token')}`
         },
-        body: JSON.stringify(data)
+        body: JSON.stringify({
+          items: batch.map((item, index) => ({
+            client_id: clientIds[index],
+            type: item.type,
+            data: item.data,
+            timestamp: item.timestamp
+          }))
+        })
       });
       
       if (!response.ok) {
-        throw new Error('Failed to sync health record');
+        // Nothing is lost: the same client ids are sent again on the next sync
+        throw new Error(`Batch sync failed with status ${response.status}`);
       }
       
-      // Mark as synced in local storage
-      await db.healthRecords.update(data.id, { synced: true });
-      break;
+      const { results } = await response.json();
+      const resultsById = Object.fromEntries(results.map(result => [result.client_id, result]));
       
-    case 'consultation':
-      // Sync consultation to server
-      const consultResponse = await fetch('/queues/', {
-        method: 'POST',
-        headers: {
-          'Content-Type': 'application/json',
-          'Authorization': `Bearer ${localStorage.getItem('token')}`
-        },
-        body: JSON.stringify(data)
-      });
-      
-      if (!consultResponse.ok) {
-        throw new Error('Failed to sync consultation');
+      for (const [index, item] of batch.entries()) {
+        const result = resultsById[clientIds[index]];
+        if (result && result.status !== 'rejected') {
+          // applied, duplicate and conflict are all settled on the server
+          await localTable(item.type).update(item.data.id, { synced: true, serverId: result.entity_id });
+          await removeSyncQueueItem(item.id);
+        } else {
+          console.error('Failed to sync item:', result ? result.detail : 'no result');
+          await updateSyncQueueRetry(item.id, item.retryCount + 1);
+          
+          // Remove items that have failed too many times
+          if (item.retryCount >= 3) {
+            await removeSyncQueueItem(item.id);
+          }
+        }
       }
-      
-      // Mark as synced in local storage
-      await db.consultations.update(data.id, { synced: true });
-      break;
-      
-    default:
-      console.warn('Unknown sync type:', type);
+    }
+  } catch (error) {
+    console.error('Failed to sync offline data:', error);
   }
 };
 
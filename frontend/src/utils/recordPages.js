@@ -0,0 +1,15 @@
+import axios from 'axios';
+
+// Record listings are paginated: each page sends the next page's cursor in X-Next-Cursor
+export const fetchAllRecords = async (url, params = {}) => {
+  const records = [];
+  let cursor = null;
+  do {
+    const response = await axios.get(url, {
+      params: { ...params, limit: 200, ...(cursor ? { cursor } : {}) }
+    });
+    records.push(...response.data);
+    cursor = response.headers['x-next-cursor'];
+  } while (cursor);
+  return records;
+};